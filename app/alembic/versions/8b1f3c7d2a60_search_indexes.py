@@ -0,0 +1,117 @@
+"""search indexes
+
+Revision ID: 8b1f3c7d2a60
+Revises: 5d0e7b3c91a4
+Create Date: 2026-10-18 11:02:37.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "8b1f3c7d2a60"
+down_revision = "5d0e7b3c91a4"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("is_active IS TRUE")
+
+
+def upgrade() -> None:
+    # Built without locking the writes of the scrapers
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_product_name_trgm",
+            "product",
+            ["name"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=ACTIVE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_link",
+            "product",
+            ["link"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_category_id",
+            "product",
+            ["category_id"],
+            unique=False,
+            postgresql_where=ACTIVE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_store_id_import_date",
+            "product",
+            ["store_id", "import_date"],
+            unique=False,
+            postgresql_where=ACTIVE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_product_popularity",
+            "product",
+            ["recent_click_count", "click_count", "id"],
+            unique=False,
+            postgresql_where=ACTIVE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_category_name_trgm",
+            "category",
+            ["name"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_used_product_name_trgm",
+            "used_product",
+            [sa.text("lower(name) gin_trgm_ops")],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_where=sa.text("is_active IS TRUE AND is_available IS TRUE"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_price_history_product_id_created_at",
+            "price_history",
+            ["product_id", "created_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_price_history_product_id",
+            table_name="price_history",
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_clicked_product_product_id"),
+            "clicked_product",
+            ["product_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_clicked_product_product_id"), table_name="clicked_product")
+    op.create_index(
+        "ix_price_history_product_id", "price_history", ["product_id"], unique=False
+    )
+    op.drop_index("ix_price_history_product_id_created_at", table_name="price_history")
+    op.drop_index("ix_used_product_name_trgm", table_name="used_product")
+    op.drop_index("ix_category_name_trgm", table_name="category")
+    op.drop_index("ix_product_popularity", table_name="product")
+    op.drop_index("ix_product_store_id_import_date", table_name="product")
+    op.drop_index("ix_product_category_id", table_name="product")
+    op.drop_index("ix_product_link", table_name="product")
+    op.drop_index("ix_product_name_trgm", table_name="product")
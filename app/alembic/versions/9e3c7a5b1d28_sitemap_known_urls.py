@@ -0,0 +1,74 @@
+"""sitemap known urls
+
+Revision ID: 9e3c7a5b1d28
+Revises: f2b6d9a4c813
+Create Date: 2026-10-18 19:02:37.651902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "9e3c7a5b1d28"
+down_revision = "f2b6d9a4c813"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "store_sitemap",
+        sa.Column(
+            "known_urls",
+            sa.LargeBinary(),
+            nullable=True,
+            comment="8 bytes blake2b hashes and 4 bytes lastmod of the URLs "
+            "already imported",
+        ),
+    )
+    # The URLs imported so far were imported as of the sitemap watermark, its
+    # seconds are appended as 4 bytes big endian to every hash
+    op.execute(
+        """
+        UPDATE store_sitemap SET known_urls = (
+            SELECT string_agg(
+                substring(known_url_hashes FROM i FOR 8)
+                || substring(
+                    int8send(
+                        least(greatest(coalesce(
+                            extract(epoch FROM last_imported_lastmod)::bigint, 0
+                        ), 0), 4294967295)
+                    ) FROM 5 FOR 4
+                ),
+                ''::bytea ORDER BY i
+            )
+            FROM generate_series(1, length(known_url_hashes), 8) AS i
+        )
+        WHERE known_url_hashes IS NOT NULL
+        """
+    )
+    op.drop_column("store_sitemap", "known_url_hashes")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "store_sitemap",
+        sa.Column(
+            "known_url_hashes",
+            sa.LargeBinary(),
+            nullable=True,
+            comment="8 bytes blake2b hashes of the URLs already imported",
+        ),
+    )
+    op.execute(
+        """
+        UPDATE store_sitemap SET known_url_hashes = (
+            SELECT string_agg(substring(known_urls FROM i FOR 8), ''::bytea ORDER BY i)
+            FROM generate_series(1, length(known_urls), 12) AS i
+        )
+        WHERE known_urls IS NOT NULL
+        """
+    )
+    op.drop_column("store_sitemap", "known_urls")
@@ -0,0 +1,55 @@
+"""product due at index
+
+Revision ID: f2b6d9a4c813
+Revises: a1f5d3b8c274
+Create Date: 2026-10-18 18:20:11.417508
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = "f2b6d9a4c813"
+down_revision = "a1f5d3b8c274"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The products never scheduled are due first, coalesce(...) instead of
+    # next_check_at so that the scheduler query still reads them off the index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_product_due_at",
+            "product",
+            [sa.text("coalesce(next_check_at, '-infinity'::timestamp)")],
+            unique=False,
+            postgresql_where=sa.text("is_active IS TRUE"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_product_next_check_at",
+            table_name="product",
+            postgresql_where=sa.text("is_active IS TRUE"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_product_next_check_at",
+            "product",
+            ["next_check_at"],
+            unique=False,
+            postgresql_where=sa.text("is_active IS TRUE"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_product_due_at",
+            table_name="product",
+            postgresql_where=sa.text("is_active IS TRUE"),
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,25 @@
+from typing import Any, Tuple
+
+from starlette.requests import Request
+
+from web.core.cache import response_cache
+
+
+class InvalidateResponsesMixin:
+    """Invalidate the cached API responses showing the model after each change"""
+
+    cache_tags: Tuple[str, ...] = ()
+
+    async def _invalidate_responses(self, request: Request):
+        await response_cache.publish_invalidation(
+            request.state.session, *self.cache_tags
+        )
+
+    async def after_create(self, request: Request, obj: Any):
+        await self._invalidate_responses(request)
+
+    async def after_edit(self, request: Request, obj: Any):
+        await self._invalidate_responses(request)
+
+    async def after_delete(self, request: Request, obj: Any):
+        await self._invalidate_responses(request)
@@ -1,16 +1,20 @@
 from starlette_admin.contrib.sqlmodel import ModelView
 
+from web.admin.cache import InvalidateResponsesMixin
+from web.core.cache import STORES
 from web.models.geo import Continent, Country
 
 
-class ContinentView(ModelView):
+class ContinentView(InvalidateResponsesMixin, ModelView):
+    cache_tags = (STORES,)
     fields = [
         Continent.is_active,
         Continent.name,
     ]
 
 
-class CountryView(ModelView):
+class CountryView(InvalidateResponsesMixin, ModelView):
+    cache_tags = (STORES,)
     label = "Countries"
     fields = [
         Country.is_active,
@@ -1,13 +1,16 @@
 from starlette.requests import Request
 from starlette_admin.contrib.sqlmodel import ModelView
 
+from web.admin.cache import InvalidateResponsesMixin
+from web.core.cache import BRANDS, CATEGORIES, STORES
 from web.logger import get_logger
 from web.models.product import Product, Brand
 
 logger = get_logger(__name__)
 
 
-class BrandView(ModelView):
+class BrandView(InvalidateResponsesMixin, ModelView):
+    cache_tags = (BRANDS,)
     fields = [
         Brand.is_active,
         Brand.name,
@@ -18,7 +21,9 @@ class BrandView(ModelView):
     exclude_fields_from_list = [Brand.logo]
 
 
-class ProductView(ModelView):
+class ProductView(InvalidateResponsesMixin, ModelView):
+    cache_tags = (STORES,)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.pk_attr = "public_id"
@@ -65,7 +70,8 @@ class ProductView(ModelView):
         return False
 
 
-class CategoryView(ModelView):
+class CategoryView(InvalidateResponsesMixin, ModelView):
+    cache_tags = (CATEGORIES,)
     label = "Categories"
     fields = ["created_at", "is_active", "slug", "name", "name_it", "parent"]
     exclude_fields_from_list = ["created_at", "is_active", "parent"]
@@ -1,5 +1,13 @@
+from typing import Any
+
+from sqlalchemy import update
+from starlette.requests import Request
 from starlette_admin.contrib.sqlmodel import ModelView
 
+from web.manager.shipping import shipping_index
+from web.manager.store import StoreManager
+from web.models.product import Product
+
 
 class ShippingMethodView(ModelView):
     exclude_fields_from_list = [
@@ -14,3 +22,26 @@ class ShippingMethodView(ModelView):
     exclude_fields_from_detail = ["store", "products"]
     exclude_fields_from_edit = ["store", "products"]
     exclude_fields_from_create = ["products"]
+
+    async def _refresh_store(self, request: Request, obj: Any):
+        shipping_index.invalidate(obj.store_id)
+        await StoreManager.update_best_shipping_methods(
+            request.state.session, store_id=obj.store_id
+        )
+
+    async def after_create(self, request: Request, obj: Any):
+        await self._refresh_store(request, obj)
+
+    async def after_edit(self, request: Request, obj: Any):
+        await self._refresh_store(request, obj)
+
+    async def before_delete(self, request: Request, obj: Any):
+        # Committed with the delete, the products get a new method right after
+        await request.state.session.execute(
+            update(Product)
+            .where(Product.best_shipping_method_id == obj.id)
+            .values(best_shipping_method_id=None)
+        )
+
+    async def after_delete(self, request: Request, obj: Any):
+        await self._refresh_store(request, obj)
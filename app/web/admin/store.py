@@ -1,12 +1,15 @@
 from starlette_admin.contrib.sqlmodel import ModelView
 
+from web.admin.cache import InvalidateResponsesMixin
+from web.core.cache import STORES
 from web.logger import get_logger
 from web.models.store import Store
 
 logger = get_logger(__name__)
 
 
-class StoreView(ModelView):
+class StoreView(InvalidateResponsesMixin, ModelView):
+    cache_tags = (STORES,)
     page_size = 25
     actions = ["delete"]
 
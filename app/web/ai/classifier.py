@@ -1,6 +1,6 @@
 import json
 from json import JSONDecodeError
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 
 import backoff
 from openai import APIError, APITimeoutError, RateLimitError, AsyncOpenAI
@@ -11,6 +11,19 @@ from web.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Categories of a batch of product names, in the order of the names
+Classify = Callable[[List[str]], Awaitable[Optional[List[Optional[Dict[str, str]]]]]]
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_client() -> AsyncOpenAI:
+    """The OpenAI client shared by the completions, with its connection pool"""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    return _client
+
 
 @backoff.on_exception(
     backoff.expo,
@@ -22,8 +35,7 @@ async def chat_completion(
     user_prompt: str,
     model: str = "gpt-3.5-turbo",
 ):
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    response = await client.chat.completions.create(
+    response = await get_client().chat.completions.create(
         model=model,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -43,13 +55,68 @@ async def chat_completion(
     return output
 
 
-async def classify_product_category(product_name: str) -> Optional[Dict[str, str]]:
+def parse_categories(
+    output: Optional[str], *, expected: int
+) -> Optional[List[Optional[Dict[str, str]]]]:
+    """The categories of a batch answer, None if the answer is not usable.
+
+    A name without a primary category gets None, the name could not be
+    categorized.
+    """
     try:
-        return json.loads(
-            await chat_completion(
-                CLASSIFY_CATEGORIES,
-                f'"{product_name}"',
-            )
-        )
+        data = json.loads(output)
     except (JSONDecodeError, TypeError) as e:
-        logger.error(e)
+        logger.error(f"Invalid categories {output!r}: {e}")
+        return None
+    if not isinstance(data, list) or len(data) != expected:
+        logger.error(f"Expected {expected} categories, got {output!r}")
+        return None
+
+    categories = []
+    for item in data:
+        if isinstance(item, dict) and isinstance(item.get("primary"), str):
+            secondary = item.get("secondary")
+            categories.append(
+                {
+                    "primary": item["primary"],
+                    "secondary": secondary if isinstance(secondary, str) else None,
+                }
+            )
+        else:
+            categories.append(None)
+    return categories
+
+
+async def classify_product_categories(
+    product_names: List[str],
+) -> Optional[List[Optional[Dict[str, str]]]]:
+    """Classify the names with one completion, in the order of the names"""
+    output = await chat_completion(
+        CLASSIFY_CATEGORIES, json.dumps(product_names, ensure_ascii=False)
+    )
+    return parse_categories(output, expected=len(product_names))
+
+
+class StubClassifier:
+    """Offline stand-in of `classify_product_categories` for the tests.
+
+    The first keyword found in a name gives its categories, the names without
+    any keyword are not categorized.
+    """
+
+    def __init__(self, categories: Dict[str, Dict[str, Optional[str]]]):
+        self.categories = categories
+        self.batches: List[List[str]] = []
+
+    async def __call__(
+        self, product_names: List[str]
+    ) -> Optional[List[Optional[Dict[str, str]]]]:
+        self.batches.append(product_names)
+        output = []
+        for name in product_names:
+            match = next(
+                (data for key, data in self.categories.items() if key in name.lower()),
+                None,
+            )
+            output.append(match)
+        return parse_categories(json.dumps(output), expected=len(product_names))
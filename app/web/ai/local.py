@@ -0,0 +1,285 @@
+import math
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from web.ai.classifier import Classify
+from web.core.cache import normalize_query
+from web.core.config import settings
+from web.logger import get_logger
+
+logger = get_logger(__name__)
+
+TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+MOTOR_SIZE = re.compile(r"\b(\d{2})(\d{2})(?:\.\d)?\b")
+INCHES = re.compile(
+    r"\b(\d{1,2})(?:\.\d+)?\s*(?:\"|''|-?inch(?:es)?\b|in\b|x\d)", re.IGNORECASE
+)
+PROP_CODE = re.compile(r"\b(\d)(?:\d{2})(?:\d{2})?\b")
+WHEELBASE = re.compile(r"\b(\d{2,3})\s*mm\b", re.IGNORECASE)
+CELLS = re.compile(r"\b(\d{1,2})\s*s(?:\d+p)?\b", re.IGNORECASE)
+
+
+def motor_size(name: str) -> Optional[str]:
+    """2207 or 2306.5 motors are 22xx and 23xx"""
+    if match := MOTOR_SIZE.search(name):
+        return f"{match.group(1)}xx"
+
+
+def prop_size(name: str) -> Optional[str]:
+    """5", 5 inch, 5.1x3.1x3 or 51433 props are 5-inch"""
+    if match := INCHES.search(name) or PROP_CODE.search(name):
+        return f"{match.group(1)}-inch"
+
+
+def frame_size(name: str) -> Optional[str]:
+    """5" or 5 inch frames are 5-inch, the whoops are sized by wheelbase"""
+    if match := INCHES.search(name):
+        return f"{match.group(1)}-inch"
+    if match := WHEELBASE.search(name):
+        return f"{match.group(1)}mm"
+
+
+def battery_cells(name: str) -> Optional[str]:
+    """6S or 4S1P batteries are 6s and 4s"""
+    if match := CELLS.search(name):
+        return f"{match.group(1)}s"
+
+
+# Primary categories whose secondary is the size found in the name
+SIZE_EXTRACTORS: Dict[str, Callable[[str], Optional[str]]] = {
+    "motors": motor_size,
+    "props": prop_size,
+    "frames": frame_size,
+    "batteries": battery_cells,
+}
+
+
+def features(name: str) -> List[str]:
+    """Words, word pairs, character trigrams and digit shapes (2207 is dddd)"""
+    tokens = TOKEN.findall(normalize_query(name))
+    output = []
+    for i, token in enumerate(tokens):
+        output.append(f"w:{token}")
+        output.append(f"s:{re.sub(r'[0-9]', 'd', token)}")
+        if i:
+            output.append(f"b:{tokens[i - 1]} {token}")
+        padded = f" {token} "
+        output.extend(f"c:{padded[j:j + 3]}" for j in range(len(padded) - 2))
+    return output
+
+
+class HashedNaiveBayes:
+    """Multinomial naive Bayes over hashed features, a linear model in log space.
+
+    Only the (bucket, label) weights seen in training are stored, a prediction
+    walks the weights of the features of the name.
+    """
+
+    def __init__(self, *, buckets: int = 2**20, alpha: float = 0.1):
+        self.mask = buckets - 1
+        self.alpha = alpha
+        self._weights: Dict[int, Dict[str, float]] = {}
+        self._priors: Dict[str, float] = {}
+        self._unseen: Dict[str, float] = {}
+
+    def _buckets(self, name: str) -> List[int]:
+        return [zlib.crc32(f.encode()) & self.mask for f in features(name)]
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "HashedNaiveBayes":
+        counts: Dict[int, Counter] = {}
+        totals: Counter = Counter()
+        documents: Counter = Counter()
+        for name, label in examples:
+            documents[label] += 1
+            for bucket in self._buckets(name):
+                counts.setdefault(bucket, Counter())[label] += 1
+                totals[label] += 1
+
+        vocabulary = len(counts)
+        n_documents = sum(documents.values())
+        self._priors = {
+            label: math.log(count / n_documents) for label, count in documents.items()
+        }
+        self._unseen = {
+            label: math.log(self.alpha / (totals[label] + self.alpha * vocabulary))
+            for label in documents
+        }
+        self._weights = {
+            bucket: {
+                label: math.log((count + self.alpha) / self.alpha)
+                for label, count in labels.items()
+            }
+            for bucket, labels in counts.items()
+        }
+        return self
+
+    @property
+    def labels(self) -> List[str]:
+        return list(self._priors)
+
+    def predict(self, name: str) -> Tuple[Optional[str], float, float]:
+        """The most likely label, its probability and the share of the features
+        of the name seen in training"""
+        buckets = self._buckets(name)
+        if not self._priors or not buckets:
+            return None, 0.0, 0.0
+
+        scores = {
+            label: prior + len(buckets) * self._unseen[label]
+            for label, prior in self._priors.items()
+        }
+        seen = 0
+        for bucket in buckets:
+            if weights := self._weights.get(bucket):
+                seen += 1
+                for label, weight in weights.items():
+                    scores[label] += weight
+
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        probability = 1 / sum(math.exp(score - top) for score in scores.values())
+        return best, probability, seen / len(buckets)
+
+
+class Prediction(NamedTuple):
+    primary: str
+    secondary: Optional[str]
+    confidence: float
+
+
+class LocalClassifier:
+    """Categorize the names in process, returning None when not confident.
+
+    The model predicts the primary category, and for the categories sized by
+    the name (motors, props, frames, batteries) the secondary comes from the
+    rules. For the others the model predicts the pair.
+    """
+
+    # The probabilities of naive Bayes are meaningless for names made of words
+    # it has not seen
+    MIN_SEEN_FEATURES = 0.5
+
+    def __init__(
+        self, *, min_confidence: float = settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+    ):
+        self.min_confidence = min_confidence
+        self.model = HashedNaiveBayes()
+
+    @staticmethod
+    def label(primary: str, secondary: Optional[str]) -> str:
+        if primary in SIZE_EXTRACTORS or not secondary:
+            return primary
+        return f"{primary}/{secondary}"
+
+    def fit(
+        self, examples: Iterable[Tuple[str, str, Optional[str]]]
+    ) -> "LocalClassifier":
+        """Learn from the (name, primary, secondary) of the categorized products"""
+        self.model.fit(
+            (name, self.label(primary, secondary))
+            for name, primary, secondary in examples
+        )
+        logger.info(f"Local classifier trained on {len(self.model.labels)} labels")
+        return self
+
+    def predict(self, name: str) -> Optional[Prediction]:
+        label, confidence, seen = self.model.predict(name)
+        if (
+            label is None
+            or confidence < self.min_confidence
+            or seen < self.MIN_SEEN_FEATURES
+        ):
+            return None
+
+        primary, _, secondary = label.partition("/")
+        if extract := SIZE_EXTRACTORS.get(primary):
+            secondary = extract(name)
+            if secondary is None:
+                return None
+        return Prediction(primary, secondary or None, confidence)
+
+
+class LocalFirstClassifier:
+    """A `Classify` answering from the local classifier, the names it is not
+    confident about are sent to `fallback` in one batch"""
+
+    def __init__(self, local: LocalClassifier, fallback: Classify):
+        self.local = local
+        self.fallback = fallback
+        self.local_names = 0
+        self.fallback_names = 0
+
+    async def __call__(
+        self, product_names: List[str]
+    ) -> Optional[List[Optional[Dict[str, str]]]]:
+        categories: List[Optional[Dict[str, str]]] = []
+        unsure = []
+        for i, name in enumerate(product_names):
+            prediction = self.local.predict(name)
+            if prediction is None:
+                unsure.append(i)
+                categories.append(None)
+            else:
+                categories.append(
+                    {"primary": prediction.primary, "secondary": prediction.secondary}
+                )
+        self.local_names += len(product_names) - len(unsure)
+        if not unsure:
+            return categories
+
+        self.fallback_names += len(unsure)
+        fallback = await self.fallback([product_names[i] for i in unsure])
+        if fallback is None:
+            return None
+        for i, data in zip(unsure, fallback):
+            categories[i] = data
+        return categories
+
+
+class Evaluation(NamedTuple):
+    examples: int
+    # Share of the names answered locally, and how many of those were right
+    coverage: float
+    accuracy: float
+    # Accuracy of the model forced to answer every name
+    overall_accuracy: float
+    names_per_second: float
+
+
+def evaluate(
+    classifier: LocalClassifier,
+    examples: List[Tuple[str, str, Optional[str]]],
+    *,
+    holdout: float = 0.2,
+) -> Evaluation:
+    """Train on the examples except every 1/holdout-th one, and test on those"""
+    step = round(1 / holdout)
+    train = [e for i, e in enumerate(examples) if i % step]
+    test = [e for i, e in enumerate(examples) if not i % step]
+    classifier.fit(train)
+
+    start = time.perf_counter()
+    predictions = [classifier.predict(name) for name, _, _ in test]
+    elapsed = time.perf_counter() - start
+
+    answered = correct = overall = 0
+    for (name, primary, secondary), prediction in zip(test, predictions):
+        label, _, _ = classifier.model.predict(name)
+        overall += label == classifier.label(primary, secondary)
+        if prediction is not None:
+            answered += 1
+            correct += (prediction.primary, prediction.secondary) == (
+                primary,
+                secondary,
+            )
+    return Evaluation(
+        examples=len(test),
+        coverage=answered / len(test) if test else 0.0,
+        accuracy=correct / answered if answered else 0.0,
+        overall_accuracy=overall / len(test) if test else 0.0,
+        names_per_second=len(test) / elapsed if elapsed else 0.0,
+    )
@@ -1,8 +1,9 @@
 CLASSIFY_CATEGORIES = """
 You are the owner of an FPV e-commerce website. 
-Your task is to classify the product primary category and secondary category based on 
-the provided product name. The product name will be delimited with quotes. 
-Provide your output in json format with the keys: primary and secondary. 
+Your task is to classify the primary category and secondary category of each product
+of the provided JSON array of product names.
+Provide your output as a JSON array in the same order as the names, with one json
+object per product name with the keys: primary and secondary.
 The values should be slugs, so no spaces and all lowercase.
 
 Primary categories: electronics, fpv-gear, radio, frames, motors, props, batteries, pre-built-drones, hardware, tools, action-cameras, swag, accessories.
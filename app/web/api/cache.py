@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Iterable, Tuple
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette import status
+
+from web.core.cache import ResponseCache, etag_matches, make_etag, response_cache
+from web.core.config import settings
+
+EXCLUDED_HEADERS = {"content-length", "content-type"}
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: int
+    max_age: int
+    tags: Tuple[str, ...]
+
+    @property
+    def cache_control(self) -> str:
+        return f"public, max-age={self.max_age}"
+
+
+def cache_response(
+    *,
+    ttl: int,
+    tags: Iterable[str] = (),
+    max_age: int = settings.RESPONSE_CACHE_MAX_AGE_SECONDS,
+):
+    """Cache the responses of a route of a router using `CachedRoute`"""
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__cache_policy__ = CachePolicy(ttl, min(max_age, ttl), tuple(tags))
+        return endpoint
+
+    return decorator
+
+
+class CachedRoute(APIRoute):
+    """Serve the successful responses of the `cache_response` routes from cache.
+
+    The responses carry a strong ETag and a `Cache-Control`, a request with a
+    matching `If-None-Match` gets a `304 Not Modified` without a body.
+    """
+
+    cache: ResponseCache = response_cache
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        policy: CachePolicy = getattr(self.endpoint, "__cache_policy__", None)
+        if policy is None:
+            return handler
+
+        async def cached_handler(request: Request) -> Response:
+            query = "&".join(
+                f"{name}={value}"
+                for name, value in sorted(request.query_params.multi_items())
+            )
+            key = self.cache.key(request.url.path, query, tags=policy.tags)
+            entry = await self.cache.get(key)
+            if entry is None:
+                response = await handler(request)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = {
+                    "body": response.body.decode(),
+                    "media_type": response.media_type,
+                    "etag": make_etag(response.body),
+                    "headers": {
+                        name: value
+                        for name, value in response.headers.items()
+                        if name not in EXCLUDED_HEADERS
+                    },
+                }
+                await self.cache.set(key, entry, ttl=policy.ttl)
+
+            headers = {
+                **entry["headers"],
+                "ETag": entry["etag"],
+                "Cache-Control": policy.cache_control,
+            }
+            if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(
+                content=entry["body"], media_type=entry["media_type"], headers=headers
+            )
+
+        return cached_handler
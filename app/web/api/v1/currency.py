@@ -3,12 +3,15 @@ from sqlmodel import select
 from starlette import status
 
 from web.api import deps
+from web.api.cache import CachedRoute, cache_response
+from web.core.cache import RATES
 from web.models.utils import ExchangeRate
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 @router.get("/rates/{currency}", response_model=ExchangeRate)
+@cache_response(ttl=60 * 60, tags=[RATES])
 async def get_currency(currency: str, db=Depends(deps.get_db)):
     stmt = select(ExchangeRate).where(ExchangeRate.currency == currency)
     currency = (await db.execute(stmt)).scalar_one_or_none()
@@ -1,30 +1,50 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from web.api import deps
+from web.api.cache import CachedRoute, cache_response
+from web.core.cache import STORES
 from web.manager.geo import GeoManager
 from web.logger import get_logger
 from web.models.geo import CountryRead, ContinentRead
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 logger = get_logger(__name__)
 
 
 @router.get("/countries", response_model=List[CountryRead])
+@cache_response(ttl=60 * 60, tags=[STORES])
 async def get_countries(
-    db: AsyncSession = Depends(deps.get_db), skip: int = 0, limit: int = 100
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
 ):
-    return await GeoManager.get_countries_with_active_stores(db, limit=limit, skip=skip)
+    page = await GeoManager.get_countries_with_active_stores(
+        db, limit=limit, skip=skip, cursor=cursor
+    )
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
 
 
 @router.get("/continents", response_model=List[ContinentRead])
+@cache_response(ttl=60 * 60, tags=[STORES])
 async def get_continents(
-    db: AsyncSession = Depends(deps.get_db), skip: int = 0, limit: int = 100
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
 ):
-    return await GeoManager.get_continents_with_active_stores(
-        db, limit=limit, skip=skip
+    page = await GeoManager.get_continents_with_active_stores(
+        db, limit=limit, skip=skip, cursor=cursor
     )
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
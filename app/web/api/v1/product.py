@@ -1,25 +1,41 @@
 import asyncio
-from datetime import datetime, timedelta
 from typing import List, Optional, Annotated
 
-from fastapi import APIRouter, Depends, Query, HTTPException, UploadFile, File
-from sqlalchemy import func, desc, asc, Date
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    HTTPException,
+    UploadFile,
+    File,
+    Response,
+)
+from sqlalchemy import func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from sqlmodel import select, cast
+from sqlmodel import select
 from starlette import status
 
 from web.api import deps
+from web.api.cache import CachedRoute, cache_response
+from web.core.cache import (
+    BRANDS,
+    CATEGORIES,
+    CLICKS,
+    normalize_query,
+    search_cache,
+)
 from web.core.config import settings
 from web.core.utils import async_upload_to_do_spaces
+from web.manager.autocomplete import autocomplete as autocomplete_index
+from web.manager.clicks import click_buffer
 from web.manager.product import ProductManager, CategoryManager
 from web.logger import get_logger
 from web.models.enums import Currency
-from web.models.generics import PaginatedResponse
+from web.models.generics import GenericResponse, PaginatedResponse
 from web.models.product import (
     Product,
     Brand,
-    PriceHistory,
     Category,
     UsedProduct,
     UsedProductPicture,
@@ -37,12 +53,11 @@ from web.models.schemas import (
     UsedProductRead,
     UsedProductCreateResponse,
 )
-from web.models.store import Store
 from web.models.tracking import ClickedProduct, UsedProductView
 from web.models.user import User, FavoriteProduct
 from web.notifications.telegram import post_used_product, USED_PRODUCT_AD
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 logger = get_logger(__name__)
@@ -55,7 +70,12 @@ async def autocomplete(
     offset: int = Query(0, ge=0),
     search: str = None,
 ):
-    return await ProductManager.autocomplete(db, q=search, limit=limit, offset=offset)
+    names = autocomplete_index.search(search, limit=limit, offset=offset)
+    if names is None:
+        return await ProductManager.autocomplete(
+            db, q=search, limit=limit, offset=offset
+        )
+    return [{"name": name} for name in names]
 
 
 @router.get("/products", response_model=PaginatedResponse[ProductRead, CategoryFilter])
@@ -68,8 +88,23 @@ async def get_products(
     is_available: Optional[str] = Query(None),
     continent: Optional[List[int]] = Query(None),
     order_by: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
 ):
-    results, total = await ProductManager.search_products(
+    cache_key = search_cache.key(
+        q,
+        only_verified=only_verified,
+        is_available=is_available,
+        continent=continent,
+        order_by=order_by,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
+    if (cached := await search_cache.get(cache_key)) is not None:
+        return cached
+
+    q = normalize_query(q) or q
+    search = await ProductManager.search_products(
         db,
         q=q,
         only_verified=only_verified,
@@ -78,14 +113,23 @@ async def get_products(
         order_by=order_by,
         limit=limit,
         offset=offset,
+        cursor=cursor,
     )
-    return {
-        "count": total,
-        "offset": offset,
-        "limit": limit,
-        "items": results,
-        "filters": await CategoryManager.get_category_filters(db, q=q),
-    }
+    response = PaginatedResponse[ProductRead, CategoryFilter].model_validate(
+        {
+            "count": search.count,
+            "offset": offset,
+            "limit": limit,
+            "items": search.items,
+            "filters": await CategoryManager.get_category_filters(
+                db, facets=search.facets
+            ),
+            "next_cursor": search.next_cursor,
+        },
+        from_attributes=True,
+    )
+    await search_cache.set(cache_key, response.model_dump(mode="json"))
+    return response
 
 
 @router.get(
@@ -96,48 +140,39 @@ async def get_most_clicked_products(
     db: AsyncSession = Depends(deps.get_db),
     limit: int = Query(5, ge=0),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    with_count: bool = Query(True),
 ):
-    stmt = (
-        select(Product)
-        .join(Store)
-        .outerjoin(ClickedProduct)
-        .where(
-            Product.is_active.is_(True),
-            Store.is_active.is_(True),
-        )
-        .options(selectinload(Product.store))
-        .options(selectinload(Product.best_shipping_method))
-    )
-
-    stmt = stmt.group_by(Product.id).order_by(
-        desc(func.count(ClickedProduct.id)),
+    page = await ProductManager.get_most_clicked_products(
+        db, limit=limit, offset=offset, cursor=cursor, with_count=with_count
     )
-
     return {
-        "count": await db.scalar(select(func.count()).select_from(stmt.subquery())),
+        "count": page.count,
         "offset": offset,
         "limit": limit,
-        "items": (await db.execute(stmt.offset(offset).limit(limit))).scalars().all(),
+        "items": page.items,
+        "next_cursor": page.next_cursor,
     }
 
 
-@router.post("/products/{public_id}/click")
+@router.post(
+    "/products/{public_id}/click",
+    response_model=GenericResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def track_product_click(
     public_id: str,
     clicked_product: ClickedProduct,
     db: AsyncSession = Depends(deps.get_db),
 ):
-    product = (
-        await db.execute(select(Product).where(Product.public_id == public_id))
-    ).scalar_one_or_none()
-    if not product:
+    product_id = await click_buffer.get_product_id(db, public_id=public_id)
+    if not product_id:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    clicked_product.product_id = product.id
-    db.add(clicked_product)
-    await db.commit()
-    await db.refresh(clicked_product)
-    return clicked_product
+    if not click_buffer.add(product_id=product_id, clicked_product=clicked_product):
+        logger.warning(f"Click buffer full, dropped the click on {public_id}")
+        return {"status": "dropped", "message": "Click not tracked"}
+    return {"status": "accepted", "message": "Click queued"}
 
 
 @router.post("/products/{public_id}/missing-data")
@@ -157,6 +192,7 @@ async def deactivate_products_with_missing_data(
 
 
 @router.get("/hot-brands", response_model=List[BrandRead])
+@cache_response(ttl=60 * 60, tags=[BRANDS])
 async def get_hot_brands(db: AsyncSession = Depends(deps.get_db)):
     return (
         (
@@ -173,6 +209,7 @@ async def get_hot_brands(db: AsyncSession = Depends(deps.get_db)):
 
 
 @router.get("/hot-queries", response_model=List[HotQueriesRead])
+@cache_response(ttl=60 * 15, tags=[CLICKS])
 async def get_hot_queries(db: AsyncSession = Depends(deps.get_db)):
     return (
         await db.execute(
@@ -214,18 +251,7 @@ async def get_price_history(
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
 ):
-    stmt = (
-        select(cast(PriceHistory.created_at, Date), func.avg(PriceHistory.price))
-        .join(Product)
-        .where(
-            Product.public_id == public_id,
-            cast(PriceHistory.created_at, Date)
-            >= datetime.utcnow() - timedelta(days=30),
-        )
-        .group_by(cast(PriceHistory.created_at, Date))
-        .order_by(asc(cast(PriceHistory.created_at, Date)))
-    )
-
+    stmt = ProductManager.get_price_history_query(public_id)
     price_history = (await db.execute(stmt)).all()
     return PriceHistoryRead(
         x=[price_date for price_date, _ in price_history],
@@ -235,6 +261,7 @@ async def get_price_history(
 
 
 @router.get("/quick-filters", response_model=List[CategoryRead])
+@cache_response(ttl=60 * 60, tags=[CATEGORIES])
 async def get_quick_filters(db: AsyncSession = Depends(deps.get_db)):
     stmt = select(Category).where(Category.is_hot.is_(True)).limit(6)
     return (await db.execute(stmt)).scalars().all()
@@ -328,14 +355,20 @@ async def get_used_product(
 
 @router.get("/used-products", response_model=List[UsedProductRead])
 async def get_used_products(
+    response: Response,
     db: AsyncSession = Depends(deps.get_db),
     limit: int = Query(20, ge=0),
     offset: int = Query(0, ge=0),
     q: str = Query(None),
+    cursor: Optional[str] = Query(None),
 ):
-    return await ProductManager.search_used_products(
+    page = await ProductManager.search_used_products(
         db,
         q=q,
         limit=limit,
         offset=offset,
+        cursor=cursor,
     )
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
@@ -6,6 +6,8 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from web.api import deps
+from web.api.cache import CachedRoute, cache_response
+from web.core.cache import STORES
 from web.manager.geo import GeoManager
 from web.logger import get_logger
 from web.models.product import Product
@@ -13,13 +15,14 @@ from web.models.schemas import StoreStats, StoreByCountryRead, ShippingMethodRea
 from web.models.shipping import ShippingMethod
 from web.models.store import Store, SuggestedStore
 
-router = APIRouter()
+router = APIRouter(route_class=CachedRoute)
 
 
 logger = get_logger(__name__)
 
 
 @router.get("/stores/stats", response_model=StoreStats)
+@cache_response(ttl=60 * 60, tags=[STORES])
 async def get_stats(db: AsyncSession = Depends(deps.get_db)):
     stores_count = (
         await db.execute(
@@ -48,6 +51,7 @@ async def get_stats(db: AsyncSession = Depends(deps.get_db)):
 
 
 @router.get("/stores-by-country", response_model=List[StoreByCountryRead])
+@cache_response(ttl=60 * 60, tags=[STORES])
 async def get_stores_by_country(db: AsyncSession = Depends(deps.get_db)):
     return await GeoManager.get_countries_and_active_stores(db)
 
@@ -0,0 +1,248 @@
+import hashlib
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from web.core.config import settings
+from web.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_ratio": round(self.hit_ratio, 4)}
+
+
+class CacheBackend(ABC):
+    """Where a cache keeps its values, e.g. in process or on a shared server.
+
+    Values must be JSON serializable so that a shared backend can store them.
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """The value of the key, None when missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, *, ttl: int):
+        """Store the value for `ttl` seconds"""
+
+    @abstractmethod
+    async def clear(self):
+        """Drop all the values"""
+
+    def __len__(self) -> int:
+        return 0
+
+
+class InMemoryCache(CacheBackend):
+    """A per-process cache with TTL expiration and least recently used eviction"""
+
+    def __init__(self, *, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+        self._values: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._values.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._values[key]
+            self.stats.misses += 1
+            return None
+
+        self._values.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, *, ttl: int):
+        self._values[key] = (time.monotonic() + ttl, value)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def clear(self):
+        self._values.clear()
+        self.stats.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def normalize_query(q: Optional[str]) -> str:
+    """Queries differing only by case, spacing or unicode form are the same"""
+    if not q:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", q).casefold().split())
+
+
+def make_key(namespace: str, **params: Any) -> str:
+    parts = []
+    for name, value in sorted(params.items()):
+        if isinstance(value, (list, tuple, set)):
+            value = ",".join(sorted(str(v) for v in value))
+        parts.append(f"{name}={'' if value is None else value}")
+    return f"{namespace}:{'&'.join(parts)}"
+
+
+class SearchCache:
+    """The product search results, keyed by the normalized query and filters.
+
+    Each process has its own in-memory backend unless a shared one is given.
+    The products are written by the cron process, which invalidates the search
+    results of the API processes by publishing the SEARCH tag, see
+    `ResponseCache.publish_invalidation`. Like for the responses, invalidating
+    bumps a generation and the old results age out of the backend.
+    """
+
+    NAMESPACE = "search"
+
+    def __init__(self, backend: CacheBackend, *, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._generation = 0
+
+    @staticmethod
+    def key(q: Optional[str], **filters: Any) -> str:
+        return make_key(SearchCache.NAMESPACE, q=normalize_query(q), **filters)
+
+    def _versioned(self, key: str) -> str:
+        return f"{key}&generation={self._generation}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.backend.get(self._versioned(key))
+
+    async def set(self, key: str, value: Any):
+        await self.backend.set(self._versioned(key), value, ttl=self.ttl)
+
+    def invalidate(self):
+        logger.debug("Invalidating the search cache")
+        self._generation += 1
+        self.backend.stats.invalidations += 1
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self.backend.stats.as_dict(), "size": len(self.backend)}
+
+
+search_cache = SearchCache(
+    InMemoryCache(max_size=settings.SEARCH_CACHE_MAX_SIZE),
+    ttl=settings.SEARCH_CACHE_TTL_SECONDS,
+)
+
+
+def make_etag(body: bytes) -> str:
+    """A strong validator of the exact response body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+# Tags of the cached responses, see `ResponseCache.invalidate`, SEARCH
+# invalidates the search results
+SEARCH = "search"
+STORES = "stores"
+BRANDS = "brands"
+CATEGORIES = "categories"
+CLICKS = "clicks"
+RATES = "rates"
+
+
+class ResponseCache:
+    """Rendered API responses, invalidated by tag.
+
+    Invalidating a tag bumps its generation, which is part of the keys of the
+    routes with that tag, so their old responses are never read again and age
+    out of the backend.
+    """
+
+    NAMESPACE = "response"
+    CHANNEL = "response_cache"
+
+    def __init__(
+        self, backend: CacheBackend, *, search: Optional[SearchCache] = None
+    ):
+        self.backend = backend
+        self.search = search
+        self._generations: Dict[str, int] = {}
+
+    def key(self, path: str, query: str, *, tags: Iterable[str]) -> str:
+        generations = {f"tag_{tag}": self._generations.get(tag, 0) for tag in tags}
+        return make_key(self.NAMESPACE, path=path, query=query, **generations)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value: Dict[str, Any], *, ttl: int):
+        await self.backend.set(key, value, ttl=ttl)
+
+    def invalidate(self, *tags: str):
+        logger.debug(f"Invalidating the cached responses of {tags}")
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        self.backend.stats.invalidations += 1
+        if SEARCH in tags and self.search is not None:
+            self.search.invalidate()
+
+    async def publish_invalidation(self, db: AsyncSession, *tags: str):
+        """Invalidate the tags in every process listening to the database.
+
+        The cron tasks run in their own process, the API processes receive the
+        tags through `NOTIFY` once the transaction commits.
+        """
+        self.invalidate(*tags)
+        await db.execute(select(func.pg_notify(self.CHANNEL, ",".join(tags))))
+        await db.commit()
+
+    async def listen(self, engine: AsyncEngine) -> AsyncConnection:
+        """Apply the invalidations published by the other processes"""
+
+        def on_notification(connection, pid, channel, payload):
+            self.invalidate(*payload.split(","))
+
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.add_listener(self.CHANNEL, on_notification)
+        return conn
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self.backend.stats.as_dict(), "size": len(self.backend)}
+
+
+response_cache = ResponseCache(
+    InMemoryCache(max_size=settings.RESPONSE_CACHE_MAX_SIZE), search=search_cache
+)
@@ -83,6 +83,93 @@ class Settings(BaseSettings):
     FREE_CURRENCIES_API_URL: str | None = os.getenv("FREE_CURRENCIES_API_URL")
     FREE_CURRENCIES_API_KEY: str | None = os.getenv("FREE_CURRENCIES_API_KEY")
 
+    # Shared HTTP client used by the scrapers and the notifiers
+    HTTP_CONNECTION_LIMIT: int = 100
+    HTTP_CONNECTION_LIMIT_PER_HOST: int = 8
+    HTTP_DNS_CACHE_TTL_SECONDS: int = 60 * 10  # = 10 minutes
+    HTTP_KEEPALIVE_TIMEOUT_SECONDS: int = 30
+    HTTP_TIMEOUT_SECONDS: int = 60
+
+    # Product update pipeline
+    SCRAPER_MAX_CONCURRENT_STORES: int = 8
+    SCRAPER_MAX_CONCURRENT_REQUESTS_PER_STORE: int = 2
+    SCRAPER_WRITE_QUEUE_SIZE: int = 100
+    # "lxml" streams the page and stops once all the fields are found,
+    # "html.parser" builds the whole BeautifulSoup tree as it used to
+    SCRAPER_HTML_PARSER: str = "lxml"
+    # Processes parsing the pages off the event loop, 0 parses them inline
+    SCRAPER_PARSE_WORKERS: int = 0
+    # Requests per second to each store domain, raised by POLITENESS_RATE_INCREASE
+    # after every successful response and multiplied by POLITENESS_RATE_DECREASE
+    # on a 429 or 503, which also stops the requests for its Retry-After or for
+    # POLITENESS_BACKOFF_SECONDS doubled on each consecutive one. The requests to
+    # a domain stopped for longer than POLITENESS_MAX_WAIT_SECONDS are skipped
+    POLITENESS_INITIAL_RATE: float = 2.0
+    POLITENESS_MIN_RATE: float = 0.1
+    POLITENESS_MAX_RATE: float = 8.0
+    POLITENESS_BURST: int = 2
+    POLITENESS_RATE_INCREASE: float = 0.1
+    POLITENESS_RATE_DECREASE: float = 0.5
+    POLITENESS_BACKOFF_SECONDS: int = 30
+    POLITENESS_MAX_BACKOFF_SECONDS: int = 60 * 60  # = 1 hour
+    POLITENESS_MAX_WAIT_SECONDS: int = 60
+    # Scraped products written by each INSERT ... ON CONFLICT transaction
+    PRODUCT_WRITE_CHUNK_SIZE: int = 100
+    # Products scraped again when due, at most SCHEDULER_PAGES_PER_HOUR spread
+    # over a tick every SCHEDULER_TICK_MINUTES. A product is checked every
+    # SCHEDULER_MAX_INTERVAL_HOURS, more often when its price moves, when it is
+    # popular or when its availability changed, see `check_interval`. The
+    # category facets and the API caches are refreshed once
+    # SCHEDULER_REFRESH_PRODUCTS were updated, or every SCHEDULER_REFRESH_SECONDS
+    SCHEDULER_PAGES_PER_HOUR: int = 2000
+    SCHEDULER_TICK_MINUTES: int = 5
+    SCHEDULER_MIN_INTERVAL_HOURS: int = 2
+    SCHEDULER_MAX_INTERVAL_HOURS: int = 24
+    SCHEDULER_VOLATILITY_DAYS: int = 30
+    SCHEDULER_REFRESH_PRODUCTS: int = 1000
+    SCHEDULER_REFRESH_SECONDS: int = 60 * 60  # = 1 hour
+    # New product names classified in the background, CATEGORIZE_BATCH_SIZE names
+    # per chat completion
+    CATEGORIZE_BATCH_SIZE: int = 40
+    CATEGORIZE_MAX_PRODUCTS: int = 1000
+    CATEGORIZE_INTERVAL_SECONDS: int = 60 * 5  # = 5 minutes
+    # Names categorized in process when the local classifier is this confident,
+    # it is trained on the categorized products once there are enough of them
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.95
+    LOCAL_CLASSIFIER_MIN_EXAMPLES: int = 500
+    LOCAL_CLASSIFIER_RETRAIN_SECONDS: int = 60 * 60 * 6  # = 6 hours
+
+    # Clicks counted by Product.recent_click_count
+    POPULARITY_WINDOW_DAYS: int = 30
+    # Clicks queued by each API process and written in batches, the clicks
+    # past CLICK_BUFFER_MAX_SIZE are dropped
+    CLICK_BUFFER_MAX_SIZE: int = 10_000
+    CLICK_BUFFER_BATCH_SIZE: int = 500
+    CLICK_BUFFER_FLUSH_INTERVAL_MS: int = 1000
+    # Product ids of the clicked public ids cached by each API process
+    CLICK_PRODUCT_IDS_MAX_SIZE: int = 5000
+    CLICK_PRODUCT_IDS_TTL_SECONDS: int = 60 * 60  # = 1 hour
+
+    # Product search results cached by each API process, invalidated when the
+    # update tasks finish a store, at most every SEARCH_CACHE_INVALIDATION_SECONDS
+    SEARCH_CACHE_TTL_SECONDS: int = 60 * 5  # = 5 minutes
+    SEARCH_CACHE_MAX_SIZE: int = 1000
+    SEARCH_CACHE_INVALIDATION_SECONDS: int = 60
+    # Responses of the near-static endpoints cached by each API process, the
+    # browsers revalidate them with their ETag after RESPONSE_CACHE_MAX_AGE
+    RESPONSE_CACHE_MAX_SIZE: int = 500
+    RESPONSE_CACHE_MAX_AGE_SECONDS: int = 60
+    # pg_trgm thresholds of the `%` and `<<%` operators, set on each connection
+    # so that the search predicates can use the trigram indexes
+    SEARCH_SIMILARITY_THRESHOLD: float = 0.1
+    SEARCH_STRICT_WORD_SIMILARITY_THRESHOLD: float = 0.65
+    # Autocomplete index rebuilt by each API process
+    AUTOCOMPLETE_REFRESH_SECONDS: int = 60 * 10  # = 10 minutes
+
+    # Headless browser used for the stores that need javascript
+    BROWSER_POOL_SIZE: int = 2
+    BROWSER_PAGE_MAX_NAVIGATIONS: int = 50
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+from web.core.config import settings
+from web.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class HTTPClient:
+    """Long-lived aiohttp session shared by every outgoing request of the process.
+
+    Connections are pooled per host and kept alive between requests, DNS
+    lookups are cached and responses are transparently decompressed.
+    """
+
+    DEFAULT_HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+    def __init__(
+        self,
+        *,
+        limit: int = settings.HTTP_CONNECTION_LIMIT,
+        limit_per_host: int = settings.HTTP_CONNECTION_LIMIT_PER_HOST,
+        dns_cache_ttl: int = settings.HTTP_DNS_CACHE_TTL_SECONDS,
+        keepalive_timeout: int = settings.HTTP_KEEPALIVE_TIMEOUT_SECONDS,
+        timeout: int = settings.HTTP_TIMEOUT_SECONDS,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True,
+        )
+        logger.debug(
+            f"Opening HTTP connection pool {self.limit=} {self.limit_per_host=}"
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=self.DEFAULT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            auto_decompress=True,
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled session, (re)opened on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            self._discard_session()
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    def _discard_session(self):
+        """Close the session of another loop, it cannot be awaited from this one"""
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if session.closed:
+            return
+
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            # Its loop is gone, as are the connections of the pool
+            session.detach()
+        logger.debug("Discarded the HTTP connection pool of a previous loop")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+http_client = HTTPClient()
@@ -1,23 +1,26 @@
 import asyncio
+import signal
 
 from aiocron import crontab
 
 from web.core.config import settings
+from web.core.http import http_client
 from web.logger import get_logger
+from web.tasks.browser import browser_pool
+from web.tasks.categorizer import categorizer
+from web.tasks.extraction import parse_executor
 from web.tasks.notifications import (  # noqa
     notify_price_change_from_favorite_products,
     report_affiliated_clicks,
 )
 from web.tasks.product import (  # noqa
-    europe_update,
-    america_update,
-    asia_update,
-    oceania_update,
+    update_due_products,
     america_import,
     europe_import,
     asia_import,
     oceania_import,
 )
+from web.tasks.tracking import rollup_click_counts  # noqa
 
 logger = get_logger(__name__)
 
@@ -29,4 +32,14 @@ async def test_cron_job():
 
 if __name__ == "__main__":
     logger.info(f"Running {__file__} in {settings.ENV}")
-    asyncio.get_event_loop().run_forever()
+    loop = asyncio.get_event_loop()
+    loop.create_task(categorizer.run())
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(http_client.close())
+        loop.run_until_complete(browser_pool.close())
+        parse_executor.close()
@@ -8,7 +8,19 @@ from web.core.config import settings
 if "pytest" in modules:
     settings.DATABASE_URI += "_test"
 
-engine = create_async_engine(str(settings.DATABASE_URI), echo=False, future=True)
+engine = create_async_engine(
+    str(settings.DATABASE_URI),
+    echo=False,
+    future=True,
+    connect_args={
+        "server_settings": {
+            "pg_trgm.similarity_threshold": str(settings.SEARCH_SIMILARITY_THRESHOLD),
+            "pg_trgm.strict_word_similarity_threshold": str(
+                settings.SEARCH_STRICT_WORD_SIMILARITY_THRESHOLD
+            ),
+        }
+    },
+)
 
 
 async def get_async_session() -> AsyncSession:
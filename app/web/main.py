@@ -1,12 +1,21 @@
+import asyncio
 from typing import List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette import status
 from starlette.middleware import Middleware
 
 from web.api.v1.router import api_router
+from web.core.cache import response_cache, search_cache
 from web.core.config import settings
+from web.core.http import http_client
+from web.db import engine
 from web.logger import get_logger
+from web.manager.autocomplete import autocomplete
+from web.manager.clicks import click_buffer
+from web.manager.pagination import InvalidCursor
 from web.models.generics import HealthCheck
 
 logger = get_logger(__name__)
@@ -24,6 +33,8 @@ def make_middleware() -> List[Middleware]:
                 allow_credentials=True,
                 allow_methods=["*"],
                 allow_headers=["*"],
+                # The next page of the cursor paginated lists without an envelope
+                expose_headers=["X-Next-Cursor"],
                 max_age=3600,
             )
         )
@@ -51,6 +62,48 @@ app = create_app()
 from web.admin import admin  # noqa
 
 
+@app.on_event("startup")
+async def start_autocomplete():
+    app.state.autocomplete_task = asyncio.create_task(autocomplete.run())
+
+
+@app.on_event("shutdown")
+async def stop_autocomplete():
+    app.state.autocomplete_task.cancel()
+
+
+@app.on_event("startup")
+async def start_click_buffer():
+    click_buffer.start()
+
+
+@app.on_event("shutdown")
+async def drain_click_buffer():
+    await click_buffer.stop()
+
+
+@app.on_event("startup")
+async def listen_for_cache_invalidations():
+    app.state.cache_listener = await response_cache.listen(engine)
+
+
+@app.on_event("shutdown")
+async def stop_listening_for_cache_invalidations():
+    await app.state.cache_listener.close()
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.close()
+
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)}
+    )
+
+
 @app.get("/", response_model=HealthCheck, tags=["status"])
 async def health_check():
     return {
@@ -58,3 +111,13 @@ async def health_check():
         "version": settings.VERSION,
         "status": "ok",
     }
+
+
+@app.get("/cache", tags=["status"])
+async def cache_stats():
+    return {"search": search_cache.stats, "responses": response_cache.stats}
+
+
+@app.get("/clicks", tags=["status"])
+async def click_buffer_stats():
+    return click_buffer.metrics
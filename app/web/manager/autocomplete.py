@@ -0,0 +1,180 @@
+import asyncio
+import heapq
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Container, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.core.cache import normalize_query
+from web.core.config import settings
+from web.db import engine
+from web.logger import get_logger
+from web.manager.product import ProductManager
+
+logger = get_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(TOKEN_PATTERN.findall(normalize_query(text)))
+
+
+def trigrams(token: str) -> Set[str]:
+    """The trigrams of a word padded as pg_trgm does"""
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """Product and category names searchable by the prefixes of their words.
+
+    The names are numbered by descending popularity, so the best matches are
+    always the lowest ids. Queries of a single short prefix are precomputed,
+    a word without any prefix match falls back to its trigram similarity.
+    """
+
+    SHORT_PREFIX = 3
+    TOP_SIZE = 50
+    MIN_SIMILARITY = 0.3
+
+    def __init__(self, entries: Iterable[Tuple[str, int]]):
+        merged: Dict[Tuple[str, ...], Tuple[int, str]] = {}
+        for name, weight in entries:
+            tokens, weight = tokenize(name), weight or 0
+            if tokens and (tokens not in merged or weight > merged[tokens][0]):
+                merged[tokens] = (weight, name)
+
+        ranked = sorted(
+            merged.items(), key=lambda item: (-item[1][0], len(item[1][1]), item[1][1])
+        )
+        self.names: List[str] = [name for _, (_, name) in ranked]
+        self.tokens: List[str] = sorted({t for tokens, _ in ranked for t in tokens})
+        position = {token: i for i, token in enumerate(self.tokens)}
+
+        postings: List[List[int]] = [[] for _ in self.tokens]
+        self._entry_tokens: List[Tuple[int, ...]] = []
+        top: Dict[str, List[int]] = defaultdict(list)
+        for entry_id, (tokens, _) in enumerate(ranked):
+            token_ids = tuple(sorted({position[t] for t in tokens}))
+            self._entry_tokens.append(token_ids)
+            prefixes = set()
+            for token_id in token_ids:
+                postings[token_id].append(entry_id)
+                token = self.tokens[token_id]
+                prefixes.update(token[:n] for n in range(1, self.SHORT_PREFIX + 1))
+            for prefix in prefixes:
+                if len(top[prefix]) < self.TOP_SIZE:
+                    top[prefix].append(entry_id)
+
+        self._postings = postings
+        self._top = dict(top)
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)
+        self._trigram_counts: List[int] = []
+        for token_id, token in enumerate(self.tokens):
+            token_trigrams = trigrams(token)
+            self._trigram_counts.append(len(token_trigrams))
+            for trigram in token_trigrams:
+                self._trigrams[trigram].append(token_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _prefix_range(self, term: str) -> range:
+        start = bisect_left(self.tokens, term)
+        end = bisect_left(self.tokens, term + "\U0010ffff", lo=start)
+        return range(start, end)
+
+    def _similar_tokens(self, term: str) -> Container[int]:
+        term_trigrams = trigrams(term)
+        shared = Counter(
+            token_id
+            for trigram in term_trigrams
+            for token_id in self._trigrams.get(trigram, ())
+        )
+        return {
+            token_id
+            for token_id, count in shared.items()
+            if count / (len(term_trigrams) + self._trigram_counts[token_id] - count)
+            >= self.MIN_SIMILARITY
+        }
+
+    def _matching_tokens(self, term: str) -> Container[int]:
+        return self._prefix_range(term) or self._similar_tokens(term)
+
+    def search(self, q: Optional[str], *, limit: int, offset: int = 0) -> List[str]:
+        terms = sorted(set(tokenize(q or "")), key=len, reverse=True)
+        if not terms or limit <= 0:
+            return []
+
+        if (
+            len(terms) == 1
+            and len(terms[0]) <= self.SHORT_PREFIX
+            and offset + limit <= self.TOP_SIZE
+        ):
+            entry_ids = self._top.get(terms[0], [])[offset : offset + limit]
+            return [self.names[entry_id] for entry_id in entry_ids]
+
+        # The longest word is usually the most selective one, its postings are
+        # walked in order of popularity until the page is full
+        pivot, *others = [self._matching_tokens(term) for term in terms]
+        postings = heapq.merge(*(self._postings[token_id] for token_id in pivot))
+        entry_ids, previous = [], None
+        for entry_id in postings:
+            if entry_id == previous:
+                continue
+            previous = entry_id
+            entry_tokens = self._entry_tokens[entry_id]
+            if all(any(t in matching for t in entry_tokens) for matching in others):
+                entry_ids.append(entry_id)
+                if len(entry_ids) == offset + limit:
+                    break
+
+        return [self.names[entry_id] for entry_id in entry_ids[offset:]]
+
+
+class AutocompleteService:
+    """The autocomplete index of an API process, rebuilt in the background.
+
+    The products are written by the cron process, so each API process
+    rebuilds its own index every `refresh_seconds` instead of being notified.
+    """
+
+    def __init__(self, *, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.index: Optional[AutocompleteIndex] = None
+
+    def search(
+        self, q: Optional[str], *, limit: int, offset: int
+    ) -> Optional[List[str]]:
+        """The matching names, None until the index is first built"""
+        if self.index is None:
+            return None
+        return self.index.search(q, limit=limit, offset=offset)
+
+    async def refresh(self, db: AsyncSession):
+        started = time.perf_counter()
+        entries = await ProductManager.get_autocomplete_entries(db)
+        loop = asyncio.get_running_loop()
+        self.index = await loop.run_in_executor(None, AutocompleteIndex, entries)
+        logger.info(
+            f"Built the autocomplete index of {len(self.index)} names "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    async def run(self):
+        while True:
+            try:
+                async with AsyncSession(engine, expire_on_commit=False) as session:
+                    await self.refresh(session)
+            except Exception as e:
+                logger.error(f"Could not build the autocomplete index: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+
+autocomplete = AutocompleteService(
+    refresh_seconds=settings.AUTOCOMPLETE_REFRESH_SECONDS
+)
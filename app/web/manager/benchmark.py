@@ -0,0 +1,44 @@
+"""Latency of the in-memory autocomplete index against the SQL autocomplete,
+on the products of the database.
+
+    python -m web.manager.benchmark [query ...]
+"""
+import asyncio
+import sys
+import timeit
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.db import engine
+from web.manager.autocomplete import AutocompleteIndex
+from web.manager.product import ProductManager
+
+# Prefixes, multi word queries and typos of the catalogue
+QUERIES = ["t", "2207", "6s lipo", "5 inch frame", "gogles", "elrs rx"]
+ROUNDS = 5
+
+
+async def main(queries):
+    async with AsyncSession(engine) as db:
+        entries = await ProductManager.get_autocomplete_entries(db)
+        started = timeit.default_timer()
+        for _ in range(ROUNDS):
+            for q in queries:
+                await ProductManager.autocomplete(db, q=q, limit=10, offset=0)
+        sql = (timeit.default_timer() - started) / (ROUNDS * len(queries))
+    await engine.dispose()
+
+    built = timeit.default_timer()
+    index = AutocompleteIndex(entries)
+    built = timeit.default_timer() - built
+    memory = timeit.timeit(
+        lambda: [index.search(q, limit=10) for q in queries], number=ROUNDS
+    ) / (ROUNDS * len(queries))
+
+    print(f"{len(index)} names, index built in {built:.2f}s")
+    print(f"   SQL: {sql * 1e3:.3f}ms/query")
+    print(f" index: {memory * 1e3:.3f}ms/query")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:] or QUERIES))
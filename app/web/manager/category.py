@@ -0,0 +1,79 @@
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlmodel import select
+
+from web.db import engine
+from web.logger import get_logger
+from web.models.product import Category
+
+logger = get_logger(__name__)
+
+
+class CategoryRegistry:
+    """Category ids by (slug, parent id), loaded once and resolved in memory.
+
+    The missing categories are created with an `INSERT ... ON CONFLICT` on the
+    unique (slug, parent_id), concurrent writers end up with the same row. They
+    are committed by a session of their own so that the transaction of the
+    caller, like a chunk of the product writer, is left as it is.
+    """
+
+    def __init__(self, *, engine: AsyncEngine = engine):
+        self.engine = engine
+        self._ids: Optional[Dict[Tuple[str, Optional[int]], int]] = None
+
+    async def load(self, db: AsyncSession):
+        stmt = select(Category.slug, Category.parent_id, Category.id)
+        rows = (await db.execute(stmt)).all()
+        self._ids = {(slug, parent_id): id_ for slug, parent_id, id_ in rows}
+        logger.debug(f"Loaded {len(self._ids)} categories")
+
+    async def get_id(
+        self, db: AsyncSession, *, slug: str, parent_id: Optional[int] = None
+    ) -> int:
+        if self._ids is None:
+            await self.load(db)
+        key = (slug, parent_id)
+        if key not in self._ids:
+            self._ids[key] = await self._create(slug=slug, parent_id=parent_id)
+        return self._ids[key]
+
+    async def get_ids(
+        self, db: AsyncSession, *, primary: Optional[str], secondary: Optional[str]
+    ) -> Tuple[Optional[int], Optional[int]]:
+        """The ids of the category and sub category of the slugs"""
+        if not primary:
+            return None, None
+
+        category_id = await self.get_id(db, slug=primary)
+        if not secondary:
+            return category_id, None
+        sub_category_id = await self.get_id(db, slug=secondary, parent_id=category_id)
+        return category_id, sub_category_id
+
+    async def _create(self, *, slug: str, parent_id: Optional[int]) -> int:
+        stmt = insert(Category).values(
+            slug=slug,
+            name=slug.replace("-", " ").title(),
+            parent_id=parent_id,
+            is_active=True,
+        )
+        # A no-op update so that the row created concurrently is returned
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_category_slug_parent_id",
+            set_={"slug": stmt.excluded.slug},
+        ).returning(Category.id)
+        # Committed right away, the id must not be cached for a rolled back row
+        async with AsyncSession(self.engine) as db:
+            category_id = (await db.execute(stmt)).scalar_one()
+            await db.commit()
+        logger.info(f"Created category {slug} (parent: {parent_id})")
+        return category_id
+
+    def invalidate(self):
+        self._ids = None
+
+
+category_registry = CategoryRegistry()
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from contextlib import suppress
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.core.cache import InMemoryCache
+from web.core.config import settings
+from web.db import engine
+from web.logger import get_logger
+from web.manager.product import ProductManager
+from web.models.tracking import ClickedProduct
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ClickBufferStats:
+    accepted: int = 0
+    dropped: int = 0
+    written: int = 0
+    failed: int = 0
+    batches: int = 0
+
+
+class ClickBuffer:
+    """Clicks queued in memory and written in batches off the request path.
+
+    A batch is written every `flush_interval_ms` or as soon as `batch_size`
+    clicks are queued. Once `max_size` clicks are waiting the new ones are
+    dropped, and the queue is drained when the application stops.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int = settings.CLICK_BUFFER_MAX_SIZE,
+        batch_size: int = settings.CLICK_BUFFER_BATCH_SIZE,
+        flush_interval_ms: int = settings.CLICK_BUFFER_FLUSH_INTERVAL_MS,
+        product_ids_ttl: int = settings.CLICK_PRODUCT_IDS_TTL_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.stats = ClickBufferStats()
+        self.product_ids_ttl = product_ids_ttl
+        self._product_ids = InMemoryCache(
+            max_size=settings.CLICK_PRODUCT_IDS_MAX_SIZE
+        )
+        self._queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=max_size)
+        self._flusher: Optional[asyncio.Task] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._writing = False
+        self._stopping = False
+
+    async def get_product_id(
+        self, db: AsyncSession, *, public_id: str
+    ) -> Optional[str]:
+        product_id = await self._product_ids.get(public_id)
+        if product_id is None:
+            product_id = await ProductManager.get_product_id(db, public_id=public_id)
+            if product_id is not None:
+                await self._product_ids.set(
+                    public_id, product_id, ttl=self.product_ids_ttl
+                )
+        return product_id
+
+    def add(self, *, product_id: str, clicked_product: ClickedProduct) -> bool:
+        click = clicked_product.model_dump(exclude={"id", "product_id", "created_at"})
+        click.update(product_id=product_id, created_at=datetime.utcnow())
+        try:
+            self._queue.put_nowait(click)
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            return False
+        self.stats.accepted += 1
+        return True
+
+    async def _next_batch(self):
+        """Collect the next batch in `_pending`, kept there if the flusher stops"""
+        self._pending.append(await self._queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                click = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            self._pending.append(click)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while not self._queue.empty() and len(batch) < self.batch_size:
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def write(self, batch: List[Dict[str, Any]]):
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                await ProductManager.track_clicks(db, clicks=batch)
+        except Exception as e:
+            logger.error(f"Could not write {len(batch)} clicks: {e}")
+            self.stats.failed += len(batch)
+            return
+        self.stats.written += len(batch)
+        self.stats.batches += 1
+
+    async def run(self):
+        while not self._stopping:
+            await self._next_batch()
+            batch, self._pending = self._pending, []
+            self._writing = True
+            try:
+                await self.write(batch)
+            finally:
+                self._writing = False
+
+    def start(self):
+        self._stopping = False
+        self._flusher = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the flusher and write the clicks still queued.
+
+        The flusher is only cancelled while it waits for clicks, a batch being
+        written is left to commit and the flusher returns after it.
+        """
+        if self._flusher is not None:
+            self._stopping = True
+            if not self._writing:
+                self._flusher.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        if self._pending:
+            batch, self._pending = self._pending, []
+            await self.write(batch)
+        while batch := self._drain():
+            await self.write(batch)
+        logger.info(f"Click buffer stopped: {self.metrics}")
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **asdict(self.stats),
+            "queue_depth": self._queue.qsize(),
+            "queue_max_size": self._queue.maxsize,
+        }
+
+
+click_buffer = ClickBuffer()
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy import distinct, func
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -7,6 +7,7 @@ from sqlmodel import select
 from sqlmodel.sql.expression import SelectOfScalar
 
 from web.logger import get_logger
+from web.manager.pagination import Page, SortKey, paginate
 from web.models.geo import Country, Continent
 from web.models.store import Store
 
@@ -16,33 +17,45 @@ logger = get_logger(__name__)
 class GeoManager:
     @staticmethod
     async def get_countries_with_active_stores(
-        db: AsyncSession, *, limit: int, skip: int
-    ) -> List[Country]:
+        db: AsyncSession, *, limit: int, skip: int, cursor: Optional[str] = None
+    ) -> Page[Country]:
         stmt: SelectOfScalar[Country] = (  # noqa
             select(Country)
             .join(Store)
             .where(Store.is_active.is_(True), Store.is_parsable.is_(True))
-            .order_by(Country.name)
             .distinct(Country.name)
-            .offset(skip)
-            .limit(limit)
         )
-        return (await db.execute(stmt)).scalars().all()
+        return await paginate(
+            db,
+            stmt,
+            keys=[SortKey(Country.name)],
+            mode="name",
+            limit=limit,
+            offset=skip,
+            cursor=cursor,
+            with_count=False,
+        )
 
     @staticmethod
     async def get_continents_with_active_stores(
-        db: AsyncSession, *, limit: int, skip: int
-    ) -> List[Continent]:
+        db: AsyncSession, *, limit: int, skip: int, cursor: Optional[str] = None
+    ) -> Page[Continent]:
         stmt: SelectOfScalar[Continent] = (  # noqa
             select(Continent)
             .join(Country)
             .join(Country.stores)
-            .order_by(Continent.name)
             .distinct(Continent.name)
-            .offset(skip)
-            .limit(limit)
         )
-        return (await db.execute(stmt)).scalars().all()
+        return await paginate(
+            db,
+            stmt,
+            keys=[SortKey(Continent.name)],
+            mode="name",
+            limit=limit,
+            offset=skip,
+            cursor=cursor,
+            with_count=False,
+        )
 
     @staticmethod
     async def get_countries_and_active_stores(db: AsyncSession) -> List[Country]:
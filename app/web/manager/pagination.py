@@ -0,0 +1,143 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Generic, List, NamedTuple, Optional, Sequence, TypeVar
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+
+M = TypeVar("M")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page(NamedTuple, Generic[M]):
+    items: List[M]
+    count: Optional[int]
+    next_cursor: Optional[str]
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """A column of a keyset ordering, `parse` restores its value from a cursor"""
+
+    column: ColumnElement
+    descending: bool = False
+    parse: Callable[[Any], Any] = lambda value: value
+
+    def order_by(self, column: Optional[ColumnElement] = None) -> ColumnElement:
+        column = self.column if column is None else column
+        return column.desc() if self.descending else column.asc()
+
+    def after(self, column: ColumnElement, value: Any) -> ColumnElement:
+        return column < value if self.descending else column > value
+
+
+def _encode_value(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(mode: str, values: Sequence[Any]) -> str:
+    """An opaque cursor with the sort key of the last row of a page"""
+    payload = json.dumps(
+        {"m": mode, "k": list(values)}, separators=(",", ":"), default=_encode_value
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, mode: str, keys: Sequence[SortKey]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["m"] != mode or len(payload["k"]) != len(keys):
+            raise InvalidCursor(f"The cursor is not for the '{mode}' ordering")
+        return [key.parse(value) for key, value in zip(keys, payload["k"])]
+    except InvalidCursor:
+        raise
+    except Exception as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+
+
+def after_cursor(
+    keys: Sequence[SortKey], values: Sequence[Any], columns=None
+) -> ColumnElement:
+    """Rows strictly after the given sort key, for any mix of directions"""
+    columns = columns or [key.column for key in keys]
+    clauses = []
+    for i, key in enumerate(keys):
+        equal_before = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_before, key.after(columns[i], values[i])))
+    return or_(*clauses)
+
+
+def next_cursor(
+    mode: str, rows: Sequence[Sequence[Any]], limit: int
+) -> Optional[str]:
+    """The cursor of the next page, None when the page is not full"""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(mode, rows[-1])
+
+
+def page_query(
+    stmt: Select,
+    *,
+    keys: Sequence[SortKey],
+    mode: str,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> Select:
+    """The page of `stmt` selected by `paginate`, with the sort key of each row"""
+    stmt = (
+        stmt.add_columns(*(key.column for key in keys))
+        .order_by(None)
+        .order_by(*(key.order_by() for key in keys))
+    )
+    if cursor:
+        stmt = stmt.where(after_cursor(keys, decode_cursor(cursor, mode, keys)))
+    else:
+        stmt = stmt.offset(offset)
+    return stmt.limit(limit)
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    *,
+    keys: Sequence[SortKey],
+    mode: str,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    with_count: bool = True,
+) -> Page:
+    """A page of the entities selected by `stmt`, in the order of the `keys`.
+
+    With a `cursor` the page starts after its sort key, otherwise `offset`
+    rows are skipped. The total is only counted when `with_count` is set.
+    """
+    count = None
+    if with_count:
+        count = await db.scalar(
+            select(func.count()).select_from(stmt.order_by(None).subquery())
+        )
+
+    stmt = page_query(
+        stmt, keys=keys, mode=mode, limit=limit, offset=offset, cursor=cursor
+    )
+    rows = (await db.execute(stmt)).all()
+    return Page(
+        items=[row[0] for row in rows],
+        count=count,
+        next_cursor=next_cursor(mode, [tuple(row[1:]) for row in rows], limit),
+    )
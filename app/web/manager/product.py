@@ -1,34 +1,81 @@
-from datetime import timedelta, datetime
+from collections import Counter
+from datetime import time, timedelta, datetime
+from decimal import Decimal
 from distutils.util import strtobool
-from typing import List, Optional, Tuple, Sequence
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Sequence,
+)
 
-from sqlalchemy import or_, func, desc, cast, Numeric, asc, update
+from sqlalchemy import (
+    bindparam,
+    JSON,
+    delete,
+    literal,
+    literal_column,
+    or_,
+    any_,
+    func,
+    desc,
+    asc,
+    update,
+    true,
+    cast,
+    Date,
+    Float,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.sql import ColumnElement, Select, Update
 from sqlmodel import select
 
-from web.ai.classifier import classify_product_category
-from web.manager.store import StoreManager
+from web.ai.classifier import Classify, classify_product_categories
+from web.core.cache import normalize_query
+from web.core.config import settings
 from web.logger import get_logger
+from web.manager.pagination import (
+    Page,
+    SortKey,
+    after_cursor,
+    decode_cursor,
+    next_cursor,
+    paginate,
+)
 from web.models.geo import Country, Continent
 from web.models.product import (
     Product,
-    FIELDS_TO_UPDATE,
-    FIELDS_TO_IMPORT,
     PriceHistory,
+    CategorizedName,
     Category,
+    CategoryFacet,
     UsedProduct,
 )
-from web.models.schemas import CategoryFilter
+from web.models.schemas import CategoryFacetRead, CategoryFilter
 from web.models.store import Store
 from web.models.tracking import ClickedProduct
-from web.models.user import User
+from web.models.user import FavoriteProduct, User
 
 logger = get_logger(__name__)
 
 
+class SearchPage(NamedTuple):
+    items: List[Product]
+    count: int
+    # (category id, sub category id, matching products) of the whole search
+    facets: List[Tuple[int, Optional[int], int]]
+    next_cursor: Optional[str]
+
+
 class ProductManager:
+    ORDER_BY_RELEVANCE = "relevance"
     ORDER_BY_POPULARITY = "popularity"
     ORDER_BY_PRICE_DESC = "price_desc"
     ORDER_BY_PRICE_ASC = "price_asc"
@@ -37,33 +84,90 @@ class ProductManager:
     async def autocomplete(
         cls, db: AsyncSession, *, q: str, limit: int, offset: int
     ) -> List[Row]:
+        stmt = cls.get_autocomplete_query(q, limit=limit, offset=offset)
+        return (await db.execute(stmt)).all()
+
+    @classmethod
+    def get_autocomplete_query(cls, q: str, *, limit: int, offset: int) -> Select:
         product_query = (
             select(Product.name)
             .join(Store)
-            .outerjoin(ClickedProduct)
             .where(
                 Product.is_active.is_(True),
                 Store.is_active.is_(True),
                 or_(
                     Product.__ts_vector__.op("@@")(func.plainto_tsquery(q)),
-                    func.similarity(Product.name, q) > 0.1,
+                    Product.name.op("%")(q),
                 ),
             )
             .group_by(Product.name)
             .order_by(
                 desc(func.similarity(Product.name, q)),
-                desc(func.count(ClickedProduct.id)),
+                desc(func.max(Product.click_count)),
             )
         )
 
         category_query = (
             select(Category.name)
-            .where(Category.name.op("<<->")(q) < cast(0.35, Numeric))
+            .where(Category.name.op("<<%")(q))
             .order_by(desc(func.similarity(Category.name, q)))
         )
 
-        stmt = category_query.union(product_query).limit(limit).offset(offset)
-        return (await db.execute(stmt)).all()
+        return category_query.union(product_query).limit(limit).offset(offset)
+
+    @classmethod
+    async def get_autocomplete_entries(cls, db: AsyncSession) -> List[Row]:
+        """The names suggested by the autocomplete with their click counts"""
+        product_query = (
+            select(Product.name, func.sum(Product.click_count))
+            .join(Store)
+            .where(Product.is_active.is_(True), Store.is_active.is_(True))
+            .group_by(Product.name)
+        )
+        category_query = (
+            select(Category.name, func.coalesce(func.sum(Product.click_count), 0))
+            .outerjoin(
+                Product,
+                or_(
+                    Product.category_id == Category.id,
+                    Product.sub_category_id == Category.id,
+                ),
+            )
+            .group_by(Category.id, Category.name)
+        )
+        return (await db.execute(product_query.union_all(category_query))).all()
+
+    @classmethod
+    def get_sort_keys(cls, order_by: Optional[str], q: str) -> List[SortKey]:
+        """The ordering of each `order_by` mode, always ending with a unique key"""
+        if order_by == cls.ORDER_BY_POPULARITY:
+            keys = [SortKey(Product.click_count, descending=True)]
+        elif order_by == cls.ORDER_BY_PRICE_DESC:
+            keys = [SortKey(Product.price, descending=True, parse=Decimal)]
+        elif order_by == cls.ORDER_BY_PRICE_ASC:
+            keys = [SortKey(Product.price, parse=Decimal)]
+        else:
+            keys = [
+                SortKey(Product.name.op("<<->", return_type=Float)(q)),
+                # Affiliated stores first
+                SortKey(Store.affiliate_id.is_(None)),
+                SortKey(Product.click_count, descending=True),
+            ]
+        return [*keys, SortKey(Product.id)]
+
+    @classmethod
+    def get_search_filter(cls, q: str) -> ColumnElement:
+        """Products matching the query by text, name or category name.
+
+        Every branch can be served by an index of `product`, so Postgres can
+        combine them with a BitmapOr instead of filtering the whole table.
+        """
+        category_ids = select(Category.id).where(Category.name.op("<<%")(q))
+        return or_(
+            Product.__ts_vector__.op("@@")(func.plainto_tsquery(q)),
+            Product.name.op("<<%")(q),
+            Product.category_id == any_(func.array(category_ids.scalar_subquery())),
+        )
 
     @classmethod
     async def search_products(
@@ -77,51 +181,105 @@ class ProductManager:
         order_by: Optional[str],
         limit: int,
         offset: int,
-    ) -> Tuple[List[Product], int]:
-        stmt = (
-            select(Product)
+        cursor: Optional[str] = None,
+    ) -> SearchPage:
+        """Evaluate the search once for the page, the total and the categories.
+
+        The matches are a CTE carrying their sort key: one statement returns the
+        page, the count and the products per category, then the products and
+        categories are loaded by primary key. With a `cursor` the page starts
+        after its sort key instead of skipping `offset` rows.
+        """
+        mode = order_by or cls.ORDER_BY_RELEVANCE
+        keys = cls.get_sort_keys(order_by, q)
+        after = decode_cursor(cursor, mode, keys) if cursor else None
+
+        matches = (
+            select(
+                Product.category_id,
+                Product.sub_category_id,
+                *(key.column.label(f"key_{i}") for i, key in enumerate(keys)),
+            )
             .join(Store)
-            .outerjoin(Product.category)
-            .outerjoin(ClickedProduct)
             .where(
                 Product.is_active.is_(True),
                 Store.is_active.is_(True),
-                or_(
-                    Product.__ts_vector__.op("@@")(func.plainto_tsquery(q)),
-                    Product.name.op("<<->")(q) < cast(0.35, Numeric),
-                    Category.name.op("<<->")(q) < cast(0.35, Numeric),
-                ),
+                cls.get_search_filter(q),
             )
-            .options(selectinload(Product.store))
-            .options(selectinload(Product.best_shipping_method))
         )
 
         if is_available is not None:
-            stmt = stmt.where(Product.is_available.is_(bool(strtobool(is_available))))
+            matches = matches.where(
+                Product.is_available.is_(bool(strtobool(is_available)))
+            )
 
         if only_verified and bool(strtobool(only_verified)):
-            stmt = stmt.where(Store.affiliate_id.isnot(None))
+            matches = matches.where(Store.affiliate_id.isnot(None))
 
         if continents is not None:
-            stmt = stmt.join(Country).where(Country.continent_id.in_(continents))
-
-        stmt = stmt.group_by(Product.id)
-
-        if order_by == cls.ORDER_BY_POPULARITY:
-            stmt = stmt.order_by(desc(func.count(ClickedProduct.id)))
-        elif order_by == cls.ORDER_BY_PRICE_DESC:
-            stmt = stmt.order_by((desc(Product.price)))
-        elif order_by == cls.ORDER_BY_PRICE_ASC:
-            stmt = stmt.order_by((asc(Product.price)))
+            matches = matches.join(Country).where(Country.continent_id.in_(continents))
+
+        matches = matches.cte("matches")
+        key_columns = [matches.c[f"key_{i}"] for i in range(len(keys))]
+        summary = select(func.count().label("total")).select_from(matches)
+        summary = summary.subquery("summary")
+        facet_counts = (
+            select(
+                matches.c.category_id,
+                matches.c.sub_category_id,
+                func.count().label("count"),
+            )
+            .where(matches.c.category_id.isnot(None))
+            .group_by(matches.c.category_id, matches.c.sub_category_id)
+            .subquery("facet_counts")
+        )
+        facets = select(
+            func.json_agg(
+                func.json_build_array(*facet_counts.c), type_=JSON
+            ).label("facets")
+        ).subquery("facets")
+        page = select(*key_columns).order_by(
+            *(key.order_by(column) for key, column in zip(keys, key_columns))
+        )
+        if after is not None:
+            page = page.where(after_cursor(keys, after, key_columns))
         else:
-            stmt = stmt.order_by(
-                Product.name.op("<<->")(q),
-                func.max(Store.affiliate_id),
-                desc(func.count(ClickedProduct.id)),
+            page = page.offset(offset)
+        page = page.limit(limit).subquery("page")
+
+        page_columns = [page.c[f"key_{i}"] for i in range(len(keys))]
+        stmt = (
+            select(summary.c.total, facets.c.facets, *page_columns)
+            .select_from(summary.join(facets, true()).outerjoin(page, true()))
+            .order_by(
+                *(key.order_by(column) for key, column in zip(keys, page_columns))
             )
-        results = (await db.execute(stmt.offset(offset).limit(limit))).scalars().all()
-        total_count = await db.scalar(select(func.count()).select_from(stmt.subquery()))
-        return results, total_count
+        )
+        rows = (await db.execute(stmt)).all()
+        page_keys = [tuple(row[2:]) for row in rows if row[-1] is not None]
+        ids = [page_key[-1] for page_key in page_keys]
+
+        products = []
+        if ids:
+            products = (
+                (
+                    await db.execute(
+                        select(Product)
+                        .where(Product.id.in_(ids))
+                        .options(selectinload(Product.store))
+                        .options(selectinload(Product.best_shipping_method))
+                    )
+                )
+                .scalars()
+                .all()
+            )
+        position = {product_id: i for i, product_id in enumerate(ids)}
+        return SearchPage(
+            items=sorted(products, key=lambda product: position[product.id]),
+            count=rows[0].total,
+            facets=[tuple(facet) for facet in rows[0].facets or []],
+            next_cursor=next_cursor(mode, page_keys, limit),
+        )
 
     @classmethod
     async def get_product(
@@ -136,6 +294,23 @@ class ProductManager:
             )
         ).scalar_one_or_none()
 
+    @classmethod
+    def get_price_history_query(cls, public_id: str) -> Select:
+        """The average price of each day of the last 30 days"""
+        day = cast(PriceHistory.created_at, Date)
+        return (
+            select(day, func.avg(PriceHistory.price))
+            .join(Product)
+            .where(
+                Product.public_id == public_id,
+                # Same days as `created_at::date >= now - 30 days`, but sargable
+                PriceHistory.created_at
+                >= datetime.combine(datetime.utcnow() - timedelta(days=29), time.min),
+            )
+            .group_by(day)
+            .order_by(asc(day))
+        )
+
     @classmethod
     async def get_similar_products(
         cls, db: AsyncSession, *, product: Product, limit: int = 5
@@ -151,7 +326,6 @@ class ProductManager:
             .join(Store)
             .join(Country)
             .join(Continent)
-            .outerjoin(ClickedProduct)
             .where(
                 Product.is_active.is_(True),
                 Store.is_active.is_(True),
@@ -159,204 +333,505 @@ class ProductManager:
                 Continent.id == country.continent_id,
                 or_(
                     Product.__ts_vector__.op("@@")(func.plainto_tsquery(product.name)),
-                    Product.name.op("<<->")(product.name) < cast(0.35, Numeric),
+                    Product.name.op("<<%")(product.name),
                 ),
             )
             .options(selectinload(Product.store))
             .options(selectinload(Product.best_shipping_method))
-            .group_by(Product.id)
             .order_by(
                 Product.name.op("<<->")(product.name),
-                func.max(Store.affiliate_id),
+                Store.affiliate_id,
                 Product.price,
-                desc(func.count(ClickedProduct.id)),
+                desc(Product.click_count),
             )
         )
 
         return (await db.execute(stmt.limit(limit))).scalars().all()
 
     @classmethod
-    async def get_products_to_update(
+    async def get_due_products(
+        cls, db: AsyncSession, *, now: datetime, limit: int, volatility_days: int
+    ) -> List[Tuple[Product, int, int]]:
+        """The products of the parsable stores due for a check, most overdue
+        first, with their price changes and popularity"""
+        price_changes = (
+            select(func.count(func.distinct(PriceHistory.price)) - 1)
+            .where(
+                PriceHistory.product_id == Product.id,
+                PriceHistory.created_at >= now - timedelta(days=volatility_days),
+            )
+            .scalar_subquery()
+        )
+        favorites = (
+            select(func.count())
+            .where(FavoriteProduct.product_id == Product.id)
+            .scalar_subquery()
+        )
+        # The expression of ix_product_due_at
+        due_at = func.coalesce(
+            Product.next_check_at, literal_column("'-infinity'::timestamp")
+        )
+        stmt = (
+            select(
+                Product,
+                func.greatest(price_changes, 0),
+                Product.recent_click_count + favorites,
+            )
+            .join(Store)
+            .where(
+                Product.is_active.is_(True),
+                due_at <= now,
+                Store.is_active.is_(True),
+                Store.is_parsable.is_(True),
+            )
+            .options(
+                selectinload(Product.store),
+                selectinload(Product.category),
+                selectinload(Product.sub_category),
+            )
+            .order_by(due_at)
+            .limit(limit)
+        )
+        return [tuple(row) for row in (await db.execute(stmt)).all()]
+
+    @classmethod
+    async def schedule_checks(cls, db: AsyncSession, *, checks: List[Dict[str, Any]]):
+        """Set the `next_check_at` of the products, without committing"""
+        if not checks:
+            return
+
+        product = Product.__table__
+        await db.execute(
+            update(product)
+            .where(product.c.id == bindparam("product_id"))
+            .values(next_check_at=bindparam("next_check_at")),
+            checks,
+        )
+
+    @classmethod
+    async def get_most_clicked_products(
         cls,
         db: AsyncSession,
         *,
-        store_id: int,
-        limit: Optional[int] = None,
-        offset: Optional[int] = None,
-    ) -> List[Product]:
+        limit: int,
+        offset: int,
+        cursor: Optional[str] = None,
+        with_count: bool = True,
+    ) -> Page[Product]:
+        stmt, keys = cls.get_most_clicked_query()
+        return await paginate(
+            db,
+            stmt,
+            keys=keys,
+            mode="most_clicked",
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            with_count=with_count,
+        )
+
+    @classmethod
+    def get_most_clicked_query(cls) -> Tuple[Select, List[SortKey]]:
         stmt = (
             select(Product)
             .join(Store)
-            .outerjoin(ClickedProduct)
             .where(
-                Store.id == store_id,
-                Product.import_date + timedelta(hours=8) <= datetime.now(),
                 Product.is_active.is_(True),
+                Store.is_active.is_(True),
             )
-            .options(selectinload(Product.category), selectinload(Product.sub_category))
-            .group_by(Product.id, Product.import_date)
-            .order_by(
-                func.coalesce(func.count(ClickedProduct.id), 0).desc(),
-                Product.import_date.asc(),
-            )
+            .options(selectinload(Product.store))
+            .options(selectinload(Product.best_shipping_method))
         )
-        if limit:
-            stmt = stmt.limit(limit)
-
-        if offset:
-            stmt = stmt.offset(offset)
+        keys = [
+            SortKey(Product.recent_click_count, descending=True),
+            SortKey(Product.click_count, descending=True),
+            SortKey(Product.id, descending=True),
+        ]
+        return stmt, keys
 
-        return (await db.execute(stmt)).scalars().all()
+    @classmethod
+    async def get_product_id(cls, db: AsyncSession, *, public_id: str) -> Optional[str]:
+        stmt = select(Product.id).where(Product.public_id == public_id)
+        return (await db.execute(stmt)).scalar_one_or_none()
 
     @classmethod
-    async def deactivate(cls, db: AsyncSession, *, product_link: str):
+    async def track_clicks(cls, db: AsyncSession, *, clicks: List[Dict[str, Any]]):
+        """Insert the clicks in one statement and bump each product counter once"""
+        if not clicks:
+            return
+
+        await db.execute(insert(ClickedProduct).values(clicks))
+        # A Core executemany, the ORM would treat the parameters as a bulk
+        # update by primary key
+        product = Product.__table__
+        per_product = Counter(click["product_id"] for click in clicks)
         await db.execute(
-            update(Product).where(Product.link == product_link).values(is_active=False)
+            update(product)
+            .where(product.c.id == bindparam("clicked_id"))
+            .values(
+                click_count=product.c.click_count + bindparam("clicks"),
+                recent_click_count=product.c.recent_click_count + bindparam("clicks"),
+            ),
+            [
+                {"clicked_id": product_id, "clicks": count}
+                for product_id, count in per_product.items()
+            ],
         )
         await db.commit()
 
     @classmethod
-    async def update(
-        cls, db: AsyncSession, *, product: Product, new_data: Product, fields: List[str]
-    ) -> Product:
-        if product.id != new_data.id:
-            logger.warning(
-                f"Tried to update '{product}' (ID: {product.id}) with different ID. {new_data=}"
+    def get_click_counts_query(cls, since: datetime) -> Select:
+        """The clicks of each product, in total and since `since`"""
+        return (
+            select(
+                ClickedProduct.product_id,
+                func.count(ClickedProduct.id).label("total"),
+                func.count(ClickedProduct.id)
+                .filter(ClickedProduct.created_at >= since)
+                .label("recent"),
             )
-            return product
-
-        product.is_active = True
-        product.import_date = datetime.utcnow()
-
-        for field in fields:
-            if not hasattr(product, field):
-                continue
-
-            setattr(product, field, getattr(new_data, field))
+            .where(ClickedProduct.product_id.isnot(None))
+            .group_by(ClickedProduct.product_id)
+        )
 
-        best_shipping_method = await StoreManager.get_best_shipping_method(
-            db, store_id=product.store.id, product_price=new_data.price
+    @classmethod
+    async def rollup_click_counts(cls, db: AsyncSession, *, window_days: int):
+        """Recount the clicks, expiring the ones out of the recent window"""
+        since = datetime.utcnow() - timedelta(days=window_days)
+        counts = cls.get_click_counts_query(since).subquery()
+        await db.execute(
+            update(Product)
+            .where(
+                Product.id == counts.c.product_id,
+                or_(
+                    Product.click_count != counts.c.total,
+                    Product.recent_click_count != counts.c.recent,
+                ),
+            )
+            .values(click_count=counts.c.total, recent_click_count=counts.c.recent)
         )
-        product.best_shipping_method_id = (
-            best_shipping_method.id if best_shipping_method else None
+        await db.execute(
+            update(Product)
+            .where(
+                Product.recent_click_count > 0,
+                Product.id.not_in(
+                    select(ClickedProduct.product_id).where(
+                        ClickedProduct.product_id.isnot(None),
+                        ClickedProduct.created_at >= since,
+                    )
+                ),
+            )
+            .values(recent_click_count=0)
         )
+        await db.commit()
+
+    @classmethod
+    async def deactivate(cls, db: AsyncSession, *, product_link: str):
+        await db.execute(cls.get_deactivate_query(product_link))
+        await db.commit()
 
-        product.category, product.sub_category = await CategoryManager.get_or_create(
-            db, product=product
+    @classmethod
+    def get_deactivate_query(cls, product_link: str) -> Update:
+        return (
+            update(Product).where(Product.link == product_link).values(is_active=False)
         )
 
-        db.add(product)
-        db.add(
-            PriceHistory(product_id=product.id, price=product.price)
-        )  # Track historic price
-        await db.commit()
-        return product
+    @classmethod
+    async def get_categorization(
+        cls, db: AsyncSession, *, ids: List[str]
+    ) -> Dict[str, Row]:
+        stmt = select(
+            Product.id, Product.category_id, Product.categorized_at
+        ).where(Product.id.in_(ids))
+        return {row.id: row for row in (await db.execute(stmt)).all()}
 
     @classmethod
-    async def create_or_update(
-        cls, db: AsyncSession, *, store=Store, data: Product
-    ) -> Product:
+    async def get_uncategorized_products(
+        cls, db: AsyncSession, *, limit: int
+    ) -> Sequence[Row]:
+        """The active products never categorized, most popular first"""
         stmt = (
-            select(Product)
-            .where(Product.id == data.id)
-            .options(selectinload(Product.category), selectinload(Product.sub_category))
+            select(Product.id, Product.name)
+            .where(
+                Product.is_active.is_(True),
+                Product.category_id.is_(None),
+                Product.categorized_at.is_(None),
+            )
+            .order_by(desc(Product.recent_click_count), Product.id)
+            .limit(limit)
         )
-        product = (await db.execute(stmt)).scalar_one_or_none()
+        return (await db.execute(stmt)).all()
 
-        if product:
-            return await cls.update(
-                db, product=product, new_data=data, fields=FIELDS_TO_UPDATE
+    @classmethod
+    async def set_categories(
+        cls, db: AsyncSession, *, categories: List[Dict[str, Any]]
+    ):
+        """Categorize the products still without a category, without committing"""
+        if not categories:
+            return
+
+        product = Product.__table__
+        await db.execute(
+            update(product)
+            .where(
+                product.c.id == bindparam("product_id"),
+                product.c.category_id.is_(None),
             )
+            .values(
+                category_id=bindparam("category_id"),
+                sub_category_id=bindparam("sub_category_id"),
+                categorized_at=datetime.utcnow(),
+            ),
+            categories,
+        )
 
-        product_link = store.affiliate_link(product_link=data.link)
-        new_product = Product(
-            store=store,
-            id=data.id,
-            link=product_link,
-            currency=data.currency,
+    @classmethod
+    async def upsert_many(
+        cls, db: AsyncSession, *, rows: List[Dict[str, Any]], update_fields: List[str]
+    ):
+        """Insert or update the products and track their prices, without committing.
+
+        On conflict only the `update_fields` are overwritten, together with the
+        import metadata; the category is only set if the product has none.
+        """
+        stmt = insert(Product).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.id],
+            set_={
+                **{field: excluded[field] for field in update_fields},
+                "is_active": excluded.is_active,
+                "import_date": excluded.import_date,
+                "page_etag": excluded.page_etag,
+                "page_last_modified": excluded.page_last_modified,
+                "best_shipping_method_id": excluded.best_shipping_method_id,
+                "category_id": func.coalesce(
+                    Product.category_id, excluded.category_id
+                ),
+                "sub_category_id": func.coalesce(
+                    Product.sub_category_id, excluded.sub_category_id
+                ),
+                "categorized_at": func.coalesce(
+                    excluded.categorized_at, Product.categorized_at
+                ),
+                # NULL keeps the check scheduled, an earlier one brings it forward
+                "next_check_at": func.least(
+                    excluded.next_check_at, Product.next_check_at
+                ),
+            },
         )
-        return await cls.update(
-            db, product=new_product, new_data=data, fields=FIELDS_TO_IMPORT
+        await db.execute(stmt)
+        await db.execute(
+            insert(PriceHistory).values(
+                [{"product_id": row["id"], "price": row["price"]} for row in rows]
+            )
         )
 
     @classmethod
     async def search_used_products(
-        cls, db: AsyncSession, *, q: str, limit: int, offset: int
-    ) -> Sequence[UsedProduct]:
+        cls,
+        db: AsyncSession,
+        *,
+        q: str,
+        limit: int,
+        offset: int,
+        cursor: Optional[str] = None,
+    ) -> Page[UsedProduct]:
+        stmt, keys = cls.get_used_products_query(q)
+        return await paginate(
+            db,
+            stmt,
+            keys=keys,
+            mode="newest",
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            with_count=False,
+        )
+
+    @classmethod
+    def get_used_products_query(cls, q: str) -> Tuple[Select, List[SortKey]]:
         stmt = (
             select(UsedProduct)
             .where(
                 UsedProduct.is_active.is_(True),
                 UsedProduct.is_available.is_(True),
-                func.similarity(func.lower(UsedProduct.name), func.lower(q)) > 0.1,
+                func.lower(UsedProduct.name).op("%")(func.lower(q)),
             )
             .options(
                 selectinload(UsedProduct.pictures),
                 selectinload(UsedProduct.views),
                 selectinload(UsedProduct.seller).options(selectinload(User.settings)),
             )
-            .limit(limit)
-            .offset(offset)
         )
-
-        return (await db.execute(stmt)).scalars().all()
+        keys = [
+            SortKey(UsedProduct.created_at, descending=True, parse=datetime.fromisoformat),
+            SortKey(UsedProduct.id, descending=True),
+        ]
+        return stmt, keys
 
 
 class CategoryManager:
     @classmethod
-    async def get_or_create(
-        cls, db: AsyncSession, *, product: Product
-    ) -> Tuple[Optional[Category], Optional[Category]]:
-        if product.category:
-            return product.category, product.sub_category
-
-        if product.categorized_at:
-            logger.warning(f"Already categorized product {product.id}")
-            return None, None
-
-        data = await classify_product_category(product.name)
-        product.categorized_at = datetime.utcnow()
-        await db.commit()
+    async def get_labelled_names(
+        cls, db: AsyncSession
+    ) -> List[Tuple[str, str, Optional[str]]]:
+        """The distinct (name, primary slug, secondary slug) of the categorized
+        products, to train the local classifier"""
+        sub_category = aliased(Category)
+        stmt = (
+            select(Product.name, Category.slug, sub_category.slug)
+            .join(Category, Category.id == Product.category_id)
+            .outerjoin(sub_category, sub_category.id == Product.sub_category_id)
+            .distinct()
+            .order_by(Product.name)
+        )
+        return [tuple(row) for row in (await db.execute(stmt)).all()]
 
-        if not data:
-            logger.info(f"Could not categorize product {product.id}")
-            return None, None
+    @classmethod
+    async def get_categorized_names(
+        cls, db: AsyncSession, *, names: Iterable[str]
+    ) -> Dict[str, CategorizedName]:
+        """The cached categories of the names, by normalized name"""
+        keys = {normalize_query(name) for name in names}
+        if not keys:
+            return {}
+        stmt = select(CategorizedName).where(CategorizedName.name.in_(keys))
+        return {row.name: row for row in (await db.execute(stmt)).scalars().all()}
 
-        main_slug = data.get("primary")
-        main_name = main_slug.replace("-", " ").title()
-        main = await Category.get_or_create(
-            db, slug=main_slug, name=main_name, parent_id=None
-        )
+    @classmethod
+    async def classify(
+        cls,
+        db: AsyncSession,
+        *,
+        names: Iterable[str],
+        classify: Classify = classify_product_categories,
+        batch_size: int = settings.CATEGORIZE_BATCH_SIZE,
+    ) -> Dict[str, CategorizedName]:
+        """Categorize the names by normalized name, from the cache or with one
+        completion per batch of new names. The names of a failed batch are left
+        out, to be classified again later."""
+        originals: Dict[str, str] = {}
+        for name in names:
+            originals.setdefault(normalize_query(name), name)
+        categorized = await cls.get_categorized_names(db, names=originals)
+        missing = [key for key in originals if key not in categorized]
+
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i : i + batch_size]
+            try:
+                results = await classify([originals[key] for key in batch])
+            except Exception as e:
+                logger.error(f"Could not categorize {len(batch)} names: {e}")
+                continue
+            if results is None:
+                continue
 
-        if not data.get("secondary"):
-            sub_category = None
-        else:
-            sub_slug = data.get("secondary")
-            sub_name = sub_slug.replace("-", " ").title()
-            sub_category = await Category.get_or_create(
-                db, slug=sub_slug, name=sub_name, parent_id=main.id
+            rows = [
+                {
+                    "name": key,
+                    "primary": data["primary"] if data else None,
+                    "secondary": data["secondary"] if data else None,
+                }
+                for key, data in zip(batch, results)
+            ]
+            await db.execute(
+                insert(CategorizedName)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=[CategorizedName.name])
             )
-
-        return main, sub_category
+            await db.commit()
+            categorized.update((row["name"], CategorizedName(**row)) for row in rows)
+        return categorized
 
     @classmethod
     async def get_category_filters(
-        cls, db: AsyncSession, *, q: str
+        cls, db: AsyncSession, *, facets: List[Tuple[int, Optional[int], int]]
     ) -> List[CategoryFilter]:
-        stmt = (
-            select(Category)
-            .join(Product.category)
+        """The categories of the facets with their product counts, most first"""
+        ids = {category_id for category_id, _, _ in facets}
+        ids.update(sub_id for _, sub_id, _ in facets if sub_id is not None)
+        if not ids:
+            return []
+
+        stmt = select(Category).where(Category.id.in_(ids))
+        categories = {c.id: c for c in (await db.execute(stmt)).scalars().all()}
+
+        counts: Dict[int, int] = {}
+        children: Dict[int, List[CategoryFacetRead]] = {}
+        for category_id, sub_id, count in facets:
+            if category_id not in categories:
+                continue
+            counts[category_id] = counts.get(category_id, 0) + count
+            children.setdefault(category_id, [])
+            if sub_id in categories:
+                sub_category = categories[sub_id]
+                children[category_id].append(
+                    CategoryFacetRead(
+                        slug=sub_category.slug,
+                        name=sub_category.name,
+                        name_it=sub_category.name_it,
+                        count=count,
+                    )
+                )
+
+        filters = []
+        ranked = sorted(counts.items(), key=lambda c: (-c[1], categories[c[0]].name))
+        for category_id, count in ranked:
+            category = categories[category_id]
+            filters.append(
+                CategoryFilter(
+                    slug=category.slug,
+                    name=category.name,
+                    name_it=category.name_it,
+                    count=count,
+                    children=sorted(
+                        children[category_id], key=lambda c: (-c.count, c.name)
+                    ),
+                )
+            )
+        return filters
+
+    @classmethod
+    async def get_category_facets(cls, db: AsyncSession) -> List[CategoryFilter]:
+        """The categories with active products, counted when last refreshed"""
+        stmt = select(
+            CategoryFacet.category_id,
+            CategoryFacet.sub_category_id,
+            CategoryFacet.product_count,
+        )
+        facets = [tuple(row) for row in (await db.execute(stmt)).all()]
+        return await cls.get_category_filters(db, facets=facets)
+
+    @classmethod
+    async def refresh_category_facets(cls, db: AsyncSession) -> int:
+        """Recount the active products of each category and sub category.
+
+        The rows are replaced in one transaction, the readers see either the
+        previous counts or the new ones.
+        """
+        counts = (
+            select(
+                Product.category_id,
+                Product.sub_category_id,
+                func.count(),
+                literal(datetime.utcnow()),
+            )
             .join(Store)
-            .options(selectinload(Category.children))
             .where(
                 Product.is_active.is_(True),
                 Store.is_active.is_(True),
-                or_(
-                    Product.__ts_vector__.op("@@")(func.plainto_tsquery(q)),
-                    Product.name.op("<<->")(q) < cast(0.35, Numeric),
-                    Category.name.op("<<->")(q) < cast(0.35, Numeric),
-                ),
+                Product.category_id.isnot(None),
             )
-            .distinct()
+            .group_by(Product.category_id, Product.sub_category_id)
         )
-        return (await db.execute(stmt)).scalars().all()
+        await db.execute(delete(CategoryFacet))
+        result = await db.execute(
+            insert(CategoryFacet).from_select(
+                ["category_id", "sub_category_id", "product_count", "refreshed_at"],
+                counts,
+            )
+        )
+        await db.commit()
+        logger.info(f"Refreshed {result.rowcount} category facets")
+        return result.rowcount
@@ -0,0 +1,80 @@
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from web.logger import get_logger
+from web.models.shipping import ShippingMethod
+
+logger = get_logger(__name__)
+
+
+class ShippingRules(NamedTuple):
+    """The shipping methods of a store reduced to what picks the best one.
+
+    Of the free methods only the one with the lowest minimum product price
+    matters, a free method without a condition has a threshold of 0.
+    """
+
+    free_threshold: Optional[Decimal]
+    free_id: Optional[int]
+    cheapest_id: Optional[int]
+
+    @classmethod
+    def from_methods(cls, methods: Sequence[ShippingMethod]) -> "ShippingRules":
+        free = min(
+            (
+                (method.min_price_shipping_condition or Decimal(0), method.id)
+                for method in methods
+                if method.price is None
+            ),
+            default=(None, None),
+        )
+        # Same order of the SQL `ORDER BY price ASC`, NULLs (free) last
+        cheapest = min(
+            methods,
+            key=lambda m: (m.price is None, m.price or Decimal(0), m.id),
+            default=None,
+        )
+        return cls(
+            free_threshold=free[0],
+            free_id=free[1],
+            cheapest_id=cheapest.id if cheapest else None,
+        )
+
+    def best(self, product_price: Decimal) -> Optional[int]:
+        """The free method available for the price, otherwise the cheapest one"""
+        if self.free_id is not None and product_price >= self.free_threshold:
+            return self.free_id
+        return self.cheapest_id
+
+
+class ShippingIndex:
+    """Shipping rules of the stores, loaded once and resolved in memory"""
+
+    def __init__(self):
+        self._rules: Dict[int, ShippingRules] = {}
+
+    async def get_rules(self, db: AsyncSession, *, store_id: int) -> ShippingRules:
+        if store_id not in self._rules:
+            stmt = select(ShippingMethod).where(ShippingMethod.store_id == store_id)
+            methods = (await db.execute(stmt)).scalars().all()
+            logger.debug(f"Loaded {len(methods)} shipping methods of store {store_id}")
+            self._rules[store_id] = ShippingRules.from_methods(methods)
+        return self._rules[store_id]
+
+    async def get_best_shipping_method_id(
+        self, db: AsyncSession, *, store_id: int, product_price: Decimal
+    ) -> Optional[int]:
+        rules = await self.get_rules(db, store_id=store_id)
+        return rules.best(product_price)
+
+    def invalidate(self, store_id: Optional[int] = None):
+        if store_id is None:
+            self._rules.clear()
+        else:
+            self._rules.pop(store_id, None)
+
+
+shipping_index = ShippingIndex()
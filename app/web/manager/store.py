@@ -1,7 +1,6 @@
-from _decimal import Decimal
 from typing import List, Optional, Sequence
 
-from sqlalchemy import asc, func
+from sqlalchemy import asc, func, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlmodel import select
@@ -34,32 +33,46 @@ class StoreManager:
         return (await db.execute(stmt)).scalars().all()
 
     @classmethod
-    async def get_best_shipping_method(
-        cls, db: AsyncSession, *, store_id: int, product_price: Decimal
-    ) -> Optional[ShippingMethod]:
-        free_shipping_stmt = select(ShippingMethod).where(
-            ShippingMethod.store_id == store_id,
-            ShippingMethod.price.is_(None),
-        )
-
-        free_shipping = (await db.execute(free_shipping_stmt)).scalars().first()
+    async def update_best_shipping_methods(cls, db: AsyncSession, *, store_id: int):
+        """Recompute the best shipping method of all the products of a store.
 
-        cheapest_shipping_method_stmt = (
-            select(ShippingMethod)
-            .where(ShippingMethod.store_id == store_id)
-            .order_by(asc(ShippingMethod.price))
+        Same rule of `ShippingRules.best`: the free method with the lowest
+        minimum price the product reaches, otherwise the cheapest method.
+        """
+        free_shipping = (
+            select(ShippingMethod.id)
+            .where(
+                ShippingMethod.store_id == Product.store_id,
+                ShippingMethod.price.is_(None),
+                or_(
+                    ShippingMethod.min_price_shipping_condition.is_(None),
+                    Product.price >= ShippingMethod.min_price_shipping_condition,
+                ),
+            )
+            .order_by(
+                func.coalesce(ShippingMethod.min_price_shipping_condition, 0),
+                ShippingMethod.id,
+            )
+            .limit(1)
+            .scalar_subquery()
         )
-
-        if not free_shipping:
-            return (await db.execute(cheapest_shipping_method_stmt)).scalars().first()
-
-        if (
-            not free_shipping.min_price_shipping_condition
-            or product_price >= free_shipping.min_price_shipping_condition
-        ):
-            return free_shipping
-
-        return (await db.execute(cheapest_shipping_method_stmt)).scalars().first()
+        cheapest_shipping_method = (
+            select(ShippingMethod.id)
+            .where(ShippingMethod.store_id == Product.store_id)
+            .order_by(asc(ShippingMethod.price).nulls_last(), ShippingMethod.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(Product)
+            .where(Product.store_id == store_id)
+            .values(
+                best_shipping_method_id=func.coalesce(
+                    free_shipping, cheapest_shipping_method
+                )
+            )
+        )
+        await db.commit()
 
     @classmethod
     async def get_stores_with_less_than_n_products(
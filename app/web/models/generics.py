@@ -15,13 +15,19 @@ F = TypeVar("F")
 
 
 class PaginatedResponse(BaseModel, Generic[M, F]):
-    count: int = Field(description="Number of items returned in the response")
+    count: Optional[int] = Field(
+        default=None,
+        description="Number of items matching the criteria, omitted when not counted",
+    )
     items: List[M] = Field(
         description="List of items returned in the response following given criteria"
     )
     offset: int
     limit: int
     filters: List[F] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(
+        default=None, description="Cursor of the next page, null on the last one"
+    )
 
 
 class GenericResponse(BaseModel):
@@ -3,10 +3,10 @@ from typing import List, Optional
 
 from jinja2 import Template
 from pydantic import condecimal
-from sqlalchemy import Index, Column, Computed, text
+from sqlalchemy import Index, Column, Computed, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import TSVECTOR, ENUM
 from sqlalchemy.exc import MissingGreenlet
-from sqlmodel import Field, Relationship
+from sqlmodel import Field, Relationship, SQLModel
 from starlette.requests import Request
 
 from web.core.config import settings
@@ -97,6 +97,21 @@ class Category(Base, table=True):
         default=False, sa_column_kwargs=dict(server_default=text("FALSE"))
     )
 
+    __table_args__ = (
+        UniqueConstraint(
+            "slug",
+            "parent_id",
+            name="uq_category_slug_parent_id",
+            postgresql_nulls_not_distinct=True,
+        ),
+        Index(
+            "ix_category_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
     async def __admin_repr__(self, request: Request):
         return self.name
 
@@ -134,6 +149,16 @@ class Product(ProductBase, Base, table=True):
         ),
     )
     categorized_at: Optional[datetime] = Field(nullable=True, default=None)
+    # When the scheduler scrapes the product again, see `check_interval`, the
+    # products never scheduled are due first
+    next_check_at: Optional[datetime] = Field(nullable=True, default=None)
+    page_etag: Optional[str] = Field(nullable=True, default=None)
+    page_last_modified: Optional[str] = Field(nullable=True, default=None)
+    # Maintained from clicked_product to sort by popularity without aggregating it
+    click_count: int = Field(default=0, sa_column_kwargs=dict(server_default=text("0")))
+    recent_click_count: int = Field(
+        default=0, sa_column_kwargs=dict(server_default=text("0"))
+    )
     favorite_by: List["FavoriteProduct"] = Relationship(back_populates="product")
 
     # To query https://stackoverflow.com/questions/13837111/tsvector-in-sqlalchemy#13878979
@@ -143,7 +168,42 @@ class Product(ProductBase, Base, table=True):
         Computed("to_tsvector('english', name)", persisted=True),
         name="__ts_vector__",
     )
-    __table_args__ = (Index("ix_product", __ts_vector__, postgresql_using="gin"),)
+    __table_args__ = (
+        Index("ix_product", __ts_vector__, postgresql_using="gin"),
+        # Serve the `<<%` and `%` trigram predicates of the searches
+        Index(
+            "ix_product_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+        Index("ix_product_link", "link"),
+        Index(
+            "ix_product_category_id",
+            "category_id",
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+        Index(
+            "ix_product_due_at",
+            text("coalesce(next_check_at, '-infinity'::timestamp)"),
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+        # The searches sorted by popularity
+        Index(
+            "ix_product_click_count",
+            text("click_count DESC"),
+            "id",
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+        Index(
+            "ix_product_popularity",
+            "recent_click_count",
+            "click_count",
+            "id",
+            postgresql_where=text("is_active IS TRUE"),
+        ),
+    )
 
     def __str__(self):
         return f"{self.name} from {self.store.name}, price: {self.price}"
@@ -151,12 +211,35 @@ class Product(ProductBase, Base, table=True):
 
 class PriceHistory(CreatedAtBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    product_id: Optional[str] = Field(
-        foreign_key="product.id", nullable=False, index=True
-    )
+    product_id: Optional[str] = Field(foreign_key="product.id", nullable=False)
     product: "Product" = Relationship(back_populates="price_history")
     price: condecimal(max_digits=7, decimal_places=2) = Field(nullable=False)
 
+    __table_args__ = (
+        Index("ix_price_history_product_id_created_at", "product_id", "created_at"),
+    )
+
+
+class CategoryFacet(SQLModel, table=True):
+    """Active products per category and sub category, rebuilt after the imports"""
+
+    __tablename__ = "category_facet"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    category_id: int = Field(nullable=False, index=True)
+    sub_category_id: Optional[int] = Field(default=None, nullable=True)
+    product_count: int = Field(nullable=False)
+    refreshed_at: datetime = Field(nullable=False)
+
+
+class CategorizedName(CreatedAtBase, table=True):
+    """Categories classified for a normalized product name, no primary category
+    if the name could not be categorized"""
+
+    name: str = Field(primary_key=True)
+    primary: Optional[str] = Field(default=None, nullable=True)
+    secondary: Optional[str] = Field(default=None, nullable=True)
+
 
 class UsedProduct(Base, PublicUUID, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -180,6 +263,15 @@ class UsedProduct(Base, PublicUUID, table=True):
 
     views: List["UsedProductView"] = Relationship(back_populates="product")
 
+    __table_args__ = (
+        Index(
+            "ix_used_product_name_trgm",
+            text("lower(name) gin_trgm_ops"),
+            postgresql_using="gin",
+            postgresql_where=text("is_active IS TRUE AND is_available IS TRUE"),
+        ),
+    )
+
     @property
     def condition_label(self) -> str:
         return CONDITION_LABELS_IT.get(self.condition, "")
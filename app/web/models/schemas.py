@@ -131,8 +131,12 @@ class CategoryRead(SQLModel):
     name_it: Optional[str]
 
 
-class CategoryFilter(CategoryRead):
-    children: List[CategoryRead]
+class CategoryFacetRead(CategoryRead):
+    count: int = 0
+
+
+class CategoryFilter(CategoryFacetRead):
+    children: List[CategoryFacetRead]
 
 
 class UsedProductCreate(SQLModel):
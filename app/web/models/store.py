@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional, List
 from urllib.parse import parse_qsl, urlparse, urlencode, urlunparse
 
-from sqlalchemy import Column, Enum
+from sqlalchemy import Column, Enum, LargeBinary
 from sqlmodel import Field, SQLModel, Relationship
 from starlette.requests import Request
 
@@ -180,3 +180,13 @@ class StoreSitemap(Base, table=True):
     label: Optional[str] = Field(nullable=True)
     url: str = Field(nullable=False)
     lastmod_format: str = Field(nullable=False, default="%Y-%m-%dT%H:%M:%S%z")
+    last_imported_lastmod: Optional[datetime] = Field(nullable=True, default=None)
+    known_urls: Optional[bytes] = Field(
+        default=None,
+        sa_column=Column(
+            LargeBinary,
+            nullable=True,
+            comment="8 bytes blake2b hashes and 4 bytes lastmod of the URLs "
+            "already imported",
+        ),
+    )
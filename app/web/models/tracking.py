@@ -18,7 +18,9 @@ class ClickedProduct(SQLModel, table=True):
     client_continent: Optional[str] = Field(max_length=64, default=None)
     client_country: Optional[str] = Field(max_length=128, default=None)
     client_city: Optional[str] = Field(max_length=128, default=None)
-    product_id: Optional[str] = Field(foreign_key="product.id", nullable=True)
+    product_id: Optional[str] = Field(
+        foreign_key="product.id", nullable=True, index=True
+    )
     product: "Product" = Relationship(back_populates="clicks")
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
@@ -2,13 +2,13 @@ from decimal import Decimal
 from typing import List, Dict, Union, Optional
 from urllib.parse import urljoin, quote, urlencode
 
-import aiohttp
 from aiohttp import ClientConnectorError
 from jinja2 import Environment, PackageLoader, select_autoescape
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from web.core.config import settings
+from web.core.http import HTTPClient, http_client
 from web.logger import get_logger
 from web.models.product import Product, UsedProduct
 from web.models.user import User, UserSettings
@@ -48,10 +48,18 @@ class EmailNotification:
         },
     }
 
-    def __init__(self, db: AsyncSession, *, user: User, force: bool = False):
+    def __init__(
+        self,
+        db: AsyncSession,
+        *,
+        user: User,
+        force: bool = False,
+        http: HTTPClient = http_client,
+    ):
         self.db = db
         self.user = user
         self.force = force
+        self.http = http
 
     async def get_user_settings(self) -> Optional[UserSettings]:
         stmt = select(UserSettings).where(UserSettings.user_id == self.user.id)
@@ -92,17 +100,17 @@ class EmailNotification:
             logger.debug(f"Preventing to send email '{subject}' to {to} with {kwargs}")
             return
 
-        async with aiohttp.ClientSession(
-            headers={
-                "Authorization": f"Bearer {settings.RESEND_API_KEY}",
-                "Content-Type": "application/json",
-            }
-        ) as session:
-            try:
-                async with session.post(self.SEND_URL, json=payload) as resp:
-                    logger.debug((await resp.text()))
-            except ClientConnectorError:
-                pass
+        headers = {
+            "Authorization": f"Bearer {settings.RESEND_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        try:
+            async with self.http.session.post(
+                self.SEND_URL, json=payload, headers=headers
+            ) as resp:
+                logger.debug((await resp.text()))
+        except ClientConnectorError:
+            pass
 
     def render(self, template_name: str, lang: str = "en", **kwargs):
         template_name = (
@@ -1,9 +1,8 @@
 import os
 from urllib.parse import quote
 
-import aiohttp
-
 from web.core.config import settings
+from web.core.http import http_client
 from web.logger import get_logger
 
 
@@ -39,9 +38,8 @@ async def send_log_to_telegram(message: str, level: str = "info"):
         logger.debug(f"Preventing Telegram message: {message}")
         return
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(LOG_API_URL + quote(message)) as resp:
-            logger.debug(await resp.text())
+    async with http_client.session.get(LOG_API_URL + quote(message)) as resp:
+        logger.debug(await resp.text())
 
 
 async def post_used_product(message: str):
@@ -50,14 +48,13 @@ async def post_used_product(message: str):
         return
 
     logger.debug(f"Sending {message=}")
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            f"https://api.telegram.org/bot{NORTH_FPV_BOT_KEY}/sendMessage",
-            json={
-                "chat_id": NORTH_FPV_MAIN_CHANNEL,
-                "parse_mode": "HTML",
-                "text": message,
-                "disable_web_page_preview": False,
-            },
-        ) as resp:
-            logger.debug(await resp.text())
+    async with http_client.session.post(
+        f"https://api.telegram.org/bot{NORTH_FPV_BOT_KEY}/sendMessage",
+        json={
+            "chat_id": NORTH_FPV_MAIN_CHANNEL,
+            "parse_mode": "HTML",
+            "text": message,
+            "disable_web_page_preview": False,
+        },
+    ) as resp:
+        logger.debug(await resp.text())
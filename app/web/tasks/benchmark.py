@@ -0,0 +1,84 @@
+"""Throughput of the scraping hot paths on the fixture prices and pages.
+
+    python -m web.tasks.benchmark [name ...]
+"""
+import json
+import locale
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+
+from web.tasks.extraction import ExtractionPlan
+from web.tasks.prices import ALLOWED_CHARACTERS, PRICE_PATTERN, parse_price
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures"
+FIELDS = ["name", "price", "image", "is_available", "variations", "description"]
+
+PRICES = [
+    "€29,99",
+    "1.049,90\xa0€",
+    "Prezzo: 1.049,90 €",
+    "$1,229.00",
+    "Sold out",
+]
+
+
+def parse_price_with_setlocale(price_string: str, locale_name: str) -> Optional[float]:
+    """How the prices were parsed before the compiled parsers"""
+    match = PRICE_PATTERN.match(price_string)
+    if not match:
+        clean_price = "".join(c for c in price_string if c in ALLOWED_CHARACTERS)
+        match = PRICE_PATTERN.match(clean_price)
+    if not match:
+        return None
+    locale.setlocale(locale.LC_NUMERIC, locale_name)
+    return locale.atof(match.group(4))
+
+
+def prices(rounds: int = 10_000):
+    calls = rounds * len(PRICES)
+    parsers = {"compiled": parse_price, "setlocale": parse_price_with_setlocale}
+    for name, parse in parsers.items():
+        try:
+            elapsed = timeit.timeit(
+                lambda: [parse(price, "it_IT") for price in PRICES], number=rounds
+            )
+        except locale.Error as e:
+            print(f"{name:>11}: skipped, {e}")
+            continue
+        print(f"{name:>11}: {elapsed / calls * 1e6:.2f}us/price")
+
+
+def extraction(rounds: int = 20):
+    stores = json.loads((FIXTURES / "stores.json").read_text())
+    pages = [
+        (
+            ExtractionPlan.compile(SimpleNamespace(**case["store"]), FIELDS),
+            (FIXTURES / "pages" / case["page"]).read_text(),
+        )
+        for case in stores
+    ]
+    for parser in ("html.parser", "lxml"):
+        elapsed = sum(
+            timeit.timeit(lambda: plan.extract(html, parser=parser), number=rounds)
+            for plan, html in pages
+        )
+        print(f"{parser:>11}: {elapsed / (rounds * len(pages)) * 1000:.2f}ms/page")
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "prices": prices,
+    "extraction": extraction,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        print(name)
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,148 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
+from playwright.async_api import (
+    async_playwright,
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    Route,
+)
+
+from web.core.config import settings
+from web.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class BrowserResponse:
+    """The rendered page and the status of its navigation"""
+
+    status: int
+    html: str
+    retry_after: Optional[str] = None
+
+
+class PageSlot:
+    """A browser context with a single page, recycled after some navigations"""
+
+    def __init__(self):
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.navigations = 0
+
+    async def close(self):
+        if self.context is not None:
+            try:
+                await self.context.close()
+            except Exception as e:
+                logger.debug(f"Could not close browser context: {e}")
+        self.context = None
+        self.page = None
+        self.navigations = 0
+
+
+class BrowserPool:
+    """One long-lived headless Chromium serving a bounded set of reusable pages.
+
+    Images, fonts, stylesheets and media are never downloaded because the
+    field extraction only needs the rendered HTML.
+    """
+
+    BLOCKED_RESOURCE_TYPES = {"image", "font", "stylesheet", "media"}
+
+    def __init__(
+        self,
+        *,
+        size: int = settings.BROWSER_POOL_SIZE,
+        max_navigations: int = settings.BROWSER_PAGE_MAX_NAVIGATIONS,
+    ):
+        self.size = size
+        self.max_navigations = max_navigations
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._slots: Optional[asyncio.Queue] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _start(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self.is_running:
+                return
+
+            await self._stop()
+            logger.info(f"Launching headless browser with {self.size} pages")
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch()
+            self._slots = asyncio.Queue()
+            for _ in range(self.size):
+                self._slots.put_nowait(PageSlot())
+
+    async def _block_unused_resources(self, route: Route):
+        if route.request.resource_type in self.BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _open(self, slot: PageSlot, user_agent: str) -> Page:
+        if slot.page is None or slot.page.is_closed():
+            await slot.close()
+            slot.context = await self._browser.new_context(user_agent=user_agent)
+            await slot.context.route("**/*", self._block_unused_resources)
+            slot.page = await slot.context.new_page()
+        return slot.page
+
+    async def get_content(self, url: str, *, user_agent: str) -> BrowserResponse:
+        await self._start()
+        slots = self._slots
+        slot = await slots.get()
+        try:
+            page = await self._open(slot, user_agent)
+            slot.navigations += 1
+            response = await page.goto(url)
+            if response is None:
+                # Same document navigations have no response
+                return BrowserResponse(status=200, html=await page.content())
+            return BrowserResponse(
+                status=response.status,
+                html=await page.content(),
+                retry_after=response.headers.get("retry-after"),
+            )
+        except Exception:
+            await slot.close()
+            raise
+        finally:
+            if slot.navigations >= self.max_navigations:
+                await slot.close()
+            slots.put_nowait(slot)
+
+    async def _stop(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                logger.debug(f"Could not close the browser: {e}")
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+        self._slots = None
+
+    async def close(self):
+        if self._lock is None:
+            return
+
+        async with self._lock:
+            await self._stop()
+
+
+browser_pool = BrowserPool()
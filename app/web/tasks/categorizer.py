@@ -0,0 +1,145 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.ai.classifier import Classify, classify_product_categories
+from web.ai.local import LocalClassifier, LocalFirstClassifier
+from web.core.cache import CATEGORIES, normalize_query, response_cache
+from web.core.config import settings
+from web.db import engine
+from web.logger import get_logger
+from web.manager.category import CategoryRegistry, category_registry
+from web.manager.product import CategoryManager, ProductManager
+
+logger = get_logger(__name__)
+
+
+class Categorizer:
+    """Categorize the new products in the background, off the scraping path.
+
+    The products never categorized are the queue: the writers wake the
+    categorizer up after their flushes, and it also looks for them every
+    `interval` seconds. Names already classified come from the cache, the
+    others from the local classifier when confident or else in batches by the
+    LLM.
+    """
+
+    def __init__(
+        self,
+        *,
+        classify: Classify = classify_product_categories,
+        batch_size: int = settings.CATEGORIZE_BATCH_SIZE,
+        max_products: int = settings.CATEGORIZE_MAX_PRODUCTS,
+        interval: int = settings.CATEGORIZE_INTERVAL_SECONDS,
+        local: Optional[LocalClassifier] = None,
+        categories: CategoryRegistry = category_registry,
+    ):
+        self.classify = classify
+        self.batch_size = batch_size
+        self.max_products = max_products
+        self.interval = interval
+        self.local = local
+        self.categories = categories
+        self._trained_at: Optional[float] = None
+        # The LLM, behind the local classifier once trained
+        self._classify: Classify = classify
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def train(self, db: AsyncSession):
+        """Retrain the local classifier on the categorized products when stale"""
+        if self.local is None or (
+            self._trained_at is not None
+            and time.monotonic() - self._trained_at
+            < settings.LOCAL_CLASSIFIER_RETRAIN_SECONDS
+        ):
+            return
+
+        self._trained_at = time.monotonic()
+        examples = await CategoryManager.get_labelled_names(db)
+        if len(examples) < settings.LOCAL_CLASSIFIER_MIN_EXAMPLES:
+            logger.info(f"Not training the local classifier on {len(examples)} names")
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.local.fit, examples)
+        self._classify = LocalFirstClassifier(self.local, self.classify)
+
+    async def categorize_pending(self, db: AsyncSession) -> Tuple[int, int]:
+        """Categorize the next pending products, returns how many were loaded
+        and how many categorized"""
+        products = await ProductManager.get_uncategorized_products(
+            db, limit=self.max_products
+        )
+        if not products:
+            return 0, 0
+
+        categorized = await CategoryManager.classify(
+            db,
+            names=[product.name for product in products],
+            classify=self._classify,
+            batch_size=self.batch_size,
+        )
+        categories = []
+        for product in products:
+            entry = categorized.get(normalize_query(product.name))
+            if entry is None:
+                continue
+            category_id, sub_category_id = await self.categories.get_ids(
+                db, primary=entry.primary, secondary=entry.secondary
+            )
+            categories.append(
+                {
+                    "product_id": product.id,
+                    "category_id": category_id,
+                    "sub_category_id": sub_category_id,
+                }
+            )
+
+        await ProductManager.set_categories(db, categories=categories)
+        await db.commit()
+        return len(products), len(categories)
+
+    async def categorize(self) -> int:
+        """Categorize the pending products, until the names left all failed"""
+        total = 0
+        self.categories.invalidate()
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            await self.train(db)
+            while True:
+                loaded, categorized = await self.categorize_pending(db)
+                total += categorized
+                if loaded < self.max_products or categorized < loaded:
+                    break
+
+            if total:
+                logger.info(f"Categorized {total} products, {self.usage}")
+                await CategoryManager.refresh_category_facets(db)
+                await response_cache.publish_invalidation(db, CATEGORIES)
+        return total
+
+    @property
+    def usage(self) -> str:
+        if isinstance(self._classify, LocalFirstClassifier):
+            return (
+                f"{self._classify.local_names} names classified locally and "
+                f"{self._classify.fallback_names} by the LLM"
+            )
+        return "the local classifier is not trained"
+
+    async def run(self):
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            self._wakeup.clear()
+            try:
+                await self.categorize()
+            except Exception as e:
+                logger.error(f"Could not categorize the products: {e}")
+
+
+categorizer = Categorizer(local=LocalClassifier())
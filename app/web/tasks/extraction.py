@@ -0,0 +1,304 @@
+import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from unicodedata import normalize
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from web.core.config import settings
+from web.logger import get_logger
+from web.models.store import Store
+from web.tasks.prices import parse_price
+
+logger = get_logger(__name__)
+
+# BeautifulSoup's get_text() does not return the content of these tags
+TAGS_WITHOUT_TEXT = {"script", "style", "template"}
+# ...and collapses whitespace-only strings with a newline, except in these tags
+TAGS_PRESERVING_WHITESPACE = {"pre", "textarea"}
+
+
+@dataclass(frozen=True)
+class FieldSelector:
+    field: str
+    tag: str
+    attribute: str
+    value: str
+
+    def matches(self, tag: str, attributes) -> bool:
+        """Same semantic of BeautifulSoup's `find(tag, {attribute: value})`"""
+        if tag != self.tag:
+            return False
+
+        attribute_value = attributes.get(self.attribute)
+        if attribute_value is None:
+            return False
+
+        if self.attribute != "class":
+            return attribute_value == self.value
+
+        classes = attribute_value.split()
+        return self.value in classes or self.value == " ".join(classes)
+
+
+class FoundElement(NamedTuple):
+    text: str
+    image: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ExtractionPlan:
+    """The selectors of a store compiled once and reused for all its pages"""
+
+    store_name: str
+    website: str
+    locale: str
+    currency: str
+    is_available_match: Optional[str]
+    selectors: Tuple[FieldSelector, ...]
+
+    @classmethod
+    def compile(cls, store: Store, fields: List[str]) -> "ExtractionPlan":
+        selectors = []
+        for field in fields:
+            style_class = getattr(store, f"product_{field}_class")
+            html_tag = getattr(store, f"product_{field}_tag")
+            if not bool(style_class) or not bool(html_tag):
+                continue
+
+            attribute = (
+                "class" if getattr(store, f"product_{field}_css_is_class") else "id"
+            )
+            selectors.append(FieldSelector(field, html_tag, attribute, style_class))
+
+        return cls(
+            store_name=store.name,
+            website=store.website,
+            locale=store.locale,
+            currency=store.currency,
+            is_available_match=store.product_is_available_match,
+            selectors=tuple(selectors),
+        )
+
+    def extract(self, html: str, parser: str = "lxml") -> Dict[str, Any]:
+        """Extract the product fields from a page"""
+        found = FINDERS[parser](self.selectors, html)
+        data = {}
+        for selector in self.selectors:
+            field = selector.field
+            logger.debug(
+                f"Scraping {field} with tag '{selector.tag}' "
+                f"and {selector.attribute}='{selector.value}'"
+            )
+            element = found.get(field)
+            if not element:
+                logger.warning(f"Nothing found when searching for {field}!")
+                continue
+
+            if field == "is_available":
+                data[field] = extract_product_availability(
+                    element.text, self.is_available_match
+                )
+            elif field == "image":
+                data[field] = extract_product_image(element.image, self.website)
+            elif field == "price":
+                data[field] = extract_price(element.text, self.locale)
+                data["currency"] = self.currency
+            elif field == "variations" and not data.get("is_available", None):
+                data["is_available"] = None
+            elif field == "description":
+                data[field] = element.text
+            else:
+                data[field] = normalize(
+                    "NFKD", remove_extra_spaces_and_newlines(element.text)
+                )
+
+        data.pop("variations", None)
+        return data
+
+
+def _collapse_whitespace(text: str) -> str:
+    if "\n" in text and not text.strip():
+        return "\n"
+    return text
+
+
+def _text_of(element: etree._Element) -> str:
+    """The text of an lxml element as BeautifulSoup's get_text() would return it"""
+    parts = []
+    stack = [(element, False, False)]
+    while stack:
+        node, is_tail, preserve = stack.pop()
+        if is_tail:
+            if node.tail:
+                parts.append(node.tail if preserve else _collapse_whitespace(node.tail))
+            continue
+
+        has_text = isinstance(node.tag, str) and node.tag not in TAGS_WITHOUT_TEXT
+        preserve_children = preserve or node.tag in TAGS_PRESERVING_WHITESPACE
+        if has_text and node.text:
+            parts.append(
+                node.text if preserve_children else _collapse_whitespace(node.text)
+            )
+        if node is not element:
+            stack.append((node, True, preserve))
+        if has_text:
+            stack.extend((child, False, preserve_children) for child in reversed(node))
+    return "".join(parts)
+
+
+def _image_of(element: etree._Element) -> Optional[str]:
+    img = element if element.tag == "img" else next(element.iter("img"), None)
+    if img is None:
+        return None
+    return img.get("data-src") if "data-src" in img.attrib else img.attrib["src"]
+
+
+def find_with_lxml(
+    selectors: Tuple[FieldSelector, ...], html: str, chunk_size: int = 16 * 1024
+) -> Dict[str, FoundElement]:
+    """Find the first element of each selector, stopping once all of them are read"""
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    claimed: Dict[str, etree._Element] = {}
+    found: Dict[str, FoundElement] = {}
+
+    def read_events() -> bool:
+        for event, element in parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+
+            if event == "start":
+                for selector in selectors:
+                    if selector.field not in claimed and selector.matches(
+                        element.tag, element.attrib
+                    ):
+                        claimed[selector.field] = element
+                continue
+
+            for field, claimed_element in claimed.items():
+                if claimed_element is element and field not in found:
+                    found[field] = FoundElement(
+                        text=_text_of(element),
+                        image=_image_of(element) if field == "image" else None,
+                    )
+
+            if len(found) == len(selectors):
+                return True
+        return False
+
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start : start + chunk_size])
+        if read_events():
+            return found
+
+    parser.close()
+    read_events()
+    return found
+
+
+def find_with_soup(
+    selectors: Tuple[FieldSelector, ...], html: str
+) -> Dict[str, FoundElement]:
+    """Reference implementation building the whole BeautifulSoup tree"""
+    soup = BeautifulSoup(html, "html.parser")
+    found = {}
+    for selector in selectors:
+        soup_obj = soup.find(selector.tag, {selector.attribute: selector.value})
+        if not soup_obj:
+            continue
+
+        image = None
+        if selector.field == "image":
+            if soup_obj.name != "img":
+                soup_obj = soup_obj.find("img")
+            image = (
+                soup_obj["data-src"]
+                if soup_obj.has_attr("data-src")
+                else soup_obj["src"]
+            )
+        found[selector.field] = FoundElement(text=soup_obj.get_text(), image=image)
+    return found
+
+
+FINDERS: Dict[str, Callable[..., Dict[str, FoundElement]]] = {
+    "lxml": find_with_lxml,
+    "html.parser": find_with_soup,
+}
+
+
+class ParseExecutor:
+    """Run the extraction plans inline or on a pool of parser processes.
+
+    With `workers` set to 0 the pages are parsed on the event loop, otherwise
+    the HTML is sent to the pool and only the plain field dict comes back.
+    """
+
+    def __init__(self, *, workers: int = settings.SCRAPER_PARSE_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.info(f"Starting {self.workers} parser processes")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def extract(
+        self, plan: ExtractionPlan, html: str, *, parser: str
+    ) -> Dict[str, Any]:
+        if not self.workers:
+            return plan.extract(html, parser)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.pool, plan.extract, html, parser)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory), start a new pool next time
+            self.close()
+            raise
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+parse_executor = ParseExecutor()
+
+
+def remove_extra_spaces_and_newlines(value: str) -> str:
+    value = re.sub(" +", " ", value)  # Remove extra spaces
+    value = re.sub("\n{2,}", " ", value)  # Remove extra newlines
+    value = re.sub("\x00", "", value)  # Remove NULL-terminated string
+    return value.strip()
+
+
+def format_image_link(link: str, website: str) -> str:
+    link = link.format(width=300)
+    if link.startswith("//"):
+        link = f"https:{link}"
+    if not link.startswith("http"):
+        link = f"{website}{link}"
+    return link
+
+
+def extract_product_availability(text: str, is_available_match: str) -> bool:
+    text = text.strip()
+    logger.debug(f"Found {text} in availability tag")
+    return bool(re.search(is_available_match.lower(), text.lower()))
+
+
+def extract_product_image(img_link: Optional[str], website: str) -> str:
+    if img_link is None:
+        raise ValueError("No image found in the image tag")
+    return format_image_link(img_link, website)
+
+
+def extract_price(text: str, locale_name: str) -> Optional[Decimal]:
+    return parse_price(remove_extra_spaces_and_newlines(text), locale_name)
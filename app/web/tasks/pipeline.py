@@ -0,0 +1,289 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from playwright.async_api import TimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.core.cache import SEARCH, response_cache
+from web.core.config import settings
+from web.logger import get_logger
+from web.manager.product import ProductManager
+from web.models.product import Product
+from web.models.store import Store
+from web.notifications.telegram import send_log_to_telegram
+from web.tasks.politeness import DomainStats, PolitenessController, politeness
+from web.tasks.scraper import (
+    StoreScraper,
+    PageNotModified,
+    ProductPriceNotFound,
+    ProductNameNotFound,
+    URLNotFound,
+    URLSkipped,
+    URLThrottled,
+)
+from web.tasks.writer import ProductWriteBuffer
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PipelineStats:
+    stores: int = 0
+    products_to_update: int = 0
+    pages_fetched: int = 0
+    products_updated: int = 0
+    products_deactivated: int = 0
+    conditional_requests: int = 0
+    pages_not_modified: int = 0
+    pages_throttled: int = 0
+    # Requests of the run to each store domain
+    domains: Dict[str, DomainStats] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages_fetched / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def products_per_second(self) -> float:
+        return self.products_updated / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        if not self.conditional_requests:
+            return 0.0
+        return self.pages_not_modified / self.conditional_requests
+
+    def summary(self) -> str:
+        summary = (
+            f"Fetched {self.pages_fetched} pages and updated "
+            f"{self.products_updated}/{self.products_to_update} products "
+            f"({self.products_deactivated} deactivated) in {self.elapsed:.0f}s: "
+            f"{self.pages_per_second:.2f} pages/s, "
+            f"{self.products_per_second:.2f} products/s, "
+            f"{self.pages_not_modified} not modified "
+            f"({self.cache_hit_ratio:.0%} cache hit ratio), "
+            f"{self.pages_throttled} throttled"
+        )
+        domains = "; ".join(
+            f"{domain}: {stats.summary()}"
+            for domain, stats in sorted(self.domains.items())
+        )
+        return f"{summary}. {domains}" if domains else summary
+
+
+@dataclass
+class UpdateJob:
+    store: Store
+    product: Product
+    new_data: Product
+
+
+@dataclass
+class DeactivateJob:
+    product_link: str
+
+
+@dataclass
+class StoreDone:
+    store: Store
+
+
+class UpdatePipeline:
+    """Scrape many stores concurrently and funnel the results to a single DB writer.
+
+    The fetch stage runs up to `max_concurrent_stores` stores in parallel, each
+    with at most `max_concurrent_requests_per_store` requests in flight. All the
+    writes go through a bounded queue consumed by one writer, which is the only
+    coroutine allowed to use the session and writes the products in chunks.
+    Once a store is done the writer invalidates the search results of the API
+    processes, at most every `search_invalidation_seconds` and at the end.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        *,
+        fields: List[str],
+        max_concurrent_stores: int = settings.SCRAPER_MAX_CONCURRENT_STORES,
+        max_concurrent_requests_per_store: int = (
+            settings.SCRAPER_MAX_CONCURRENT_REQUESTS_PER_STORE
+        ),
+        queue_size: int = settings.SCRAPER_WRITE_QUEUE_SIZE,
+        chunk_size: int = settings.PRODUCT_WRITE_CHUNK_SIZE,
+        search_invalidation_seconds: int = settings.SEARCH_CACHE_INVALIDATION_SECONDS,
+        politeness: PolitenessController = politeness,
+    ):
+        self.db = db
+        self.fields = fields
+        self.max_concurrent_stores = max_concurrent_stores
+        self.max_concurrent_requests_per_store = max_concurrent_requests_per_store
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.search_invalidation_seconds = search_invalidation_seconds
+        self.politeness = politeness
+        self.stats = PipelineStats()
+        self._work: List[Tuple[Store, List[Product]]] = []
+        # Products written when the search results were last invalidated
+        self._search_written = 0
+        self._search_invalidated_at = 0.0
+
+    def add_store(self, store: Store, products: List[Product]):
+        self._work.append((store, products))
+        self.stats.stores += 1
+        self.stats.products_to_update += len(products)
+
+    async def run(self) -> PipelineStats:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        store_slots = asyncio.Semaphore(self.max_concurrent_stores)
+
+        async def scrape_store(store: Store, products: List[Product]):
+            async with store_slots:
+                await self._scrape_store(queue, store, products)
+
+        domains = self.politeness.snapshot()
+        writer = asyncio.create_task(self._write(queue))
+        try:
+            await asyncio.gather(
+                *(scrape_store(store, products) for store, products in self._work)
+            )
+        finally:
+            await queue.put(None)
+            await writer
+
+        self.stats.finished_at = time.monotonic()
+        self.stats.domains = self.politeness.stats_since(domains)
+        return self.stats
+
+    async def _scrape_store(
+        self,
+        queue: asyncio.Queue,
+        store: Store,
+        products: List[Product],
+    ):
+        logger.debug(f"Updating products for {store.name}")
+        scraper = StoreScraper(store=store, politeness=self.politeness)
+        pending = iter(products)
+
+        async def worker():
+            for product in pending:
+                logger.debug(f"Current product {product.id}")
+                product_link = store.affiliate_link(product.link)
+                new_data = await self._scrape(queue, scraper, product_link, product)
+                if new_data:
+                    await queue.put(
+                        UpdateJob(store=store, product=product, new_data=new_data)
+                    )
+
+        await asyncio.gather(
+            *(worker() for _ in range(self.max_concurrent_requests_per_store))
+        )
+        await queue.put(StoreDone(store=store))
+
+    async def _scrape(
+        self,
+        queue: asyncio.Queue,
+        scraper: StoreScraper,
+        url: str,
+        product: Product,
+    ) -> Optional[Product]:
+        try:
+            new_data = await scraper.scrape(
+                url,
+                self.fields,
+                etag=product.page_etag,
+                last_modified=product.page_last_modified,
+            )
+        except PageNotModified:
+            self._count_fetched(product)
+            logger.debug(f"Skipping {product.id}, the page did not change")
+            self.stats.pages_not_modified += 1
+            return
+        except URLThrottled as e:
+            # Checked again when due, the page is not known to be gone
+            if not isinstance(e, URLSkipped):
+                self._count_fetched(product)
+            logger.info(f"Skipping {product.id}: {e}")
+            self.stats.pages_throttled += 1
+            return
+        except (URLNotFound, TimeoutError) as e:
+            if isinstance(e, URLNotFound):
+                self._count_fetched(product)
+            logger.warning(f"DEACTIVATING PRODUCT! {e}")
+            await queue.put(DeactivateJob(product_link=url))
+            return
+        except (ProductNameNotFound, ProductPriceNotFound):
+            self._count_fetched(product)
+            return
+        except Exception as e:
+            msg = f"Unexpected error when creating or updating product {url}: {e}"
+            await send_log_to_telegram(msg, "error")
+            return
+
+        self._count_fetched(product)
+        return new_data
+
+    def _count_fetched(self, product: Product):
+        """Count a page once its response arrived"""
+        self.stats.pages_fetched += 1
+        if product.page_etag or product.page_last_modified:
+            self.stats.conditional_requests += 1
+
+    async def _write(self, queue: asyncio.Queue):
+        buffer = ProductWriteBuffer(
+            self.db,
+            insert_fields=self.fields,
+            update_fields=self.fields,
+            chunk_size=self.chunk_size,
+        )
+        async with buffer:
+            while (job := await queue.get()) is not None:
+                if isinstance(job, DeactivateJob):
+                    try:
+                        await ProductManager.deactivate(
+                            self.db, product_link=job.product_link
+                        )
+                        self.stats.products_deactivated += 1
+                    except Exception as e:
+                        logger.error(f"Could not write {job}: {e}")
+                        await self.db.rollback()
+                    continue
+
+                if isinstance(job, StoreDone):
+                    if (
+                        time.monotonic() - self._search_invalidated_at
+                        >= self.search_invalidation_seconds
+                    ):
+                        await buffer.flush()
+                        await self._invalidate_search(buffer)
+                    continue
+
+                # Committed together with the chunk of products
+                job.store.last_check = datetime.now()
+                await buffer.add(job.store, job.new_data, product=job.product)
+
+        self.stats.products_updated = buffer.written
+        await self._invalidate_search(buffer)
+
+    async def _invalidate_search(self, buffer: ProductWriteBuffer):
+        """Invalidate the search results of the API processes when products
+        were written since the last time"""
+        if buffer.written == self._search_written:
+            return
+
+        try:
+            await response_cache.publish_invalidation(self.db, SEARCH)
+        except Exception as e:
+            logger.error(f"Could not invalidate the search results: {e}")
+            await self.db.rollback()
+            return
+        self._search_written = buffer.written
+        self._search_invalidated_at = time.monotonic()
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from web.core.config import settings
+from web.logger import get_logger
+
+logger = get_logger(__name__)
+
+# The responses of a store asking to slow down, not a sign the page is gone
+THROTTLING_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a `Retry-After` header, in seconds or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+@dataclass
+class DomainStats:
+    requests: int = 0
+    errors: int = 0
+    throttled: int = 0
+    # Total seconds waiting for the responses
+    latency: float = 0.0
+    # Requests per second allowed when the stats were taken
+    rate: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency / self.requests if self.requests else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def __sub__(self, other: "DomainStats") -> "DomainStats":
+        return DomainStats(
+            requests=self.requests - other.requests,
+            errors=self.errors - other.errors,
+            throttled=self.throttled - other.throttled,
+            latency=self.latency - other.latency,
+            rate=self.rate,
+        )
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests, {self.mean_latency * 1000:.0f}ms, "
+            f"{self.error_rate:.0%} errors ({self.throttled} throttled), "
+            f"{self.rate:.2f} req/s"
+        )
+
+
+class DomainLimiter:
+    """Token bucket of the requests to one domain, with AIMD rate control.
+
+    Every successful response raises the rate by `increase` requests per
+    second, every 429 or 503 multiplies it by `decrease` and stops the requests
+    for the `Retry-After` of the response, or else for `backoff` seconds
+    doubled on each consecutive throttling.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float = settings.POLITENESS_INITIAL_RATE,
+        min_rate: float = settings.POLITENESS_MIN_RATE,
+        max_rate: float = settings.POLITENESS_MAX_RATE,
+        burst: int = settings.POLITENESS_BURST,
+        increase: float = settings.POLITENESS_RATE_INCREASE,
+        decrease: float = settings.POLITENESS_RATE_DECREASE,
+        backoff: float = settings.POLITENESS_BACKOFF_SECONDS,
+        max_backoff: float = settings.POLITENESS_MAX_BACKOFF_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = DomainStats()
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self._updated_at = clock()
+        self._consecutive_throttles = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def blocked_for(self) -> float:
+        return max(self.blocked_until - self.clock(), 0.0)
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.tokens + (now - self._updated_at) * self.rate, float(self.burst)
+        )
+        self._updated_at = now
+
+    async def acquire(self, *, max_wait: float = float("inf")) -> bool:
+        """Wait for a token, False without waiting when the domain is backing
+        off for longer than `max_wait` seconds"""
+        async with self._lock:
+            while True:
+                if self.blocked_for > max_wait:
+                    return False
+                self._refill()
+                wait = max(self.blocked_for, (1 - self.tokens) / self.rate)
+                if wait <= 0:
+                    self.tokens -= 1
+                    return True
+                await self.sleep(wait)
+
+    def record(
+        self,
+        status: Optional[int],
+        latency: float,
+        *,
+        retry_after: Optional[float] = None,
+    ):
+        """Account a response, a None status is a request that failed"""
+        self.stats.requests += 1
+        self.stats.latency += latency
+        if status in THROTTLING_STATUSES:
+            self.throttle(retry_after)
+            return
+
+        if status is None or status >= 400:
+            self.stats.errors += 1
+            return
+
+        self._consecutive_throttles = 0
+        self.rate = min(self.rate + self.increase, self.max_rate)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        self.stats.errors += 1
+        self.stats.throttled += 1
+        self._consecutive_throttles += 1
+        if retry_after is None:
+            retry_after = self.backoff * 2 ** (self._consecutive_throttles - 1)
+        self._refill()
+        self.rate = max(self.rate * self.decrease, self.min_rate)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(
+            self.blocked_until, self.clock() + min(retry_after, self.max_backoff)
+        )
+
+    def snapshot(self) -> DomainStats:
+        return replace(self.stats, rate=self.rate)
+
+
+class PolitenessController:
+    """The limiters of the domains the scrapers request, created on first use"""
+
+    def __init__(
+        self,
+        *,
+        max_wait: float = settings.POLITENESS_MAX_WAIT_SECONDS,
+        limiter_factory: Callable[[], DomainLimiter] = DomainLimiter,
+    ):
+        self.max_wait = max_wait
+        self.limiter_factory = limiter_factory
+        self._limiters: Dict[str, DomainLimiter] = {}
+
+    @staticmethod
+    def domain(url: str) -> str:
+        return (urlsplit(url).hostname or "").removeprefix("www.")
+
+    def limiter(self, url: str) -> DomainLimiter:
+        domain = self.domain(url)
+        if domain not in self._limiters:
+            self._limiters[domain] = self.limiter_factory()
+        return self._limiters[domain]
+
+    async def acquire(self, url: str) -> Optional[DomainLimiter]:
+        """The limiter of the domain of the url once it can be requested, None
+        when it is backing off for longer than `max_wait`"""
+        limiter = self.limiter(url)
+        if not await limiter.acquire(max_wait=self.max_wait):
+            return None
+        return limiter
+
+    def snapshot(self) -> Dict[str, DomainStats]:
+        return {
+            domain: limiter.snapshot() for domain, limiter in self._limiters.items()
+        }
+
+    def stats_since(self, before: Dict[str, DomainStats]) -> Dict[str, DomainStats]:
+        """The stats of the domains requested since the `before` snapshot"""
+        stats = {}
+        for domain, current in self.snapshot().items():
+            diff = current - before.get(domain, DomainStats())
+            if diff.requests:
+                stats[domain] = diff
+        return stats
+
+
+politeness = PolitenessController()
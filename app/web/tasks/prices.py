@@ -0,0 +1,68 @@
+import re
+import string
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Optional
+
+from babel.numbers import get_decimal_symbol, get_group_symbol
+
+from web.models.enums import Locale
+
+PRICE_PATTERN = re.compile(
+    r"(([A-Z]{3} )?(\$|€|£)?(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})))"
+)
+
+ALLOWED_CHARACTERS = frozenset(string.digits + ".,$€£")
+NO_SEPARATORS = str.maketrans({".": None, ",": None})
+
+
+class PriceParser:
+    """Parse the prices written with the number symbols of a locale.
+
+    The symbols come from Babel once, so parsing never touches the process
+    wide `locale` settings and is safe to share between coroutines and threads.
+    The amounts always end with a separator and the cents, so a price written
+    with the other convention, like €255,43 on an en_US page, is read by the
+    separator before its cents.
+    """
+
+    def __init__(self, locale_name: str):
+        self.locale_name = locale_name
+        self.decimal_symbol = get_decimal_symbol(locale_name)
+        self.group_symbol = get_group_symbol(locale_name)
+        self._delocalize = str.maketrans(
+            {self.group_symbol: None, self.decimal_symbol: "."}
+        )
+
+    def parse(self, price_string: str) -> Optional[Decimal]:
+        match = PRICE_PATTERN.match(price_string)
+        if not match:
+            # Retry once keeping only digits, separators and currency symbols
+            clean_price = "".join(c for c in price_string if c in ALLOWED_CHARACTERS)
+            match = PRICE_PATTERN.match(clean_price)
+        if not match:
+            return None
+
+        amount = match.group(4)
+        if amount[-3] == self.decimal_symbol:
+            amount = amount.translate(self._delocalize)
+        else:
+            amount = f"{amount[:-3].translate(NO_SEPARATORS)}.{amount[-2:]}"
+        try:
+            return Decimal(amount)
+        except InvalidOperation:
+            return None
+
+
+@lru_cache(maxsize=None)
+def get_price_parser(locale_name: str) -> PriceParser:
+    return PriceParser(locale_name)
+
+
+# Compile the parsers of the supported locales upfront
+for supported_locale in Locale:
+    get_price_parser(supported_locale.value)
+
+
+def parse_price(price_string: str, locale_name: str) -> Optional[Decimal]:
+    return get_price_parser(locale_name).parse(price_string)
@@ -1,24 +1,31 @@
-from datetime import datetime
 from typing import List, Optional
 
 from aiocron import crontab
 from playwright.async_api import TimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from web.core.cache import CATEGORIES, SEARCH, STORES, response_cache
+from web.core.config import settings
 from web.db import engine
 from web.logger import get_logger
-from web.manager.product import ProductManager
+from web.manager.category import category_registry
+from web.manager.product import CategoryManager, ProductManager
+from web.manager.shipping import shipping_index
 from web.manager.store import StoreManager
 from web.models.product import FIELDS_TO_UPDATE, FIELDS_TO_IMPORT, Product
 from web.models.store import Store
 from web.notifications.telegram import send_log_to_telegram
+from web.tasks.scheduler import scheduler
+from web.tasks.sitemap import SitemapWatermark
 from web.tasks.scraper import (
     StoreScraper,
     ProductPriceNotFound,
     ProductNameNotFound,
     URLNotFound,
+    URLThrottled,
     SiteMapScraper,
 )
+from web.tasks.writer import ProductWriteBuffer
 
 logger = get_logger(__name__)
 
@@ -26,8 +33,11 @@ logger = get_logger(__name__)
 async def scrape_or_deactivate(
     db: AsyncSession, scraper: StoreScraper, url: str, fields: List
 ) -> Optional[Product]:
+    """The scraped product, the throttled requests raise `URLThrottled`"""
     try:
         return await scraper.scrape(url, fields)
+    except URLThrottled:
+        raise
     except (URLNotFound, TimeoutError) as e:
         logger.warning(f"DEACTIVATING PRODUCT! {e}")
         await ProductManager.deactivate(db, product_link=url)
@@ -40,51 +50,11 @@ async def scrape_or_deactivate(
         return
 
 
-async def update_products_by_continent(continent_name: str):
-    """Update all products stored"""
-    logger.info(f"Started updating products for stores in {continent_name}")
-    async with AsyncSession(engine, expire_on_commit=False) as db:
-        stores = await StoreManager.get_active_stores(db, continent_name=continent_name)
-        products_updated = 0
-        for store in stores:
-            store_products = await ProductManager.get_products_to_update(
-                db, store_id=store.id
-            )
-
-            logger.debug(f"Updating products for {store.name}")
-            products_updated += len(store_products)
-            store_scraper = StoreScraper(store=store)
-            for product in store_products:
-                logger.debug(f"Current product {product.id}")
-                product_link = store.affiliate_link(product.link)
-                new_data = await scrape_or_deactivate(
-                    db, store_scraper, product_link, FIELDS_TO_UPDATE
-                )
-
-                if not new_data:
-                    continue
-
-                product = await ProductManager.update(
-                    db, product=product, new_data=new_data, fields=FIELDS_TO_UPDATE
-                )
-                logger.info(f"Updated product: {product.id}")
-                store.last_check = datetime.now()
-                await db.commit()
-
-        if products_updated == 0:
-            logger.info(f"No products to update for {continent_name}")
-            return
-
-        msg = (
-            f"Update process finished for {continent_name} for {len(stores)} stores. "
-            f"Updated {products_updated} products in total."
-        )
-        await send_log_to_telegram(msg)
-
-
 async def import_products_by_continent(continent_name: str):
     """For all stores search all import queries and create or update the products"""
     logger.info(f"Started importing products for stores in {continent_name}")
+    shipping_index.invalidate()
+    category_registry.invalidate()
     # Expire on commit:
     # https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html#asyncio-orm-avoid-lazyloads
     async with AsyncSession(engine, expire_on_commit=False) as db:
@@ -99,6 +69,10 @@ async def import_products_by_continent(continent_name: str):
             link_processed += importer.link_processed
             products_created_or_update += importer.products_created_or_update
 
+        if products_created_or_update:
+            await CategoryManager.refresh_category_facets(db)
+            await response_cache.publish_invalidation(db, STORES, CATEGORIES)
+
         msg = (
             f"Import process finished for {continent_name} "
             f"for {len(stores)} stores. "
@@ -115,7 +89,14 @@ class ProductImporter:
         self.link_processed = 0
         self.products_created_or_update = 0
 
-    async def import_product(self, limit: Optional[int] = None):
+    async def import_product(
+        self, limit: Optional[int] = None, only_changes: bool = True
+    ):
+        """Import the most recent sitemap links.
+
+        With `only_changes` the links already imported are skipped, unless their
+        lastmod is more recent than when they were imported.
+        """
         if not self.store.sitemaps:
             await send_log_to_telegram(
                 f"ACTION REQUIRED: Skipping import from '{self.store.name}' because "
@@ -123,45 +104,60 @@ class ProductImporter:
             )
             return
 
-        product_links = await SiteMapScraper().scrape(self.store.sitemaps, limit=limit)
-        if not product_links:
-            logger.warning(f"Could not find any product links from the sitemaps")
+        sitemap_links = await SiteMapScraper().scrape_links(
+            self.store.sitemaps, limit=limit, only_changes=only_changes
+        )
+        if not sitemap_links:
+            if only_changes:
+                logger.info(f"No new or modified links for {self.store.name}")
+            else:
+                logger.warning(f"Could not find any product links from the sitemaps")
             return
 
-        self.link_processed += len(product_links)
+        self.link_processed += len(sitemap_links)
         store_scraper = StoreScraper(store=self.store)
+        watermarks = {
+            sitemap.id: SitemapWatermark.from_sitemap(sitemap)
+            for sitemap in self.store.sitemaps
+        }
 
-        for product_link in product_links:
-            product_data = await scrape_or_deactivate(
-                self.db, store_scraper, product_link, FIELDS_TO_IMPORT
-            )
-            if not product_data:
-                continue
-
-            await ProductManager.create_or_update(
-                self.db, store=self.store, data=product_data
-            )
-            self.products_created_or_update += 1
-
-
-@crontab("0 4,12 * * *", start=True)
-async def europe_update():
-    await update_products_by_continent("Europe")
-
+        buffer = ProductWriteBuffer(
+            self.db, insert_fields=FIELDS_TO_IMPORT, update_fields=FIELDS_TO_UPDATE
+        )
+        async with buffer:
+            for sitemap_link in sitemap_links:
+                try:
+                    product_data = await scrape_or_deactivate(
+                        self.db, store_scraper, sitemap_link.link, FIELDS_TO_IMPORT
+                    )
+                except URLThrottled as e:
+                    logger.info(f"Skipping {sitemap_link.link}: {e}")
+                    continue
+                if not product_data:
+                    continue
 
-@crontab("0 6,14 * * *", start=True)
-async def america_update():
-    await update_products_by_continent("America")
+                # Only the written links are marked, the next import tries the
+                # others again
+                watermarks[sitemap_link.sitemap.id].mark(
+                    sitemap_link.link, sitemap_link.last_modified
+                )
+                await buffer.add(self.store, product_data)
 
+        self.products_created_or_update += buffer.written
+        if buffer.written:
+            await response_cache.publish_invalidation(self.db, SEARCH)
+        if buffer.failed:
+            logger.warning(f"Not saving the sitemaps watermarks of {self.store.name}")
+            return
 
-@crontab("0 8,16 * * *", start=True)
-async def asia_update():
-    await update_products_by_continent("Asia")
+        for sitemap in self.store.sitemaps:
+            watermarks[sitemap.id].save(sitemap)
+        await self.db.commit()
 
 
-@crontab("0 10,18 * * *", start=True)
-async def oceania_update():
-    await update_products_by_continent("Oceania")
+@crontab(f"*/{settings.SCHEDULER_TICK_MINUTES} * * * *", start=True)
+async def update_due_products():
+    await scheduler.tick()
 
 
 @crontab("0 6 * * 1,3", start=True)  # At 06:00 on Mon and Wed
@@ -0,0 +1,136 @@
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.core.cache import CATEGORIES, STORES, response_cache
+from web.core.config import settings
+from web.db import engine
+from web.logger import get_logger
+from web.manager.category import category_registry
+from web.manager.product import CategoryManager, ProductManager
+from web.manager.shipping import shipping_index
+from web.models.product import FIELDS_TO_UPDATE, Product
+from web.models.store import Store
+from web.tasks.pipeline import PipelineStats, UpdatePipeline
+
+logger = get_logger(__name__)
+
+
+def check_interval(*, price_changes: int = 0, popularity: int = 0) -> timedelta:
+    """How long until a product is checked again.
+
+    The longest interval is divided by the price changes of the last days
+    plus one, and by the bits of the clicks and favorites plus one: a product
+    with 2 price changes and 7 clicks is checked 3 * 4 times as often as one
+    nobody looks at and whose price never moves.
+    """
+    hours = settings.SCHEDULER_MAX_INTERVAL_HOURS / (
+        (1 + price_changes) * (1 + math.log2(1 + popularity))
+    )
+    return timedelta(hours=max(hours, settings.SCHEDULER_MIN_INTERVAL_HOURS))
+
+
+class UpdateScheduler:
+    """Scrape the products when due, within a budget of pages per hour.
+
+    Every tick takes the most overdue products, up to the share of the budget
+    of a tick, and schedules their next check before scraping them, so the
+    products whose page did not change or could not be scraped are not due
+    again right away. A tick still running when the next one starts makes the
+    next one skip.
+
+    The category facets and the API caches are refreshed once enough products
+    were updated over the ticks, or at the latest every `refresh_seconds`.
+    """
+
+    def __init__(
+        self,
+        *,
+        pages_per_hour: int = settings.SCHEDULER_PAGES_PER_HOUR,
+        tick_minutes: int = settings.SCHEDULER_TICK_MINUTES,
+        refresh_seconds: int = settings.SCHEDULER_REFRESH_SECONDS,
+        refresh_products: int = settings.SCHEDULER_REFRESH_PRODUCTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.budget = math.ceil(pages_per_hour * tick_minutes / 60)
+        self.refresh_seconds = refresh_seconds
+        self.refresh_products = refresh_products
+        self.clock = clock
+        self._running = asyncio.Lock()
+        # Products updated since the last refresh
+        self._updated = 0
+        self._refreshed_at = clock()
+
+    def needs_refresh(self, products_updated: int) -> bool:
+        """Account the products updated by a tick, True when it is time to
+        refresh what is derived from them"""
+        self._updated += products_updated
+        if not self._updated:
+            return False
+        if (
+            self._updated < self.refresh_products
+            and self.clock() - self._refreshed_at < self.refresh_seconds
+        ):
+            return False
+        self._updated = 0
+        self._refreshed_at = self.clock()
+        return True
+
+    async def get_due_work(
+        self, db: AsyncSession, *, now: datetime
+    ) -> List[Tuple[Store, List[Product]]]:
+        """The due products by store, scheduling their next check"""
+        due = await ProductManager.get_due_products(
+            db,
+            now=now,
+            limit=self.budget,
+            volatility_days=settings.SCHEDULER_VOLATILITY_DAYS,
+        )
+        await ProductManager.schedule_checks(
+            db,
+            checks=[
+                {
+                    "product_id": product.id,
+                    "next_check_at": now
+                    + check_interval(price_changes=changes, popularity=popularity),
+                }
+                for product, changes, popularity in due
+            ],
+        )
+        await db.commit()
+
+        work: Dict[int, Tuple[Store, List[Product]]] = {}
+        for product, _, _ in due:
+            work.setdefault(product.store_id, (product.store, []))[1].append(product)
+        return list(work.values())
+
+    async def tick(self) -> Optional[PipelineStats]:
+        if self._running.locked():
+            logger.info("The previous update is still running, skipping")
+            return None
+
+        async with self._running:
+            shipping_index.invalidate()
+            category_registry.invalidate()
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                work = await self.get_due_work(db, now=datetime.utcnow())
+                if not work:
+                    logger.debug("No products to update")
+                    return None
+
+                pipeline = UpdatePipeline(db, fields=FIELDS_TO_UPDATE)
+                for store, products in work:
+                    pipeline.add_store(store, products)
+                stats = await pipeline.run()
+                if self.needs_refresh(stats.products_updated):
+                    await CategoryManager.refresh_category_facets(db)
+                    await response_cache.publish_invalidation(db, STORES, CATEGORIES)
+                logger.info(f"Updated {len(work)} stores. {stats.summary()}")
+                return stats
+
+
+scheduler = UpdateScheduler()
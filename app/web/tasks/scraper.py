@@ -1,16 +1,11 @@
-import gzip
-import locale
-import re
-import string
+import heapq
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
 from datetime import datetime
-from io import BytesIO
-from operator import itemgetter
 from random import choice
-from typing import List, Optional, Union, Tuple
-from unicodedata import normalize
-from urllib.parse import urljoin
+from typing import Dict, List, Optional, Tuple
 
-import aiohttp
 import backoff
 from aiohttp import (
     InvalidURL,
@@ -18,12 +13,29 @@ from aiohttp import (
     ClientConnectorError,
     ServerDisconnectedError,
 )
-from bs4 import BeautifulSoup, Tag, NavigableString
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
 
+from web.core.config import settings
+from web.core.http import HTTPClient, http_client
 from web.logger import get_logger
 from web.models.product import Product
 from web.models.store import Store, StoreSitemap
+from web.tasks.browser import BrowserPool, browser_pool
+from web.tasks.extraction import ExtractionPlan, ParseExecutor, parse_executor
+from web.tasks.politeness import (
+    THROTTLING_STATUSES,
+    DomainLimiter,
+    PolitenessController,
+    parse_retry_after,
+    politeness,
+)
+from web.tasks.sitemap import (
+    SitemapReader,
+    SitemapNotFound,
+    SitemapThrottled,
+    SitemapLink,
+    SitemapWatermark,
+)
 
 logger = get_logger(__name__)
 
@@ -32,6 +44,14 @@ class URLNotFound(Exception):
     pass
 
 
+class URLThrottled(Exception):
+    """The store asked to slow down, the page may well still exist"""
+
+
+class URLSkipped(URLThrottled):
+    """Not requested, the store domain is still backing off"""
+
+
 class ProductPriceNotFound(Exception):
     pass
 
@@ -40,7 +60,51 @@ class ProductNameNotFound(Exception):
     pass
 
 
+class PageNotModified(Exception):
+    pass
+
+
+@dataclass
+class WebPage:
+    html: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
 class BaseScraper:
+    def __init__(
+        self,
+        *,
+        http: HTTPClient = http_client,
+        politeness: PolitenessController = politeness,
+    ):
+        self.http = http
+        self.politeness = politeness
+
+    async def _acquire(self, url: str) -> DomainLimiter:
+        limiter = await self.politeness.acquire(url)
+        if limiter is None:
+            raise URLSkipped(
+                f"Not requesting {url}, {self.politeness.domain(url)} is backing off"
+            )
+        return limiter
+
+    @staticmethod
+    def _raise_for_status(url: str, status: int):
+        if status == 304:
+            raise PageNotModified(f"{url} did not change")
+
+        if status in THROTTLING_STATUSES:
+            raise URLThrottled(
+                f"Tried to get {url} but the store is throttling "
+                f"the requests {status=}"
+            )
+
+        if status != 200:
+            raise URLNotFound(
+                f"Tried to get {url} but response was not successful {status=}"
+            )
+
     @property
     def _random_user_agent(self):
         agents = [
@@ -60,151 +124,121 @@ class BaseScraper:
         return choice(agents)
 
     async def get_through_simple_request(self, url, use_random_user_agent=True):
+        page = await self.get_page(url, use_random_user_agent=use_random_user_agent)
+        return page.html
+
+    async def get_page(
+        self,
+        url: str,
+        *,
+        use_random_user_agent: bool = True,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> WebPage:
+        """Get a page, conditional when the validators of a previous fetch are given"""
         headers = (
             {"User-Agent": self._random_user_agent} if use_random_user_agent else {}
         )
-        async with aiohttp.ClientSession(headers=headers) as session:
-            try:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        raise URLNotFound(
-                            f"Tried to get {url} but response was "
-                            f"not successful {resp.status=}"
-                        )
-
-                    return await resp.text()
-            except (
-                InvalidURL,
-                TooManyRedirects,
-                ClientConnectorError,
-                ServerDisconnectedError,
-            ) as e:
-                raise URLNotFound(f"Tried to get {url} the page was not found. ({e})")
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
 
+        limiter = await self._acquire(url)
+        start = time.monotonic()
+        try:
+            async with self.http.session.get(url, headers=headers) as resp:
+                limiter.record(
+                    resp.status,
+                    time.monotonic() - start,
+                    retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                )
+                self._raise_for_status(url, resp.status)
+                return WebPage(
+                    html=await resp.text(),
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                )
+        except (
+            InvalidURL,
+            TooManyRedirects,
+            ClientConnectorError,
+            ServerDisconnectedError,
+        ) as e:
+            limiter.record(None, time.monotonic() - start)
+            raise URLNotFound(f"Tried to get {url} the page was not found. ({e})")
 
-class StoreScraper(BaseScraper):
-    regex = r"(([A-Z]{3} )?(\$|€|£)?(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})))"
-    PRICE_PATTERN = re.compile(regex)
 
-    def __init__(self, *, store: Store):
+class StoreScraper(BaseScraper):
+    def __init__(
+        self,
+        *,
+        store: Store,
+        http: HTTPClient = http_client,
+        politeness: PolitenessController = politeness,
+        browser: BrowserPool = browser_pool,
+        parser: str = settings.SCRAPER_HTML_PARSER,
+        executor: ParseExecutor = parse_executor,
+    ):
+        super().__init__(http=http, politeness=politeness)
         self.store = store
+        self.browser = browser
+        self.parser = parser
+        self.executor = executor
+        self._plans: Dict[Tuple[str, ...], ExtractionPlan] = {}
 
     @backoff.on_exception(backoff.expo, TimeoutError, max_tries=3)
     async def get_through_browser(self, url: str) -> str:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page(user_agent=self._random_user_agent)
-            await page.goto(url)
-            html = await page.content()
-            await browser.close()
-        return html
-
-    async def get_soup(self, url: str) -> Optional[BeautifulSoup]:
-        """Get a soup object from an url"""
-        html = (
-            await self.get_through_simple_request(url)
-            if not self.store.scrape_with_js
-            else await self.get_through_browser(url)
-        )
-        return BeautifulSoup(html, "html.parser")
-
-    def get_link(self, soup: BeautifulSoup) -> str:
-        href = soup["href"] if soup.has_attr("href") else soup.find_next("a")["href"]
-        if not href.startswith("http"):
-            href = urljoin(self.store.website, href)
-        return href
-
-    def format_image_link(self, link: str) -> str:
-        link = link.format(width=300)
-        if link.startswith("//"):
-            link = f"https:{link}"
-        if not link.startswith("http"):
-            link = f"{self.store.website}{link}"
-        return link
-
-    def parse_price(self, price_string: str) -> Optional[float]:
-        match = self.PRICE_PATTERN.match(price_string)
-        if match:
-            locale.setlocale(locale.LC_NUMERIC, self.store.locale)
-            return locale.atof(match.group(4))
-        else:
-            allowed_characters = string.digits + ".,$€£"
-            clean_price = "".join(c for c in price_string if c in allowed_characters)
-            return self.parse_price(clean_price)
-
-    @staticmethod
-    def remove_extra_spaces_and_newlines(value):
-        value = re.sub(" +", " ", value)  # Remove extra spaces
-        value = re.sub("\n{2,}", " ", value)  # Remove extra newlines
-        value = re.sub("\x00", "", value)  # Remove NULL-terminated string
-        return value.strip()
-
-    def extract_product_availability(
-        self, soup_obj: Union[Tag, NavigableString]
-    ) -> bool:
-        text = soup_obj.get_text().strip() if soup_obj else ""
-        logger.debug(f"Found {text if soup_obj else 'nothing'} in availability tag")
-        return bool(
-            re.search(self.store.product_is_available_match.lower(), text.lower())
-        )
-
-    def extract_product_image(self, soup_obj: Union[Tag, NavigableString]) -> str:
-        if soup_obj.name != "img":
-            soup_obj = soup_obj.find("img")
-        img_link = (
-            soup_obj["data-src"] if soup_obj.has_attr("data-src") else soup_obj["src"]
-        )
-        return self.format_image_link(img_link)
-
-    def extract_price(self, soup_obj: Union[Tag, NavigableString]) -> Optional[str]:
-        unicode_str_text = self.remove_extra_spaces_and_newlines(soup_obj.get_text())
+        limiter = await self._acquire(url)
+        start = time.monotonic()
         try:
-            return self.parse_price(unicode_str_text)
-        except RecursionError:
-            return
-
-    async def scrape(self, url: str, fields: List[str]) -> Product:
-        logger.debug(f"Scraping {fields} on {url}")
-        soup = await self.get_soup(url)
-        data = {}
-
-        for field in fields:
-            style_class = getattr(self.store, f"product_{field}_class")
-            html_tag = getattr(self.store, f"product_{field}_tag")
-            selector = (
-                "class"
-                if getattr(self.store, f"product_{field}_css_is_class")
-                else "id"
+            response = await self.browser.get_content(
+                url, user_agent=self._random_user_agent
             )
+        except TimeoutError:
+            limiter.record(None, time.monotonic() - start)
+            raise
+        limiter.record(
+            response.status,
+            time.monotonic() - start,
+            retry_after=parse_retry_after(response.retry_after),
+        )
+        self._raise_for_status(url, response.status)
+        return response.html
 
-            if not bool(style_class) or not bool(html_tag):
-                continue
-
-            soup_obj = soup.find(html_tag, {selector: style_class})
-            logger.debug(
-                f"Scraping {field} with tag '{html_tag}' and {selector}='{style_class}'"
-            )
-            if not soup_obj:
-                logger.warning(f"Nothing found when searching for {field}!")
-                continue
-
-            if field == "is_available":
-                data[field] = self.extract_product_availability(soup_obj)
-            elif field == "image":
-                data[field] = self.extract_product_image(soup_obj)
-            elif field == "price":
-                data[field] = self.extract_price(soup_obj)
-                data["currency"] = self.store.currency
-            elif field == "variations" and not data.get("is_available", None):
-                data["is_available"] = None
-            elif field == "description":
-                data[field] = soup_obj.get_text()
-            else:
-                data[field] = normalize(
-                    "NFKD", self.remove_extra_spaces_and_newlines(soup_obj.get_text())
-                )
+    async def fetch(
+        self,
+        url: str,
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> WebPage:
+        """Get the product page, the browser rendered pages are never conditional"""
+        if self.store.scrape_with_js:
+            return WebPage(html=await self.get_through_browser(url))
+
+        return await self.get_page(url, etag=etag, last_modified=last_modified)
+
+    def get_plan(self, fields: List[str]) -> ExtractionPlan:
+        """The store selectors compiled once for each set of fields"""
+        key = tuple(fields)
+        if key not in self._plans:
+            self._plans[key] = ExtractionPlan.compile(self.store, fields)
+        return self._plans[key]
 
-        data.pop("variations", None)
+    async def scrape(
+        self,
+        url: str,
+        fields: List[str],
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Product:
+        logger.debug(f"Scraping {fields} on {url}")
+        page = await self.fetch(url, etag=etag, last_modified=last_modified)
+        data = await self.executor.extract(
+            self.get_plan(fields), page.html, parser=self.parser
+        )
 
         if not data.get("name"):
             raise ProductNameNotFound(
@@ -220,11 +254,13 @@ class StoreScraper(BaseScraper):
             "\x00", ""
         )
         data["link"] = url
+        data["page_etag"] = page.etag
+        data["page_last_modified"] = page.last_modified
         return Product(**data)
 
     async def ping_website(self) -> Tuple[bool, Optional[str]]:
         try:
-            await self.get_soup(self.store.website)
+            await self.fetch(self.store.website)
         except URLNotFound as e:
             return False, str(e)
         except Exception as e:
@@ -235,36 +271,14 @@ class StoreScraper(BaseScraper):
 
 
 class SiteMapScraper(BaseScraper):
-    async def get_through_simple_request(
-        self, url, use_random_user_agent=True, unzip=False
+    def __init__(
+        self,
+        *,
+        http: HTTPClient = http_client,
+        politeness: PolitenessController = politeness,
     ):
-        headers = (
-            {"User-Agent": self._random_user_agent} if use_random_user_agent else {}
-        )
-        async with aiohttp.ClientSession(headers=headers) as session:
-            try:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        raise URLNotFound(
-                            f"Tried to get {url} but response was "
-                            f"not successful {resp.status=}"
-                        )
-                    if resp.headers.get("Content-Type") == "application/octet-stream":
-                        gz = await resp.read()
-                        return gzip.decompress(gz)
-
-                    return await resp.text()
-            except (
-                InvalidURL,
-                TooManyRedirects,
-                ClientConnectorError,
-                ServerDisconnectedError,
-            ) as e:
-                raise URLNotFound(f"Tried to get {url} the page was not found. ({e})")
-
-    async def get_soup(self, url: str) -> Optional[BeautifulSoup]:
-        xml = await self.get_through_simple_request(url, use_random_user_agent=False)
-        return BeautifulSoup(xml, "xml")
+        super().__init__(http=http, politeness=politeness)
+        self.reader = SitemapReader(http=http, politeness=politeness)
 
     async def scrape(
         self,
@@ -272,27 +286,56 @@ class SiteMapScraper(BaseScraper):
         sort_by_last_modified: bool = True,
         limit: Optional[int] = None,
     ) -> List[str]:
-        urls = []
+        sitemap_links = await self.scrape_links(
+            sitemap_urls, sort_by_last_modified=sort_by_last_modified, limit=limit
+        )
+        return [sitemap_link.link for sitemap_link in sitemap_links]
+
+    async def scrape_links(
+        self,
+        sitemap_urls: List[StoreSitemap],
+        sort_by_last_modified: bool = True,
+        limit: Optional[int] = None,
+        only_changes: bool = False,
+    ) -> List[SitemapLink]:
+        """Select the sitemaps links, optionally only the ones not imported yet"""
+        links = []
+        # Min-heap of (lastmod, -position, link), when there is a limit it only
+        # keeps the `limit` most recently modified links
+        most_recent = []
+        position = 0
         for sitemap in sitemap_urls:
-            soup = await self.get_soup(sitemap.url)
-            urls.extend(
-                [
-                    (
-                        url.loc.text,
-                        datetime.strptime(
-                            url.lastmod.text, sitemap.lastmod_format
-                        ).replace(tzinfo=None)
-                        if url.lastmod
-                        else datetime.now(),
-                    )
-                    for url in soup.find_all("url")
-                    if url.loc
-                ]
+            watermark = SitemapWatermark.from_sitemap(sitemap) if only_changes else None
+            entries = self.reader.iter_entries(
+                sitemap.url, lastmod_format=sitemap.lastmod_format
             )
-        if sort_by_last_modified:
-            urls.sort(key=itemgetter(1), reverse=True)  # Last modified first
-
-        links = [link for link, _ in urls]
-        links_found = len(links)
-        stop = limit if limit and limit < links_found else links_found
-        return links[:stop]
+            try:
+                async with aclosing(entries):
+                    async for link, last_modified in entries:
+                        if watermark and not watermark.is_changed(link, last_modified):
+                            continue
+
+                        sitemap_link = SitemapLink(sitemap, link, last_modified)
+                        if not sort_by_last_modified:
+                            links.append(sitemap_link)
+                            if limit and len(links) >= limit:
+                                return links
+                            continue
+
+                        last_modified = last_modified or datetime.now()
+                        item = (last_modified, -position, sitemap_link)
+                        position += 1
+                        if not limit or len(most_recent) < limit:
+                            heapq.heappush(most_recent, item)
+                        else:
+                            heapq.heappushpop(most_recent, item)
+            except SitemapNotFound as e:
+                raise URLNotFound(str(e))
+            except SitemapThrottled as e:
+                raise URLThrottled(str(e))
+
+        if not sort_by_last_modified:
+            return links
+
+        # Last modified first
+        return [link for _, _, link in sorted(most_recent, reverse=True)]
@@ -0,0 +1,236 @@
+import struct
+import time
+import zlib
+from collections import deque
+from hashlib import blake2b
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from aiohttp import (
+    InvalidURL,
+    TooManyRedirects,
+    ClientConnectorError,
+    ServerDisconnectedError,
+)
+from lxml import etree
+
+from web.core.http import HTTPClient, http_client
+from web.logger import get_logger
+from web.models.store import StoreSitemap
+from web.tasks.politeness import (
+    THROTTLING_STATUSES,
+    PolitenessController,
+    parse_retry_after,
+    politeness,
+)
+
+logger = get_logger(__name__)
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+
+
+class SitemapNotFound(Exception):
+    pass
+
+
+class SitemapThrottled(Exception):
+    pass
+
+
+class SitemapLink(NamedTuple):
+    sitemap: StoreSitemap
+    link: str
+    last_modified: Optional[datetime]
+
+
+class SitemapWatermark:
+    """What the previous imports of a sitemap have already seen.
+
+    Every imported URL is a 12 bytes entry, the 8 bytes blake2b hash of the
+    URL followed by its `lastmod` in seconds, stored on the StoreSitemap row
+    together with the most recent `lastmod` imported.
+    """
+
+    HASH_SIZE = 8
+    ENTRY = struct.Struct(">8sI")
+
+    def __init__(
+        self,
+        *,
+        last_modified: Optional[datetime] = None,
+        known_urls: Optional[bytes] = None,
+    ):
+        self.last_modified = last_modified
+        self.known: Dict[bytes, int] = dict(self.ENTRY.iter_unpack(known_urls or b""))
+
+    @classmethod
+    def from_sitemap(cls, sitemap: StoreSitemap) -> "SitemapWatermark":
+        return cls(
+            last_modified=sitemap.last_imported_lastmod,
+            known_urls=sitemap.known_urls,
+        )
+
+    @classmethod
+    def hash_url(cls, url: str) -> bytes:
+        return blake2b(url.encode(), digest_size=cls.HASH_SIZE).digest()
+
+    @staticmethod
+    def timestamp(last_modified: Optional[datetime]) -> int:
+        """The seconds of a naive lastmod, 0 when there is none"""
+        if not last_modified:
+            return 0
+        seconds = int(last_modified.replace(tzinfo=timezone.utc).timestamp())
+        return min(max(seconds, 0), 2**32 - 1)
+
+    def is_changed(self, url: str, last_modified: Optional[datetime]) -> bool:
+        """True for an URL never imported or modified after its last import"""
+        imported = self.known.get(self.hash_url(url))
+        if imported is None:
+            return True
+
+        return self.timestamp(last_modified) > imported
+
+    def mark(self, url: str, last_modified: Optional[datetime]):
+        key = self.hash_url(url)
+        self.known[key] = max(self.known.get(key, 0), self.timestamp(last_modified))
+        if last_modified and (
+            not self.last_modified or last_modified > self.last_modified
+        ):
+            self.last_modified = last_modified
+
+    def save(self, sitemap: StoreSitemap):
+        sitemap.last_imported_lastmod = self.last_modified
+        sitemap.known_urls = b"".join(
+            self.ENTRY.pack(key, imported)
+            for key, imported in sorted(self.known.items())
+        )
+
+
+def _localname(element: etree._Element) -> str:
+    return etree.QName(element).localname
+
+
+def _child_text(element: etree._Element, name: str) -> Optional[str]:
+    for child in element:
+        if isinstance(child.tag, str) and _localname(child) == name:
+            return (child.text or "").strip()
+    return None
+
+
+class SitemapReader:
+    """Stream the `<url>` entries of a sitemap with bounded memory.
+
+    The body is decompressed and parsed chunk by chunk, every entry is
+    discarded from the tree once yielded and the children of a
+    `<sitemapindex>` are only fetched after the current document is consumed.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        *,
+        http: HTTPClient = http_client,
+        politeness: PolitenessController = politeness,
+    ):
+        self.http = http
+        self.politeness = politeness
+
+    async def iter_entries(
+        self, url: str, *, lastmod_format: str
+    ) -> AsyncIterator[Tuple[str, Optional[datetime]]]:
+        """Yield (loc, lastmod) for every url of the sitemap and of its children"""
+        pending = deque([url])
+        while pending:
+            sitemap_url = pending.popleft()
+            async for kind, loc, lastmod in self._iter_document(sitemap_url):
+                if kind == "sitemap":
+                    pending.append(loc)
+                    continue
+
+                yield loc, (
+                    datetime.strptime(lastmod, lastmod_format).replace(tzinfo=None)
+                    if lastmod
+                    else None
+                )
+
+    async def _iter_document(
+        self, url: str
+    ) -> AsyncIterator[Tuple[str, str, Optional[str]]]:
+        parser = etree.XMLPullParser(
+            events=("end",), resolve_entities=False, no_network=True, recover=True
+        )
+        decompressor = None
+        limiter = await self.politeness.acquire(url)
+        if limiter is None:
+            raise SitemapThrottled(
+                f"Not requesting {url}, {self.politeness.domain(url)} is backing off"
+            )
+        start = time.monotonic()
+        try:
+            async with self.http.session.get(url) as resp:
+                limiter.record(
+                    resp.status,
+                    time.monotonic() - start,
+                    retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+                )
+                if resp.status in THROTTLING_STATUSES:
+                    raise SitemapThrottled(
+                        f"Tried to get {url} but the store is throttling "
+                        f"the requests {resp.status=}"
+                    )
+
+                if resp.status != 200:
+                    raise SitemapNotFound(
+                        f"Tried to get {url} but response was "
+                        f"not successful {resp.status=}"
+                    )
+
+                first_chunk = True
+                async for chunk in resp.content.iter_chunked(self.CHUNK_SIZE):
+                    if first_chunk and chunk.startswith(GZIP_MAGIC_NUMBER):
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    first_chunk = False
+
+                    if decompressor:
+                        chunk = decompressor.decompress(chunk)
+                    parser.feed(chunk)
+                    for entry in self._read_events(parser):
+                        yield entry
+        except (
+            InvalidURL,
+            TooManyRedirects,
+            ClientConnectorError,
+            ServerDisconnectedError,
+        ) as e:
+            limiter.record(None, time.monotonic() - start)
+            raise SitemapNotFound(f"Tried to get {url} the page was not found. ({e})")
+
+        if decompressor:
+            parser.feed(decompressor.flush())
+        parser.close()
+        for entry in self._read_events(parser):
+            yield entry
+
+    @staticmethod
+    def _read_events(
+        parser: etree.XMLPullParser,
+    ) -> Iterator[Tuple[str, str, Optional[str]]]:
+        for _, element in parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+
+            kind = _localname(element)
+            if kind not in ("url", "sitemap"):
+                continue
+
+            loc = _child_text(element, "loc")
+            lastmod = _child_text(element, "lastmod")
+
+            # Drop what has been read so far to keep the tree small
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+            if loc:
+                yield kind, loc, lastmod
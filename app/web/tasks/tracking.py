@@ -0,0 +1,18 @@
+from aiocron import crontab
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.core.config import settings
+from web.db import engine
+from web.logger import get_logger
+from web.manager.product import ProductManager
+
+logger = get_logger(__name__)
+
+
+@crontab("30 3 */1 * *", start=True)  # At 03:30 on every day-of-month
+async def rollup_click_counts():
+    logger.info("Rolling up the product click counts")
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await ProductManager.rollup_click_counts(
+            session, window_days=settings.POPULARITY_WINDOW_DAYS
+        )
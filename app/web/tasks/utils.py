@@ -1,11 +1,12 @@
 from datetime import datetime
 
-import aiohttp
 from aiocron import crontab
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from web.core.cache import RATES, response_cache
 from web.core.config import settings
+from web.core.http import http_client
 from web.db import engine
 from web.logger import get_logger
 from web.models.enums import Currency
@@ -21,15 +22,15 @@ async def update_exchange_rates():
         stmt = select(ExchangeRate)
         currencies = (await db.execute(stmt)).scalars().all()
         for c in currencies:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    settings.FREE_CURRENCIES_API_URL
-                    + f"?apikey={settings.FREE_CURRENCIES_API_KEY}"
-                    f"&base_currency={c.currency}"
-                    f"&currencies={','.join(all_currencies.difference(c.currency))}"
-                ) as resp:
-                    data = await resp.json()
-                    logger.info(f"Updating exchange rates for {data}")
-                    c.rates = data["data"]
-                    c.updated_at = datetime.now()
-                    await db.commit()
+            async with http_client.session.get(
+                settings.FREE_CURRENCIES_API_URL
+                + f"?apikey={settings.FREE_CURRENCIES_API_KEY}"
+                f"&base_currency={c.currency}"
+                f"&currencies={','.join(all_currencies.difference(c.currency))}"
+            ) as resp:
+                data = await resp.json()
+                logger.info(f"Updating exchange rates for {data}")
+                c.rates = data["data"]
+                c.updated_at = datetime.now()
+                await db.commit()
+        await response_cache.publish_invalidation(db, RATES)
@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web.core.cache import normalize_query
+from web.core.config import settings
+from web.logger import get_logger
+from web.manager.category import CategoryRegistry, category_registry
+from web.manager.product import CategoryManager, ProductManager
+from web.manager.shipping import ShippingIndex, shipping_index
+from web.models.product import Product
+from web.models.store import Store
+from web.tasks.categorizer import categorizer
+
+logger = get_logger(__name__)
+
+PRODUCT_COLUMNS = set(Product.__table__.columns.keys())
+
+
+class ProductWriteBuffer:
+    """Collect the scraped products and write them in chunks.
+
+    Every chunk is a single transaction with one `INSERT ... ON CONFLICT DO
+    UPDATE` for the products and one multi-row insert for their price history.
+    New products are inserted with `insert_fields`, existing ones only get their
+    `update_fields` overwritten.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        *,
+        insert_fields: List[str],
+        update_fields: List[str],
+        chunk_size: int = settings.PRODUCT_WRITE_CHUNK_SIZE,
+        shipping: ShippingIndex = shipping_index,
+        categories: CategoryRegistry = category_registry,
+    ):
+        self.db = db
+        self.shipping = shipping
+        self.categories = categories
+        self.insert_fields = [f for f in insert_fields if f in PRODUCT_COLUMNS]
+        self.update_fields = [f for f in update_fields if f in PRODUCT_COLUMNS]
+        self.chunk_size = chunk_size
+        self.written = 0
+        self.failed = 0
+        self.uncategorized = 0
+        self._pending: Dict[str, Tuple[Store, Product, Optional[Product]]] = {}
+
+    async def __aenter__(self) -> "ProductWriteBuffer":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.flush()
+
+    async def add(
+        self, store: Store, data: Product, *, product: Optional[Product] = None
+    ) -> int:
+        """Buffer a scraped product, flushing once a chunk is full.
+
+        `product` is the row being updated, when already loaded by the caller.
+        Returns the number of products written by the flush, if any.
+        """
+        if product and product.id != data.id:
+            logger.warning(
+                f"Tried to update '{product}' (ID: {product.id}) "
+                f"with different ID. {data=}"
+            )
+            return 0
+
+        # The last scrape wins, a row cannot be upserted twice by a statement
+        self._pending[data.id] = (store, data, product)
+        if len(self._pending) >= self.chunk_size:
+            return await self.flush()
+        return 0
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        pending = list(self._pending.values())
+        self._pending = {}
+        try:
+            rows = await self._prepare(pending)
+            await ProductManager.upsert_many(
+                self.db, rows=rows, update_fields=self.update_fields
+            )
+            await self.db.commit()
+        except Exception as e:
+            logger.error(f"Could not write {len(pending)} products: {e}")
+            await self.db.rollback()
+            self.failed += len(pending)
+            return 0
+
+        logger.info(f"Wrote {len(rows)} products")
+        if self.uncategorized:
+            categorizer.notify()
+        self.written += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def _next_check_at(
+        now: datetime, data: Product, product: Optional[Product]
+    ) -> Optional[datetime]:
+        """New products are checked after the longest interval, a change of
+        availability after the shortest. None keeps the check scheduled."""
+        if product is None:
+            return now + timedelta(hours=settings.SCHEDULER_MAX_INTERVAL_HOURS)
+        if product.is_available != data.is_available:
+            return now + timedelta(hours=settings.SCHEDULER_MIN_INTERVAL_HOURS)
+        return None
+
+    @staticmethod
+    def _needs_category(current: Optional[Row]) -> bool:
+        return current is None or (
+            current.category_id is None and current.categorized_at is None
+        )
+
+    async def _prepare(
+        self, pending: List[Tuple[Store, Product, Optional[Product]]]
+    ) -> List[Dict[str, Any]]:
+        categorization = await ProductManager.get_categorization(
+            self.db, ids=[data.id for _, data, _ in pending]
+        )
+        uncategorized = [
+            data.name
+            for _, data, _ in pending
+            if self._needs_category(categorization.get(data.id))
+        ]
+        # Only the names already classified, the categorizer takes care of the
+        # others in the background
+        categorized = await CategoryManager.get_categorized_names(
+            self.db, names=uncategorized
+        )
+        now = datetime.utcnow()
+        rows = []
+        for store, data, product in pending:
+            row = {field: getattr(data, field) for field in self.insert_fields}
+            row.update(
+                id=data.id,
+                store_id=store.id,
+                link=product.link if product else store.affiliate_link(data.link),
+                currency=product.currency if product else data.currency,
+                is_active=True,
+                import_date=now,
+                page_etag=data.page_etag,
+                page_last_modified=data.page_last_modified,
+                category_id=None,
+                sub_category_id=None,
+                categorized_at=None,
+                next_check_at=self._next_check_at(now, data, product),
+            )
+
+            row["best_shipping_method_id"] = (
+                await self.shipping.get_best_shipping_method_id(
+                    self.db, store_id=store.id, product_price=data.price
+                )
+            )
+
+            if self._needs_category(categorization.get(data.id)):
+                entry = categorized.get(normalize_query(data.name))
+                if entry is None:
+                    self.uncategorized += 1
+                else:
+                    category_id, sub_category_id = await self.categories.get_ids(
+                        self.db, primary=entry.primary, secondary=entry.secondary
+                    )
+                    row.update(
+                        category_id=category_id,
+                        sub_category_id=sub_category_id,
+                        categorized_at=datetime.utcnow(),
+                    )
+            rows.append(row)
+        return rows
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from web.manager.autocomplete import AutocompleteIndex, autocomplete
+
+WORDS = [
+    "tmotor", "emax", "iflight", "tattu", "gnb", "cnhl", "foxeer", "caddx",
+    "runcam", "dji", "betafpv", "motor", "frame", "lipo", "battery", "props",
+    "esc", "stack", "vtx", "camera", "goggles", "antenna", "receiver", "elrs",
+    "crossfire", "2207", "2306", "1404", "6s", "4s", "5inch", "analog",
+]
+
+
+def make_names(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        (" ".join(rng.sample(WORDS, rng.randint(2, 5))).title(), rng.randint(0, 500))
+        for _ in range(count)
+    ]
+
+
+def test_autocomplete_ranks_by_popularity():
+    index = AutocompleteIndex(
+        [
+            ("Emax Eco Motor", 10),
+            ("Emax Pulsar Motor", 50),
+            ("iFlight Xing Motor", 100),
+            ("Motors", 0),
+        ]
+    )
+
+    assert index.search("motor", limit=10) == [
+        "iFlight Xing Motor",
+        "Emax Pulsar Motor",
+        "Emax Eco Motor",
+        "Motors",
+    ]
+    assert index.search("EMA mot", limit=10) == [
+        "Emax Pulsar Motor",
+        "Emax Eco Motor",
+    ]
+    assert index.search("em", limit=1, offset=1) == ["Emax Eco Motor"]
+    assert index.search("", limit=10) == []
+
+
+def test_autocomplete_merges_duplicate_names():
+    index = AutocompleteIndex(
+        [("Prop Guards", 3), ("prop  guards", 7), ("Gopro Mount", 5)]
+    )
+
+    assert index.search("guard", limit=10) == ["prop  guards"]
+    assert len(index) == 2
+
+
+def test_autocomplete_tolerates_typos():
+    index = AutocompleteIndex([("Tattu 6S Lipo Battery", 1), ("ELRS Receiver", 2)])
+
+    assert index.search("batery", limit=10) == ["Tattu 6S Lipo Battery"]
+    assert index.search("tattu reciever", limit=10) == []
+
+
+def test_short_prefixes_match_the_full_search():
+    index = AutocompleteIndex(make_names(2_000))
+
+    for prefix in ["c", "ca", "an", "2207"]:
+        # Past the precomputed entries the postings are walked instead
+        walked = index.search(prefix, limit=index.TOP_SIZE + 1)
+        assert index.search(prefix, limit=20) == walked[:20]
+
+
+@pytest.mark.asyncio
+async def test_autocomplete_endpoint(api_client, monkeypatch):
+    monkeypatch.setattr(
+        autocomplete,
+        "index",
+        AutocompleteIndex([("Emax Eco Motor", 10), ("iFlight Xing Motor", 100)]),
+    )
+
+    response = await api_client.get(
+        "/products/autocomplete", params={"search": "motor", "limit": 1}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"name": "iFlight Xing Motor"}]
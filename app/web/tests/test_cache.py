@@ -0,0 +1,51 @@
+import pytest
+
+from web.core.cache import SEARCH, STORES, InMemoryCache, ResponseCache, SearchCache
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(max_size=2)
+    await cache.set("a", 1, ttl=60)
+    await cache.set("b", 2, ttl=60)
+    assert await cache.get("a") == 1
+
+    await cache.set("c", 3, ttl=60)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+    assert cache.stats.evictions == 1
+    assert (cache.stats.hits, cache.stats.misses) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_expires_values():
+    cache = InMemoryCache(max_size=2)
+    await cache.set("a", 1, ttl=0)
+
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_search_cache_key_normalizes_query_and_filters():
+    key = SearchCache.key("  FPV   Motors ", continent=[3, 1], order_by=None)
+
+    assert key == SearchCache.key("fpv motors", order_by=None, continent=[1, 3])
+    assert key != SearchCache.key("fpv motors", order_by="price_asc", continent=[1, 3])
+
+
+@pytest.mark.asyncio
+async def test_search_cache_invalidated_by_the_search_tag():
+    search = SearchCache(InMemoryCache(max_size=10), ttl=60)
+    responses = ResponseCache(InMemoryCache(max_size=10), search=search)
+    key = SearchCache.key("motors")
+    await search.set(key, {"items": []})
+
+    responses.invalidate(STORES)
+    assert await search.get(key) == {"items": []}
+
+    # As received from the cron process
+    responses.invalidate(SEARCH)
+    assert await search.get(key) is None
+    assert search.stats["invalidations"] == 1
@@ -0,0 +1,134 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlmodel import select
+
+from web.ai.classifier import StubClassifier, parse_categories
+from web.manager.category import CategoryRegistry
+from web.manager.product import CategoryManager
+from web.models.enums import Currency, Locale
+from web.models.product import Category, Product
+from web.models.store import Store
+from web.tasks.categorizer import Categorizer
+
+MOTORS = {"primary": "motors", "secondary": "22xx"}
+BATTERIES = {"primary": "batteries", "secondary": "6s"}
+
+
+def test_parse_categories():
+    assert parse_categories(
+        '[{"primary": "motors", "secondary": "22xx"}, {"primary": "swag"}, "?"]',
+        expected=3,
+    ) == [MOTORS, {"primary": "swag", "secondary": None}, None]
+    assert parse_categories('[{"primary": "motors"}]', expected=2) is None
+    assert parse_categories("Sorry, I cannot help", expected=1) is None
+    assert parse_categories(None, expected=1) is None
+
+
+def test_stub_classifier():
+    classify = StubClassifier({"2207": MOTORS, "6s": BATTERIES})
+
+    categories = asyncio.run(classify(["T-Motor F60 2207", "Tattu 6S 1300mAh", "?"]))
+
+    assert categories == [MOTORS, BATTERIES, None]
+    assert classify.batches == [["T-Motor F60 2207", "Tattu 6S 1300mAh", "?"]]
+
+
+@pytest.mark.asyncio
+async def test_classify_caches_the_names(async_session):
+    classify = StubClassifier({"2207": MOTORS, "6s": BATTERIES})
+    names = ["T-Motor F60 2207", "t-motor  F60 2207", "Tattu 6S", "Sticker"]
+
+    categorized = await CategoryManager.classify(
+        async_session, names=names, classify=classify, batch_size=2
+    )
+    again = await CategoryManager.classify(
+        async_session, names=["T-MOTOR F60 2207"], classify=classify
+    )
+
+    assert classify.batches == [["T-Motor F60 2207", "Tattu 6S"], ["Sticker"]]
+    assert categorized["t-motor f60 2207"].secondary == "22xx"
+    assert categorized["tattu 6s"].primary == "batteries"
+    assert categorized["sticker"].primary is None
+    assert again["t-motor f60 2207"].primary == "motors"
+
+
+@pytest.mark.asyncio
+async def test_categorizer(async_session):
+    store = Store(
+        name="Store",
+        website="https://store.test",
+        locale=Locale.it_IT,
+        currency=Currency.EUR,
+    )
+    async_session.add(store)
+    await async_session.flush()
+    async_session.add_all(
+        Product(
+            id=f"product-{i}",
+            name=name,
+            price=Decimal("10.00"),
+            currency=Currency.EUR,
+            link=f"https://store.test/{i}",
+            store_id=store.id,
+        )
+        for i, name in enumerate(["Motor 2207", "Motor 2207", "Tattu 6S", "Sticker"])
+    )
+    await async_session.commit()
+    classify = StubClassifier({"2207": MOTORS, "6s": BATTERIES})
+
+    loaded, categorized = await Categorizer(
+        classify=classify, batch_size=10, categories=CategoryRegistry()
+    ).categorize_pending(async_session)
+
+    assert loaded == categorized == 4
+    assert classify.batches == [["Motor 2207", "Tattu 6S", "Sticker"]]
+    products = (
+        await async_session.execute(
+            select(Product.name, Category.slug, Product.categorized_at)
+            .outerjoin(Category, Category.id == Product.sub_category_id)
+            .order_by(Product.id)
+        )
+    ).all()
+    assert [(name, slug) for name, slug, _ in products] == [
+        ("Motor 2207", "22xx"),
+        ("Motor 2207", "22xx"),
+        ("Tattu 6S", "6s"),
+        ("Sticker", None),
+    ]
+    assert all(categorized_at for _, _, categorized_at in products)
+
+
+@pytest.mark.asyncio
+async def test_category_registry(async_session):
+    registry = CategoryRegistry()
+
+    motors_id, size_id = await registry.get_ids(
+        async_session, primary="motors", secondary="22xx"
+    )
+    assert await registry.get_ids(
+        async_session, primary="motors", secondary="22xx"
+    ) == (motors_id, size_id)
+    assert await registry.get_ids(async_session, primary="swag", secondary=None) == (
+        await registry.get_id(async_session, slug="swag"),
+        None,
+    )
+
+    # Another process creating the same category gets the existing row
+    other = CategoryRegistry()
+    other._ids = {}
+    assert await other.get_id(async_session, slug="motors") == motors_id
+
+    categories = (
+        await async_session.execute(
+            select(Category.slug, Category.name, Category.parent_id).order_by(
+                Category.id
+            )
+        )
+    ).all()
+    assert categories == [
+        ("motors", "Motors", None),
+        ("22xx", "22Xx", motors_id),
+        ("swag", "Swag", None),
+    ]
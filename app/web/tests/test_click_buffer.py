@@ -0,0 +1,65 @@
+import asyncio
+
+from web.manager.clicks import ClickBuffer
+from web.models.tracking import ClickedProduct
+
+
+class RecordingClickBuffer(ClickBuffer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    async def write(self, batch):
+        self.batches.append([click["product_id"] for click in batch])
+
+
+def click(buffer: ClickBuffer, product_id: str) -> bool:
+    return buffer.add(product_id=product_id, clicked_product=ClickedProduct())
+
+
+def test_click_buffer_is_bounded():
+    buffer = RecordingClickBuffer(max_size=2, batch_size=10, flush_interval_ms=10)
+
+    assert click(buffer, "a") and click(buffer, "b")
+    assert not click(buffer, "c")
+    assert buffer.metrics["queue_depth"] == 2
+    assert buffer.metrics["accepted"] == 2
+    assert buffer.metrics["dropped"] == 1
+
+
+def test_click_buffer_flushes_batches_and_drains():
+    async def run():
+        buffer = RecordingClickBuffer(max_size=100, batch_size=3, flush_interval_ms=50)
+        buffer.start()
+        for product_id in "abcd":
+            click(buffer, product_id)
+        await asyncio.sleep(0.1)
+        for product_id in "efg":
+            click(buffer, product_id)
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert buffer.batches[:2] == [["a", "b", "c"], ["d"]]
+    assert sum(buffer.batches, []) == list("abcdefg")
+    assert buffer.metrics["queue_depth"] == 0
+
+
+class SlowClickBuffer(RecordingClickBuffer):
+    async def write(self, batch):
+        await asyncio.sleep(0.05)
+        await super().write(batch)
+
+
+def test_click_buffer_stop_waits_for_the_batch_being_written():
+    async def run():
+        buffer = SlowClickBuffer(max_size=100, batch_size=2, flush_interval_ms=10)
+        buffer.start()
+        for product_id in "abc":
+            click(buffer, product_id)
+        await asyncio.sleep(0.02)
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert buffer.batches == [["a", "b"], ["c"]]
@@ -0,0 +1,47 @@
+import json
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from web.tasks.extraction import ExtractionPlan, ParseExecutor
+
+FIXTURES = Path(__file__).parent / "fixtures"
+FIELDS = ["name", "price", "image", "is_available", "variations", "description"]
+STORES = json.loads((FIXTURES / "stores.json").read_text())
+
+
+def load(case: dict):
+    html = (FIXTURES / "pages" / case["page"]).read_text()
+    plan = ExtractionPlan.compile(SimpleNamespace(**case["store"]), FIELDS)
+    return plan, html
+
+
+@pytest.mark.parametrize("case", STORES, ids=[case["page"] for case in STORES])
+def test_lxml_extraction_matches_html_parser(case):
+    plan, html = load(case)
+
+    data = plan.extract(html, parser="lxml")
+
+    assert data == plan.extract(html, parser="html.parser")
+    expected = case["expected"]
+    assert data["name"] == expected["name"]
+    assert Decimal(str(data["price"])) == Decimal(expected["price"])
+    assert data["currency"] == expected["currency"]
+    assert data["image"] == expected["image"]
+    assert data["is_available"] == expected["is_available"]
+    assert "variations" not in data
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 1])
+async def test_parse_executor(workers):
+    executor = ParseExecutor(workers=workers)
+    try:
+        for plan, html in map(load, STORES):
+            data = await executor.extract(plan, html, parser="lxml")
+            assert data == plan.extract(html, parser="lxml")
+    finally:
+        executor.close()
+
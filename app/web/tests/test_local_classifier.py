@@ -0,0 +1,114 @@
+import asyncio
+import random
+
+import pytest
+
+from web.ai.classifier import StubClassifier
+from web.ai.local import (
+    LocalClassifier,
+    LocalFirstClassifier,
+    battery_cells,
+    evaluate,
+    frame_size,
+    motor_size,
+    prop_size,
+)
+
+BRANDS = ["T-Motor", "iFlight", "BetaFPV", "Emax", "Foxeer", "RunCam", "HGLRC"]
+VERSIONS = ["", "V2", "V3", "Pro", "Lite", "HD", "Mini"]
+MOTORS = ["14", "18", "22", "23", "28"]
+INCHES = ["3", "4", "5", "6", "7"]
+CELLS = ["1", "2", "4", "6"]
+PRODUCTS = [
+    # (name template, primary, secondary, sizes of the template)
+    ("{brand} {size}07 1750KV Motor {version}", "motors", "{size}xx", MOTORS),
+    ("{brand} {size}04 FPV Brushless Motor {version}", "motors", "{size}xx", MOTORS),
+    ("{brand} Hurricane {size}x4.3x3 Props {version}", "props", "{size}-inch", INCHES),
+    ("{brand} {size}1433 Tri-Blade Propellers", "props", "{size}-inch", INCHES),
+    ("{brand} 1300mAh {size}S 120C LiPo Battery", "batteries", "{size}s", CELLS),
+    ('{brand} Source One {size}" Frame Kit {version}', "frames", "{size}-inch", INCHES),
+    ("{brand} F722 FC {version}", "electronics", "flight-controller", []),
+    ("{brand} 55A 4in1 ESC {version}", "electronics", "esc", []),
+    ("{brand} F405 45A Stack {version}", "electronics", "stack", []),
+    ("{brand} FPV Goggles {version}", "fpv-gear", "goggles", []),
+    ("{brand} 5.8GHz VTX {version}", "fpv-gear", "vtx", []),
+    ("{brand} ELRS Nano Receiver {version}", "radio", "receivers", []),
+]
+
+
+def make_examples(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(count):
+        template, primary, secondary, sizes = rng.choice(PRODUCTS)
+        values = dict(
+            brand=rng.choice(BRANDS),
+            version=rng.choice(VERSIONS),
+            size=rng.choice(sizes) if sizes else "",
+        )
+        examples.append(
+            (
+                " ".join(template.format(**values).split()),
+                primary,
+                secondary.format(**values),
+            )
+        )
+    return examples
+
+
+def test_size_extractors():
+    assert motor_size("T-Motor F60 Pro V 2207.5 1950KV") == "22xx"
+    assert motor_size("Xing2 1404 3800KV") == "14xx"
+    assert motor_size("Motor 1750KV") is None
+    assert prop_size("HQProp 5.1x3.1x3") == "5-inch"
+    assert prop_size("Gemfan 51466 V2") == "5-inch"
+    assert prop_size("Gemfan 3 inch props") == "3-inch"
+    assert frame_size('Nazgul 5" Frame') == "5-inch"
+    assert frame_size("Meteor 65mm Whoop Frame") == "65mm"
+    assert battery_cells("Tattu 1300mAh 6S 120C") == "6s"
+    assert battery_cells("Li-ion 4S1P 3000mAh") == "4s"
+    assert battery_cells("1300mAh Battery") is None
+
+
+def test_local_classifier():
+    classifier = LocalClassifier(min_confidence=0.9).fit(make_examples(2_000))
+
+    assert classifier.predict("Emax 2306 2400KV Motor") == (
+        "motors",
+        "23xx",
+        pytest.approx(1, abs=0.1),
+    )
+    assert classifier.predict("BetaFPV 850mAh 4S LiPo Battery")[:2] == (
+        "batteries",
+        "4s",
+    )
+    assert classifier.predict("HGLRC F722 FC")[:2] == (
+        "electronics",
+        "flight-controller",
+    )
+    # A motor without a size in the name is left to the LLM
+    assert classifier.predict("Emax Brushless Motor") is None
+    assert classifier.predict("Sticker") is None
+
+
+def test_local_first_classifier():
+    local = LocalClassifier(min_confidence=0.9).fit(make_examples(2_000))
+    fallback = StubClassifier({"sticker": {"primary": "swag", "secondary": None}})
+    classify = LocalFirstClassifier(local, fallback)
+
+    categories = asyncio.run(classify(["Foxeer FPV Goggles", "Sticker", "?"]))
+
+    assert categories == [
+        {"primary": "fpv-gear", "secondary": "goggles"},
+        {"primary": "swag", "secondary": None},
+        None,
+    ]
+    assert fallback.batches == [["Sticker", "?"]]
+    assert (classify.local_names, classify.fallback_names) == (1, 2)
+
+
+def test_local_classifier_evaluation():
+    result = evaluate(LocalClassifier(min_confidence=0.95), make_examples(10_000))
+
+    assert result.coverage > 0.9
+    assert result.accuracy > 0.98
@@ -0,0 +1,54 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from web.manager.pagination import (
+    InvalidCursor,
+    SortKey,
+    after_cursor,
+    decode_cursor,
+    encode_cursor,
+    next_cursor,
+)
+from web.models.product import Product, UsedProduct
+
+
+def test_cursor_round_trip():
+    keys = [
+        SortKey(Product.price, descending=True, parse=Decimal),
+        SortKey(UsedProduct.created_at, parse=datetime.fromisoformat),
+        SortKey(Product.id),
+    ]
+    values = [Decimal("1049.90"), datetime(2024, 5, 1, 12, 30), "abc"]
+
+    cursor = encode_cursor("price_desc", values)
+
+    assert decode_cursor(cursor, "price_desc", keys) == values
+
+
+@pytest.mark.parametrize(
+    "cursor", ["not a cursor", encode_cursor("price_asc", [1, "abc"]), ""]
+)
+def test_invalid_cursor(cursor):
+    keys = [SortKey(Product.price, descending=True), SortKey(Product.id)]
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "price_desc", keys)
+
+
+def test_after_cursor_mixes_directions():
+    keys = [SortKey(Product.click_count, descending=True), SortKey(Product.id)]
+    clause = after_cursor(keys, [10, "abc"]).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+
+    assert str(clause) == (
+        "product.click_count < 10 "
+        "OR product.click_count = 10 AND product.id > 'abc'"
+    )
+
+
+def test_no_next_cursor_on_last_page():
+    assert next_cursor("popularity", [(3, "a"), (2, "b")], limit=3) is None
+    assert next_cursor("popularity", [(3, "a"), (2, "b")], limit=2) is not None
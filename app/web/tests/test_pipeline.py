@@ -0,0 +1,223 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from web.core.cache import normalize_query
+from web.manager.category import category_registry
+from web.manager.shipping import shipping_index
+from web.models.enums import Currency, Locale
+from web.models.product import (
+    FIELDS_TO_UPDATE,
+    CategorizedName,
+    Category,
+    PriceHistory,
+    Product,
+)
+from web.models.shipping import ShippingMethod
+from web.models.store import Store
+from web.tasks.pipeline import UpdatePipeline
+from web.tasks.product import scrape_or_deactivate
+from web.tasks.scraper import (
+    StoreScraper,
+    URLNotFound,
+    URLSkipped,
+    URLThrottled,
+    WebPage,
+)
+from web.tasks.writer import ProductWriteBuffer
+
+FIXTURES = Path(__file__).parent / "fixtures"
+STORES = json.loads((FIXTURES / "stores.json").read_text())
+# Already classified, the other names are left to the categorizer
+CATEGORIZED = STORES[0]["expected"]["name"]
+FREE_SHIPPING_FROM = Decimal("50")
+
+
+async def fetch_fixture(self, url, *, etag=None, last_modified=None) -> WebPage:
+    """The fixture page of the store, the other pages are gone or throttled"""
+    if url.endswith("/throttled"):
+        raise URLSkipped(f"Not requesting {url}")
+    for case in STORES:
+        if url == f"{case['store']['website']}/product":
+            return WebPage(html=(FIXTURES / "pages" / case["page"]).read_text())
+    raise URLNotFound(url)
+
+
+async def add_stores(db):
+    """The fixture stores, each with a stale, a gone and a throttled product"""
+    work = []
+    for case in STORES:
+        store = Store(
+            **{
+                **case["store"],
+                "locale": Locale(case["store"]["locale"]),
+                "currency": Currency(case["store"]["currency"]),
+            }
+        )
+        db.add(store)
+        await db.flush()
+        db.add_all(
+            [
+                ShippingMethod(
+                    name="Standard",
+                    price=Decimal("5.00"),
+                    currency=store.currency,
+                    store_id=store.id,
+                ),
+                ShippingMethod(
+                    name="Free",
+                    price=None,
+                    min_price_shipping_condition=FREE_SHIPPING_FROM,
+                    currency=store.currency,
+                    store_id=store.id,
+                ),
+            ]
+        )
+        website = store.website
+        name = case["expected"]["name"]
+        products = [
+            Product(
+                id=f"{store.name}_{name}".replace(" ", "_"),
+                name=name,
+                price=Decimal("1.00"),
+                currency=store.currency,
+                is_available=not case["expected"]["is_available"],
+                link=f"{website}/product",
+                store_id=store.id,
+            ),
+            Product(
+                id=f"{store.name}_gone",
+                name="Gone",
+                price=Decimal("1.00"),
+                currency=store.currency,
+                link=f"{website}/gone",
+                store_id=store.id,
+            ),
+            Product(
+                id=f"{store.name}_throttled",
+                name="Throttled",
+                price=Decimal("1.00"),
+                currency=store.currency,
+                link=f"{website}/throttled",
+                store_id=store.id,
+            ),
+        ]
+        db.add_all(products)
+        work.append((store, products))
+    await db.commit()
+    return work
+
+
+async def update_sequentially(db, work):
+    """The products scraped and written one at a time, as the importer does"""
+    for store, products in work:
+        scraper = StoreScraper(store=store)
+        buffer = ProductWriteBuffer(
+            db,
+            insert_fields=FIELDS_TO_UPDATE,
+            update_fields=FIELDS_TO_UPDATE,
+            chunk_size=1,
+        )
+        for product in products:
+            product_link = store.affiliate_link(product.link)
+            try:
+                new_data = await scrape_or_deactivate(
+                    db, scraper, product_link, FIELDS_TO_UPDATE
+                )
+            except URLThrottled:
+                continue
+            if not new_data:
+                continue
+
+            store.last_check = datetime.now()
+            await buffer.add(store, new_data, product=product)
+
+
+async def get_rows(db):
+    sub_category = aliased(Category)
+    products = await db.execute(
+        select(
+            Product.id,
+            Product.name,
+            Product.price,
+            Product.is_available,
+            Product.variations,
+            Product.is_active,
+            Product.page_etag,
+            ShippingMethod.name,
+            Category.slug,
+            sub_category.slug,
+        )
+        .outerjoin(
+            ShippingMethod, ShippingMethod.id == Product.best_shipping_method_id
+        )
+        .outerjoin(Category, Category.id == Product.category_id)
+        .outerjoin(sub_category, sub_category.id == Product.sub_category_id)
+        .order_by(Product.id)
+    )
+    prices = await db.execute(
+        select(PriceHistory.product_id, PriceHistory.price).order_by(
+            PriceHistory.product_id
+        )
+    )
+    checked = await db.execute(select(Store.name, Store.last_check.is_not(None)))
+    return products.all(), prices.all(), sorted(checked.all())
+
+
+async def reset(db):
+    for model in (PriceHistory, Product, Category, ShippingMethod, Store):
+        await db.execute(delete(model))
+    await db.commit()
+    shipping_index.invalidate()
+    category_registry.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_matches_sequential_update(async_session, monkeypatch):
+    monkeypatch.setattr(StoreScraper, "fetch", fetch_fixture)
+    shipping_index.invalidate()
+    category_registry.invalidate()
+    async_session.add(
+        CategorizedName(
+            name=normalize_query(CATEGORIZED), primary="motors", secondary="22xx"
+        )
+    )
+
+    await update_sequentially(async_session, await add_stores(async_session))
+    expected = await get_rows(async_session)
+    await reset(async_session)
+
+    pipeline = UpdatePipeline(
+        async_session,
+        fields=FIELDS_TO_UPDATE,
+        max_concurrent_stores=len(STORES),
+        max_concurrent_requests_per_store=2,
+        chunk_size=2,
+    )
+    for store, products in await add_stores(async_session):
+        pipeline.add_store(store, products)
+    stats = await pipeline.run()
+
+    rows = await get_rows(async_session)
+    assert rows == expected
+    # The shipping and the categories resolved for the scraped products
+    for _, name, price, *_, shipping, category, sub_category in rows[0]:
+        if name in ("Gone", "Throttled"):
+            assert (shipping, category, sub_category) == (None, None, None)
+            continue
+        assert shipping == ("Free" if price >= FREE_SHIPPING_FROM else "Standard")
+        if name == CATEGORIZED:
+            assert (category, sub_category) == ("motors", "22xx")
+        else:
+            assert (category, sub_category) == (None, None)
+    assert stats.products_updated == len(STORES)
+    assert stats.products_deactivated == len(STORES)
+    assert stats.pages_throttled == len(STORES)
+    # The throttled pages were never requested
+    assert stats.pages_fetched == 2 * len(STORES)
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from web.models.store import Store
+from web.tasks.browser import BrowserResponse
+from web.tasks.pipeline import PipelineStats
+from web.tasks.politeness import (
+    DomainLimiter,
+    PolitenessController,
+    parse_retry_after,
+)
+from web.tasks.scraper import StoreScraper, URLNotFound, URLThrottled
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(clock: FakeClock, **kwargs) -> DomainLimiter:
+    options = dict(
+        rate=1.0,
+        min_rate=0.1,
+        max_rate=4.0,
+        burst=2,
+        increase=0.5,
+        decrease=0.5,
+        backoff=10,
+        max_backoff=3600,
+    )
+    options.update(kwargs)
+    return DomainLimiter(**options, clock=clock, sleep=clock.sleep)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("soon") is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert 55 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 60
+
+
+@pytest.mark.asyncio
+async def test_token_bucket():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    # The burst goes right away, then one request per second
+    for _ in range(4):
+        assert await limiter.acquire()
+    assert clock.slept == [1.0, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_aimd():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    limiter.record(200, 0.2)
+    limiter.record(304, 0.1)
+    assert limiter.rate == 2.0
+    limiter.record(404, 0.1)
+    assert limiter.rate == 2.0
+
+    limiter.record(429, 0.1)
+    assert limiter.rate == 1.0
+    assert limiter.blocked_for == 10
+    limiter.record(503, 0.1)
+    assert limiter.rate == 0.5
+    # Doubled on each consecutive throttling
+    assert limiter.blocked_for == 20
+
+    for _ in range(20):
+        limiter.record(503, 0.1)
+    assert limiter.rate == 0.1
+    assert limiter.blocked_for == 3600
+
+    stats = limiter.snapshot()
+    assert (stats.requests, stats.errors, stats.throttled) == (25, 23, 22)
+    assert stats.mean_latency == pytest.approx(0.104)
+    assert stats.rate == 0.1
+
+
+@pytest.mark.asyncio
+async def test_retry_after():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    limiter.record(429, 0.1, retry_after=30)
+    assert limiter.blocked_for == 30
+    # Not requested again while the domain is backing off for longer
+    assert not await limiter.acquire(max_wait=10)
+    assert clock.slept == []
+
+    assert await limiter.acquire(max_wait=60)
+    assert clock.now >= 30
+
+
+@pytest.mark.asyncio
+async def test_controller_stats():
+    clock = FakeClock()
+    controller = PolitenessController(
+        max_wait=5, limiter_factory=lambda: make_limiter(clock)
+    )
+    assert controller.limiter("https://www.store.test/a") is controller.limiter(
+        "https://store.test/b"
+    )
+
+    controller.limiter("https://store.test").record(200, 0.5)
+    before = controller.snapshot()
+    (await controller.acquire("https://store.test/a")).record(200, 0.3)
+    (await controller.acquire("https://other.test/a")).record(429, 0.1)
+    assert await controller.acquire("https://other.test/b") is None
+
+    stats = PipelineStats(domains=controller.stats_since(before))
+    assert stats.domains["store.test"].requests == 1
+    assert stats.domains["store.test"].mean_latency == pytest.approx(0.3)
+    assert stats.domains["other.test"].error_rate == 1.0
+    assert "other.test: 1 requests, 100ms, 100% errors (1 throttled)" in (
+        stats.summary()
+    )
+
+
+class FakeBrowser:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    async def get_content(self, url, *, user_agent):
+        return self.responses.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_browser_status_recorded():
+    clock = FakeClock()
+    controller = PolitenessController(
+        max_wait=5, limiter_factory=lambda: make_limiter(clock)
+    )
+    scraper = StoreScraper(
+        store=Store(name="Store", website="https://store.test", scrape_with_js=True),
+        politeness=controller,
+        browser=FakeBrowser(
+            BrowserResponse(status=200, html="<h1>Product</h1>"),
+            BrowserResponse(status=429, html="Slow down", retry_after="2"),
+            BrowserResponse(status=404, html="Not found"),
+        ),
+    )
+
+    assert (await scraper.fetch("https://store.test/a")).html == "<h1>Product</h1>"
+    with pytest.raises(URLThrottled):
+        await scraper.fetch("https://store.test/b")
+    limiter = controller.limiter("https://store.test")
+    assert limiter.rate == 0.75
+    assert limiter.blocked_for == 2
+    with pytest.raises(URLNotFound):
+        await scraper.fetch("https://store.test/c")
+    assert limiter.snapshot().throttled == 1
@@ -0,0 +1,53 @@
+import json
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from web.tasks.prices import get_price_parser, parse_price
+
+FIXTURES = Path(__file__).parent / "fixtures"
+STORES = json.loads((FIXTURES / "stores.json").read_text())
+
+
+@pytest.mark.parametrize(
+    "price_string, locale_name, expected",
+    [
+        ("€29,99", "it_IT", Decimal("29.99")),
+        ("1.049,90\xa0€", "it_IT", Decimal("1049.90")),
+        ("Prezzo: 1.049,90 €", "it_IT", Decimal("1049.90")),
+        ("$1,229.00", "en_US", Decimal("1229.00")),
+        ("AUD $239.95", "en_US", Decimal("239.95")),
+        ("£12.50 inc. VAT", "en_US", Decimal("12.50")),
+        ("€255,43", "en_US", Decimal("255.43")),
+        ("$1,229.00", "it_IT", Decimal("1229.00")),
+        ("Sold out", "en_US", None),
+        ("", "it_IT", None),
+    ],
+)
+def test_parse_price(price_string, locale_name, expected):
+    assert parse_price(price_string, locale_name) == expected
+
+
+def test_price_parsers_are_compiled_once():
+    assert get_price_parser("it_IT") is get_price_parser("it_IT")
+
+
+@pytest.mark.parametrize("case", STORES, ids=[case["page"] for case in STORES])
+def test_parse_fixture_prices(case):
+    """Every price of the fixture pages, product cards included"""
+    store = case["store"]
+    soup = BeautifulSoup((FIXTURES / "pages" / case["page"]).read_text(), "lxml")
+    price_strings = [
+        " ".join(tag.get_text().split())
+        for tag in soup.select("[class*=price]")
+        if any(char.isdigit() for char in tag.get_text())
+    ]
+
+    assert price_strings
+    for price_string in price_strings:
+        price = parse_price(price_string, store["locale"])
+        assert price is not None and price > 0, price_string
+        assert price.as_tuple().exponent == -2, price_string
+
@@ -0,0 +1,89 @@
+"""The hot queries must keep using their indexes.
+
+The test tables are empty, so sequential scans are disabled to see which
+indexes the planner can use at all.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from web.manager.pagination import page_query
+from web.manager.product import ProductManager
+from web.models.product import Product
+
+
+async def explain(db, stmt) -> str:
+    conn = await db.connection()
+    compiled = stmt.compile(
+        dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+    )
+    await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    rows = (await conn.exec_driver_sql(f"EXPLAIN {compiled}")).scalars().all()
+    return "\n".join(rows)
+
+
+def first_page(query, mode: str):
+    stmt, keys = query
+    return page_query(stmt, keys=keys, mode=mode, limit=20)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "stmt, indexes",
+    [
+        pytest.param(
+            ProductManager.get_autocomplete_query("2207", limit=10, offset=0),
+            ["ix_product_name_trgm", "ix_category_name_trgm"],
+            id="autocomplete",
+        ),
+        pytest.param(
+            first_page(ProductManager.get_used_products_query("gogles"), "newest"),
+            ["ix_used_product_name_trgm"],
+            id="used products",
+        ),
+        pytest.param(
+            ProductManager.get_deactivate_query("https://store.test/product"),
+            ["ix_product_link"],
+            id="deactivate",
+        ),
+        pytest.param(
+            first_page(ProductManager.get_most_clicked_query(), "most_clicked"),
+            ["ix_product_popularity"],
+            id="most clicked",
+        ),
+        pytest.param(
+            ProductManager.get_price_history_query("public-id"),
+            ["ix_price_history_product_id_created_at"],
+            id="price history",
+        ),
+        pytest.param(
+            ProductManager.get_click_counts_query(datetime(2024, 1, 1)),
+            ["ix_clicked_product_product_id"],
+            id="product clicks",
+        ),
+    ],
+)
+async def test_query_uses_index(async_session, stmt, indexes):
+    plan = await explain(async_session, stmt)
+
+    for index in indexes:
+        assert index in plan, plan
+
+
+@pytest.mark.asyncio
+async def test_search_filter_uses_an_index_per_branch(async_session):
+    stmt = select(Product.id).where(
+        Product.is_active.is_(True), ProductManager.get_search_filter("motor")
+    )
+
+    plan = await explain(async_session, stmt)
+
+    assert "BitmapOr" in plan, plan
+    for index in [
+        "ix_product ",
+        "ix_product_name_trgm",
+        "ix_product_category_id",
+        "ix_category_name_trgm",
+    ]:
+        assert index in plan, plan
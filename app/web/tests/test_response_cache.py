@@ -0,0 +1,66 @@
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from web.api.cache import CachedRoute, cache_response
+from web.core.cache import InMemoryCache, ResponseCache
+
+cache = ResponseCache(InMemoryCache(max_size=10))
+calls = {"stats": 0, "missing": 0}
+
+
+class IsolatedCachedRoute(CachedRoute):
+    cache = cache
+
+
+router = APIRouter(route_class=IsolatedCachedRoute)
+
+
+@router.get("/stats")
+@cache_response(ttl=60, max_age=30, tags=["stores"])
+async def get_stats(limit: int = 10):
+    calls["stats"] += 1
+    return {"calls": calls["stats"], "limit": limit}
+
+
+@router.get("/missing")
+@cache_response(ttl=60, tags=["stores"])
+async def get_missing():
+    calls["missing"] += 1
+    raise HTTPException(status_code=404)
+
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def test_cached_response_with_etag():
+    first = client.get("/stats?limit=5")
+    second = client.get("/stats?limit=5")
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {"calls": 1, "limit": 5}
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=30"
+
+    not_modified = client.get(
+        "/stats?limit=5", headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert client.get("/stats?limit=6").json() == {"calls": 2, "limit": 6}
+
+    cache.invalidate("stores")
+
+    refreshed = client.get(
+        "/stats?limit=5", headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert refreshed.status_code == 200
+    assert refreshed.json() == {"calls": 3, "limit": 5}
+    assert refreshed.headers["etag"] != first.headers["etag"]
+
+
+def test_errors_are_not_cached():
+    assert client.get("/missing").status_code == 404
+    assert client.get("/missing").status_code == 404
+    assert calls["missing"] == 2
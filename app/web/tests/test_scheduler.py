@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlmodel import select
+
+from web.core.config import settings
+from web.models.enums import Currency, Locale
+from web.models.product import PriceHistory, Product
+from web.models.store import Store
+from web.tasks.scheduler import UpdateScheduler, check_interval
+
+MAX_INTERVAL = timedelta(hours=settings.SCHEDULER_MAX_INTERVAL_HOURS)
+MIN_INTERVAL = timedelta(hours=settings.SCHEDULER_MIN_INTERVAL_HOURS)
+
+
+def test_check_interval():
+    assert check_interval() == MAX_INTERVAL
+    assert check_interval(price_changes=1) == MAX_INTERVAL / 2
+    assert check_interval(popularity=3) == MAX_INTERVAL / 3
+    assert check_interval(price_changes=2, popularity=7) == MAX_INTERVAL / 12
+    assert check_interval(price_changes=100, popularity=1000) == MIN_INTERVAL
+
+
+def test_budget_per_tick():
+    assert UpdateScheduler(pages_per_hour=2000, tick_minutes=5).budget == 167
+    assert UpdateScheduler(pages_per_hour=60, tick_minutes=1).budget == 1
+
+
+@pytest.mark.asyncio
+async def test_due_work(async_session):
+    store = Store(
+        name="Store",
+        website="https://store.test",
+        locale=Locale.it_IT,
+        currency=Currency.EUR,
+    )
+    async_session.add(store)
+    await async_session.flush()
+    now = datetime.utcnow()
+    checks = [(-1, [10, 12]), (-2, [10]), (1, [10]), (None, [10])]
+    for i, (due_in, prices) in enumerate(checks):
+        async_session.add(
+            Product(
+                id=f"product-{i}",
+                name=f"Product {i}",
+                price=Decimal(prices[-1]),
+                currency=Currency.EUR,
+                link=f"https://store.test/{i}",
+                store_id=store.id,
+                next_check_at=None if due_in is None else now + timedelta(hours=due_in),
+            )
+        )
+        async_session.add_all(
+            PriceHistory(product_id=f"product-{i}", price=Decimal(price))
+            for price in prices
+        )
+    await async_session.commit()
+
+    scheduler = UpdateScheduler(pages_per_hour=60, tick_minutes=3)
+    work = await scheduler.get_due_work(async_session, now=now)
+
+    # Never scheduled first
+    assert [(s.id, [p.id for p in products]) for s, products in work] == [
+        (store.id, ["product-3", "product-1", "product-0"])
+    ]
+    stmt = select(Product.id, Product.next_check_at)
+    next_checks = dict((await async_session.execute(stmt)).all())
+    assert next_checks == {
+        "product-0": now + MAX_INTERVAL / 2,
+        "product-1": now + MAX_INTERVAL,
+        "product-2": now + timedelta(hours=1),
+        "product-3": now + MAX_INTERVAL,
+    }
+
+
+def test_refresh_throttled():
+    now = [0.0]
+    scheduler = UpdateScheduler(
+        refresh_seconds=3600, refresh_products=100, clock=lambda: now[0]
+    )
+
+    assert not scheduler.needs_refresh(0)
+    assert not scheduler.needs_refresh(60)
+    # Enough products over the ticks
+    assert scheduler.needs_refresh(40)
+    assert not scheduler.needs_refresh(10)
+    now[0] += 3600
+    assert scheduler.needs_refresh(1)
+    # Nothing to refresh, however long ago
+    now[0] += 7200
+    assert not scheduler.needs_refresh(0)
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+from web.models.store import StoreSitemap
+from web.tasks.scraper import SiteMapScraper
+from web.tasks.sitemap import SitemapWatermark
+
+DAY_1 = datetime(2024, 1, 1)
+DAY_2 = datetime(2024, 1, 2)
+DAY_3 = datetime(2024, 1, 3)
+
+A = "https://store.test/a"
+B = "https://store.test/b"
+
+
+class FakeReader:
+    def __init__(self, entries):
+        self.entries = entries
+
+    async def iter_entries(self, url, *, lastmod_format):
+        for entry in self.entries:
+            yield entry
+
+
+def make_sitemap(*imported) -> StoreSitemap:
+    sitemap = StoreSitemap(id=1, url="https://store.test/sitemap.xml")
+    watermark = SitemapWatermark()
+    for url, last_modified in imported:
+        watermark.mark(url, last_modified)
+    watermark.save(sitemap)
+    return sitemap
+
+
+def test_watermark_round_trip():
+    sitemap = make_sitemap((A, DAY_2), (B, None))
+    watermark = SitemapWatermark.from_sitemap(sitemap)
+
+    assert len(sitemap.known_urls) == 2 * SitemapWatermark.ENTRY.size
+    assert sitemap.last_imported_lastmod == DAY_2
+    assert watermark.is_changed("https://store.test/new", None)
+    assert not watermark.is_changed(A, DAY_1)
+    assert not watermark.is_changed(A, DAY_2)
+    assert watermark.is_changed(A, DAY_3)
+    assert not watermark.is_changed(B, None)
+    assert watermark.is_changed(B, DAY_1)
+
+
+@pytest.mark.asyncio
+async def test_links_left_out_are_still_changed():
+    sitemap = make_sitemap((A, DAY_1), (B, DAY_1))
+    scraper = SiteMapScraper()
+    scraper.reader = FakeReader([(A, DAY_2), (B, DAY_3)])
+
+    links = await scraper.scrape_links([sitemap], limit=1, only_changes=True)
+    assert [link.link for link in links] == [B]
+
+    # Only b is imported, a is imported next time
+    watermark = SitemapWatermark.from_sitemap(sitemap)
+    watermark.mark(links[0].link, links[0].last_modified)
+    watermark.save(sitemap)
+    links = await scraper.scrape_links([sitemap], limit=1, only_changes=True)
+    assert [link.link for link in links] == [A]